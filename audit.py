@@ -0,0 +1,261 @@
+import os
+import sys
+import json
+import time
+import stat
+import shutil
+import hashlib
+import threading
+import subprocess
+from throttle import Throttle
+
+
+# 与 sync_core.TEMP_SUFFIX 一致，扫描时忽略
+TEMP_SUFFIX = ".synctmp"
+
+
+class AuditStopped(Exception):
+    """审计被停止"""
+
+
+def lower_thread_priority():
+    """降低当前线程的CPU和I/O优先级，返回已应用的方式列表
+    
+    Linux 上 nice/ionice 按线程ID设置，只影响当前线程；Windows 使用后台处理模式
+    """
+    applied = []
+    if sys.platform.startswith('linux'):
+        thread_id = threading.get_native_id()
+        try:
+            os.setpriority(os.PRIO_PROCESS, thread_id, 19)
+            applied.append('nice')
+        except OSError:
+            pass
+        if shutil.which('ionice'):
+            try:
+                result = subprocess.run(['ionice', '-c', '3', '-p', str(thread_id)], capture_output=True, timeout=5)
+                if result.returncode == 0:
+                    applied.append('ionice')
+            except (OSError, subprocess.SubprocessError):
+                pass
+    elif os.name == 'nt':
+        try:
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            # THREAD_MODE_BACKGROUND_BEGIN 同时降低CPU和I/O优先级
+            if kernel32.SetThreadPriority(kernel32.GetCurrentThread(), 0x00010000):
+                applied.append('background')
+        except (AttributeError, OSError):
+            pass
+    return applied
+
+
+class SyncAuditor:
+    """定期完整审计：重新计算两侧文件的SHA256，报告元数据一致但内容不同的文件（漂移或位衰减）
+    
+    每次只审计一段时间（audit_max_seconds），进度保存在 audit_dir 中，下次从断点继续，
+    一轮审计可分散到多天完成；在后台线程中以低优先级、限速运行，前台同步或预览开始时中断，下次从断点继续
+    
+    配置项:
+        audit_enabled: 是否启用定期审计
+        audit_interval: 两次审计之间的间隔（秒）
+        audit_max_seconds: 每次审计的最长时间（秒）
+        audit_bandwidth_limit: 审计读取的带宽上限（字节/秒）
+        audit_dir: 审计进度和报告的保存目录
+    """
+    
+    REPORT_FILE = "audit_report.jsonl"
+    
+    def __init__(self, sync_core):
+        self.sync_core = sync_core
+        self.utils = sync_core.utils
+        self.throttle = Throttle()
+        self.stop_flag = False
+        self._thread = None
+        self._wake = threading.Event()
+        
+    def run_once(self, config):
+        """执行一段审计，返回本次的统计信息"""
+        source_path = config['source_path']
+        target_path = config['target_path']
+        log_callback = config.get('log_callback') or (lambda message: None)
+        audit_dir = config.get('audit_dir', 'audit')
+        deadline = time.monotonic() + config.get('audit_max_seconds', 600)
+        self.throttle.configure({'bandwidth_limit': config.get('audit_bandwidth_limit', 10 * 1024 * 1024)},
+                                lambda: self.stop_flag)
+                                
+        state_path = self._get_state_path(audit_dir, config)
+        state = self._load_state(state_path)
+        summary = {'checked': 0, 'mismatches': 0, 'skipped': 0, 'cycle_completed': False, 'interrupted': False}
+        
+        # 扫描前等待前台同步结束，避免争用磁盘
+        self._wait_for_idle()
+        # 审计自行扫描，不写入同步使用的扫描缓存、增量扫描状态和性能统计
+        include_patterns, exclude_patterns = self.sync_core._parse_filter_rules(config.get('filter_rules', ''))
+        versions_dir = config.get('versions_dir', '.versions')
+        try:
+            source_files = self._list_files(source_path, include_patterns, exclude_patterns, versions_dir)
+            target_files = self._list_files(target_path, include_patterns, exclude_patterns, versions_dir)
+        except AuditStopped:
+            summary['interrupted'] = True
+            return summary
+            
+        # 按相对路径排序，进度只需保存最后审计的路径
+        common_paths = sorted(path for path in source_files if path in target_files and path > state['cursor'])
+        try:
+            for relative_path in common_paths:
+                if self.stop_flag or time.monotonic() >= deadline:
+                    break
+                if self._is_foreground_busy():
+                    summary['interrupted'] = True
+                    break
+                source_info = source_files[relative_path]
+                target_info = target_files[relative_path]
+                
+                # 元数据不一致的文件等待下次同步处理，不属于审计范围
+                if source_info['size'] != target_info['size'] or abs(source_info['mtime'] - target_info['mtime']) > 1:
+                    summary['skipped'] += 1
+                else:
+                    # 前台同步开始后扫描结果可能已过期，本次审计到此为止，下次从断点继续
+                    try:
+                        source_hash = self._hash_file(source_info['path'])
+                        target_hash = self._hash_file(target_info['path'])
+                    except AuditStopped:
+                        summary['interrupted'] = True
+                        break
+                    if source_hash is None or target_hash is None:
+                        summary['skipped'] += 1
+                    elif source_hash != target_hash:
+                        summary['mismatches'] += 1
+                        state['mismatches'] += 1
+                        self._report_mismatch(audit_dir, config, relative_path, source_hash, target_hash)
+                        log_callback(f"审计发现内容不一致: {relative_path}")
+                    summary['checked'] += 1
+                    state['checked'] += 1
+                state['cursor'] = relative_path
+            else:
+                # 本轮全部审计完成，下次从头开始新一轮
+                summary['cycle_completed'] = True
+                log_callback(f"审计完成一轮: 检查 {state['checked']} 个文件，发现 {state['mismatches']} 个不一致")
+                state = {'cursor': '', 'cycle_started': time.time(), 'checked': 0, 'mismatches': 0}
+        finally:
+            self._save_state(state_path, state)
+            
+        return summary
+        
+    def start_scheduler(self, config_provider):
+        """启动后台审计线程；config_provider 返回当前的审计配置，未启用时返回None"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self.stop_flag = False
+        self._wake.clear()
+        self._thread = threading.Thread(target=self._scheduler_loop, args=(config_provider,))
+        self._thread.daemon = True
+        self._thread.start()
+        
+    def stop(self):
+        """停止后台审计"""
+        self.stop_flag = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+            
+    def _scheduler_loop(self, config_provider):
+        lower_thread_priority()
+        while not self.stop_flag:
+            interval = 3600
+            config = None
+            try:
+                config = config_provider()
+                if config:
+                    interval = config.get('audit_interval', interval)
+                    self.run_once(config)
+            except Exception as e:
+                log_callback = (config or {}).get('log_callback')
+                if log_callback:
+                    log_callback(f"审计失败: {str(e)}")
+            self._wake.wait(interval)
+            
+    def _list_files(self, directory, include_patterns, exclude_patterns, versions_dir):
+        """列出目录下的普通文件：相对路径 -> {'path', 'size', 'mtime'}；停止或前台同步开始时抛出 AuditStopped"""
+        file_list = {}
+        for root, dirs, files in os.walk(directory):
+            self._check_interrupted()
+            if root == directory and versions_dir in dirs:
+                dirs.remove(versions_dir)
+            relative_root = os.path.relpath(root, directory)
+            for file in files:
+                if file.endswith(TEMP_SUFFIX):
+                    continue
+                relative_path = file if relative_root == os.curdir else os.path.join(relative_root, file)
+                if not self.sync_core._should_include_file(relative_path, include_patterns, exclude_patterns):
+                    continue
+                try:
+                    file_stat = os.lstat(os.path.join(root, file))
+                except OSError:
+                    continue
+                if stat.S_ISREG(file_stat.st_mode):
+                    file_list[relative_path] = {'path': os.path.join(root, file), 'size': file_stat.st_size, 'mtime': file_stat.st_mtime}
+        return file_list
+        
+    def _hash_file(self, file_path):
+        """计算文件的SHA256，无法读取时返回None；停止或前台同步开始时抛出 AuditStopped"""
+        hasher = hashlib.sha256()
+        try:
+            with open(file_path, 'rb') as f:
+                while chunk := f.read(1024 * 1024):
+                    hasher.update(chunk)
+                    self._check_interrupted()
+                    self.throttle.consume_bytes(len(chunk))
+        except OSError:
+            return None
+        return hasher.hexdigest()
+        
+    def _check_interrupted(self):
+        """审计被停止或前台同步、预览开始时抛出 AuditStopped"""
+        if self.stop_flag:
+            raise AuditStopped("审计已停止")
+        if self._is_foreground_busy():
+            raise AuditStopped("前台同步进行中")
+            
+    def _is_foreground_busy(self):
+        """前台是否正在同步或预览"""
+        return self.sync_core.is_syncing or self.sync_core.is_previewing
+        
+    def _wait_for_idle(self):
+        """等待前台同步结束"""
+        while self._is_foreground_busy() and not self.stop_flag:
+            self._wake.wait(1)
+            
+    def _get_state_path(self, audit_dir, config):
+        key_source = json.dumps([config['source_path'], config['target_path'], config.get('filter_rules', '')], ensure_ascii=False)
+        return os.path.join(audit_dir, f"{hashlib.md5(key_source.encode('utf-8')).hexdigest()}.audit.json")
+        
+    def _load_state(self, state_path):
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'cursor': '', 'cycle_started': time.time(), 'checked': 0, 'mismatches': 0}
+            
+    def _save_state(self, state_path, state):
+        os.makedirs(os.path.dirname(state_path), exist_ok=True)
+        temp_path = state_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(temp_path, state_path)
+        
+    def _report_mismatch(self, audit_dir, config, relative_path, source_hash, target_hash):
+        """把不一致的文件追加到审计报告"""
+        os.makedirs(audit_dir, exist_ok=True)
+        record = {
+            'ts': time.time(),
+            'source_path': config['source_path'],
+            'target_path': config['target_path'],
+            'relative_path': relative_path,
+            'source_sha256': source_hash,
+            'target_sha256': target_hash
+        }
+        with open(os.path.join(audit_dir, self.REPORT_FILE), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
@@ -0,0 +1,131 @@
+import os
+import json
+import hashlib
+import threading
+import time
+
+
+class SyncCheckpoint:
+    """同步检查点：保存计划的同步动作和完成进度，中断后可从第一个未完成的动作继续"""
+    
+    def __init__(self, checkpoint_dir, source_path, target_path, sync_mode, filter_rules=''):
+        self.checkpoint_dir = checkpoint_dir
+        key_source = json.dumps([source_path, target_path, sync_mode, filter_rules], ensure_ascii=False)
+        self.key = hashlib.md5(key_source.encode('utf-8')).hexdigest()
+        self.plan_path = os.path.join(checkpoint_dir, f"{self.key}.plan.jsonl")
+        self.progress_path = os.path.join(checkpoint_dir, f"{self.key}.progress.jsonl")
+        self.done = set()
+        self.partials = {}
+        self._progress_file = None
+        self._lock = threading.Lock()
+        
+    def load(self, max_age=None):
+        """加载已有检查点，返回计划的动作列表；没有可用检查点时返回None"""
+        if not os.path.exists(self.plan_path):
+            return None
+        if max_age is not None and time.time() - os.path.getmtime(self.plan_path) > max_age:
+            self.clear()
+            return None
+            
+        actions = []
+        try:
+            with open(self.plan_path, 'r', encoding='utf-8') as f:
+                header = json.loads(f.readline())
+                for line in f:
+                    actions.append(json.loads(line))
+        except ValueError:
+            # 计划文件未写完整，视为没有检查点
+            self.clear()
+            return None
+        if len(actions) != header.get('total_actions'):
+            self.clear()
+            return None
+            
+        if os.path.exists(self.progress_path):
+            with open(self.progress_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # 进程中断时最后一行可能不完整
+                    if 'done' in record:
+                        self.done.add(record['done'])
+                        self.partials.pop(record['done'], None)
+                    elif 'partial' in record:
+                        self.partials[record['partial']] = record
+                        
+        self._open_progress()
+        return actions
+        
+    def save_plan(self, actions):
+        """保存新的同步计划（覆盖旧检查点）"""
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        self.close()
+        self.done = set()
+        self.partials = {}
+        
+        temp_path = self.plan_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'created': time.time(), 'total_actions': len(actions)}) + "\n")
+            for action in actions:
+                f.write(json.dumps(action, ensure_ascii=False) + "\n")
+        os.replace(temp_path, self.plan_path)
+        
+        if os.path.exists(self.progress_path):
+            os.remove(self.progress_path)
+        self._open_progress()
+        
+    def get_first_incomplete(self, total_actions):
+        """第一个未完成动作的序号"""
+        for index in range(total_actions):
+            if index not in self.done:
+                return index
+        return total_actions
+        
+    def mark_done(self, index, flush=True):
+        """记录动作已完成；批量处理时可延后到 flush() 统一写出"""
+        self.done.add(index)
+        self.partials.pop(index, None)
+        self._append({'done': index}, flush)
+        
+    def flush(self):
+        """把缓冲的进度写入操作系统"""
+        with self._lock:
+            if self._progress_file:
+                self._progress_file.flush()
+        
+    def save_partial(self, index, offset, digest):
+        """记录大文件的已复制字节数及这部分内容的MD5"""
+        record = {'partial': index, 'offset': offset, 'digest': digest}
+        self.partials[index] = record
+        self._append(record)
+        
+    def get_partial(self, index):
+        """获取大文件的断点信息"""
+        return self.partials.get(index)
+        
+    def close(self):
+        """关闭进度文件"""
+        with self._lock:
+            if self._progress_file:
+                self._progress_file.close()
+                self._progress_file = None
+            
+    def clear(self):
+        """删除检查点"""
+        self.close()
+        for path in (self.plan_path, self.progress_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.done = set()
+        self.partials = {}
+        
+    def _open_progress(self):
+        self._progress_file = open(self.progress_path, 'a', encoding='utf-8')
+        
+    def _append(self, record, flush=True):
+        # 记录写入操作系统后，进程意外退出也不会丢失进度
+        with self._lock:
+            self._progress_file.write(json.dumps(record) + "\n")
+            if flush:
+                self._progress_file.flush()
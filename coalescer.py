@@ -0,0 +1,116 @@
+import os
+import time
+
+
+class EventCoalescer:
+    """合并监控事件：同一文件的创建/修改/移动只记录一次，等文件大小和修改时间稳定后再同步
+    
+    待处理文件超过 max_pending 时不再逐个跟踪，改为只记录所在目录（目录也超限时整棵树重新扫描），
+    此时以一段时间内没有新事件作为稳定的判断；从第一个事件起超过 max_delay 秒仍未稳定时，
+    先同步已稳定的部分，未稳定的文件留到下一批
+    """
+    
+    def __init__(self, roots, quiet_period=2, max_pending=10000, max_delay=60):
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.quiet_period = quiet_period
+        self.max_pending = max_pending
+        self.max_delay = max_delay
+        self._reset()
+        
+    def _reset(self):
+        # 文件路径 -> [大小和修改时间, 最后变化时间]
+        self._files = {}
+        self._dirs = set()
+        self._subtrees = set()
+        self._overflow = False
+        self._full_rescan = False
+        self._first_event = None
+        self._last_event = None
+        self._next_check = 0
+        
+    def has_pending(self):
+        """是否有尚未同步的变化"""
+        return self._first_event is not None
+        
+    def add(self, event):
+        """记录一个监控事件"""
+        now = time.monotonic()
+        if self._first_event is None:
+            self._first_event = now
+        self._last_event = now
+        if self._full_rescan:
+            return
+            
+        path = os.path.abspath(event['path'])
+        parent = os.path.dirname(path)
+        if event['type'] == 'rescan':
+            self._subtrees.add(path)
+            self._dirs.add(parent)
+        elif event['is_dir'] or event['type'] == 'changed':
+            self._dirs.add(path)
+            self._dirs.add(parent)
+        elif self._overflow:
+            self._dirs.add(parent)
+        else:
+            entry = self._files.get(path)
+            if entry is None:
+                self._files[path] = [self._snapshot(path), now]
+            else:
+                entry[1] = now
+            self._dirs.add(parent)
+        self._check_limits()
+        
+    def collect(self):
+        """返回可以同步的一批变化 {'dirty_dirs', 'dirty_subtrees', 'unsettled'}，还需要等待时返回None"""
+        if self._first_event is None:
+            return None
+        now = time.monotonic()
+        if now < self._next_check:
+            return None
+        self._next_check = now + min(self.quiet_period / 2, 0.5)
+        
+        forced = now - self._first_event >= self.max_delay
+        if now - self._last_event < self.quiet_period and not forced:
+            return None
+            
+        # 逐个检查文件大小和修改时间，仍在写入的文件需要继续等待
+        unsettled = set()
+        for path, entry in self._files.items():
+            snapshot = self._snapshot(path)
+            if snapshot != entry[0]:
+                entry[0] = snapshot
+                entry[1] = now
+            if now - entry[1] < self.quiet_period:
+                unsettled.add(path)
+        if unsettled and not forced:
+            return None
+            
+        if self._full_rescan:
+            batch = {'dirty_dirs': set(), 'dirty_subtrees': set(self.roots), 'unsettled': set()}
+        else:
+            batch = {'dirty_dirs': self._dirs, 'dirty_subtrees': self._subtrees, 'unsettled': unsettled}
+        remaining = {path: self._files[path] for path in unsettled}
+        self._reset()
+        if remaining:
+            # 未稳定的文件留到下一批
+            self._files = remaining
+            self._dirs = {os.path.dirname(path) for path in remaining}
+            self._first_event = self._last_event = now
+        return batch
+        
+    def _check_limits(self):
+        """限制待处理集合的大小"""
+        if len(self._files) > self.max_pending:
+            self._overflow = True
+            self._files = {}
+        if len(self._dirs) + len(self._subtrees) > self.max_pending:
+            self._full_rescan = True
+            self._dirs = set()
+            self._subtrees = set()
+            
+    def _snapshot(self, path):
+        try:
+            file_stat = os.stat(path)
+            return file_stat.st_size, file_stat.st_mtime_ns
+        except OSError:
+            return None
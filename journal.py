@@ -0,0 +1,154 @@
+import os
+import json
+import time
+import uuid
+from datetime import datetime
+
+INDEX_FILE = "journal_index.jsonl"
+
+
+class RunJournal:
+    """结构化的同步运行日志（JSON Lines），每次运行一段连续记录，并写入索引便于按时间/配置检索"""
+    
+    def __init__(self, journal_dir, profile_name="default", run_id=None):
+        self.journal_dir = journal_dir
+        self.profile_name = profile_name
+        self.run_id = run_id or datetime.now().strftime("%Y%m%d%H%M%S") + "-" + uuid.uuid4().hex[:8]
+        self.journal_path = None
+        self.start_time = None
+        self.start_offset = 0
+        self._file = None
+        self._record_count = 0
+        
+    def start(self, **details):
+        """开始一次运行，写入 run_start 记录"""
+        os.makedirs(self.journal_dir, exist_ok=True)
+        self.start_time = time.time()
+        file_name = f"journal_{datetime.fromtimestamp(self.start_time).strftime('%Y%m%d')}.jsonl"
+        self.journal_path = os.path.join(self.journal_dir, file_name)
+        
+        self._file = open(self.journal_path, 'ab')
+        self.start_offset = self._file.tell()
+        self._write({'type': 'run_start', **details})
+        
+    def record_action(self, action, success, duration):
+        """写入单个同步动作的记录"""
+        self._write({
+            'type': 'action',
+            'action': action.get('action'),
+            'direction': action.get('direction'),
+            'relative_path': action.get('relative_path'),
+            'target': action.get('target'),
+            'bytes': action.get('bytes', 0),
+            'hash': action.get('hash'),
+            'attempts': action.get('attempts', 0),
+            'duration': round(duration, 6),
+            'outcome': 'success' if success else 'failed',
+            'error': action.get('error')
+        })
+        
+    def finish(self, **summary):
+        """写入运行汇总并追加索引条目"""
+        if self._file is None:
+            return
+            
+        end_time = time.time()
+        self._write({'type': 'run_summary', 'duration': round(end_time - self.start_time, 6), **summary})
+        end_offset = self._file.tell()
+        self._file.close()
+        self._file = None
+        
+        entry = {
+            'run_id': self.run_id,
+            'profile': self.profile_name,
+            'start_time': self.start_time,
+            'end_time': end_time,
+            'file': os.path.basename(self.journal_path),
+            'offset': self.start_offset,
+            'length': end_offset - self.start_offset,
+            'records': self._record_count
+        }
+        with open(os.path.join(self.journal_dir, INDEX_FILE), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            
+    def _write(self, record):
+        record = {'run_id': self.run_id, 'profile': self.profile_name, 'ts': time.time(), **record}
+        self._file.write((json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8'))
+        self._record_count += 1
+
+
+def query_runs(journal_dir, start_time=None, end_time=None, profile=None):
+    """按时间范围（时间戳）和配置名从索引中查询运行记录"""
+    index_path = os.path.join(journal_dir, INDEX_FILE)
+    if not os.path.exists(index_path):
+        return []
+        
+    runs = []
+    with open(index_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # 跳过写入中断的残缺行
+            if start_time is not None and entry['end_time'] < start_time:
+                continue
+            if end_time is not None and entry['start_time'] > end_time:
+                continue
+            if profile is not None and entry['profile'] != profile:
+                continue
+            runs.append(entry)
+    return runs
+
+
+def read_run_records(journal_dir, entry):
+    """根据索引条目直接定位读取一次运行的全部记录"""
+    journal_path = os.path.join(journal_dir, entry['file'])
+    with open(journal_path, 'rb') as f:
+        f.seek(entry['offset'])
+        data = f.read(entry['length'])
+        
+    records = []
+    for line in data.decode('utf-8').splitlines():
+        record = json.loads(line)
+        # 同一文件可能有其他运行的记录交错写入
+        if record.get('run_id') == entry['run_id']:
+            records.append(record)
+    return records
+
+
+def read_run_summary(journal_dir, entry):
+    """读取一次运行的汇总记录（只读取该运行末尾的一小段）"""
+    journal_path = os.path.join(journal_dir, entry['file'])
+    tail_size = min(entry['length'], 64 * 1024)
+    with open(journal_path, 'rb') as f:
+        f.seek(entry['offset'] + entry['length'] - tail_size)
+        data = f.read(tail_size)
+        
+    for line in reversed(data.decode('utf-8', errors='ignore').splitlines()):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if record.get('run_id') == entry['run_id'] and record.get('type') == 'run_summary':
+            return record
+    return None
+
+
+def estimate_throughput(journal_dir, profile=None, max_runs=10):
+    """根据最近几次运行的复制字节数和复制/校验耗时估算吞吐量（字节/秒），没有历史数据时返回None"""
+    total_bytes = 0
+    total_seconds = 0.0
+    for entry in reversed(query_runs(journal_dir, profile=profile)):
+        summary = read_run_summary(journal_dir, entry)
+        if not summary or not summary.get('bytes_transferred'):
+            continue
+        stages = summary.get('stages', {})
+        seconds = stages.get('copy', 0) + stages.get('verify', 0)
+        if seconds <= 0:
+            continue
+        total_bytes += summary['bytes_transferred']
+        total_seconds += seconds
+        max_runs -= 1
+        if max_runs <= 0:
+            break
+    return total_bytes / total_seconds if total_seconds > 0 else None
@@ -1,7 +1,9 @@
 import os
+import json
 import logging
 from datetime import datetime
 from logging.handlers import RotatingFileHandler
+from journal import query_runs, read_run_records
 
 class Logger:
     def __init__(self, log_dir="logs", log_file="sync_tool.log", max_size=10*1024*1024, backup_count=5):
@@ -25,6 +27,9 @@ class Logger:
         # 设置日志文件路径
         self.log_path = os.path.join(log_dir, log_file)
         
+        # 结构化运行日志目录（由同步核心写入）
+        self.journal_dir = os.path.join(log_dir, 'journal')
+        
         # 初始化日志记录器
         self._setup_logger()
         
@@ -240,30 +245,46 @@ class Logger:
                     
             stats['total_size'] = total_size
             stats['total_size_mb'] = round(total_size / (1024 * 1024), 2)
+            stats['journal_runs'] = len(query_runs(self.journal_dir))
             
             return stats
         except Exception as e:
             self.error(f"获取日志统计信息失败: {e}")
             return {}
             
-    def export_logs(self, export_path, start_date=None, end_date=None):
-        """导出日志到指定文件"""
+    def export_logs(self, export_path, start_date=None, end_date=None, profile=None):
+        """导出日志到指定文件
+        
+        Args:
+            export_path: 导出文件路径
+            start_date: 开始日期（datetime 或 "YYYY-MM-DD[ HH:MM:SS]"）
+            end_date: 结束日期，只给日期时包含当天
+            profile: 配置名，指定后只导出该配置的结构化运行日志
+        """
         try:
+            start_ts = self._parse_date_bound(start_date)
+            end_ts = self._parse_date_bound(end_date, end_of_day=True)
+            
             with open(export_path, 'w', encoding='utf-8') as export_file:
                 export_file.write(f"# 同步工具日志导出\n")
                 export_file.write(f"# 导出时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                export_file.write(f"# 日期范围: {start_date or '全部'} - {end_date or '全部'}\n\n")
+                export_file.write(f"# 日期范围: {start_date or '全部'} - {end_date or '全部'}\n")
+                export_file.write(f"# 配置: {profile or '全部'}\n\n")
                 
-                log_files = self.get_log_files()
-                for log_file in log_files:
+                # 文本日志不含配置名，按配置导出时只输出结构化日志
+                if profile is None:
+                    self._export_text_logs(export_file, start_ts, end_ts)
+                    
+                # 通过索引直接定位结构化运行日志
+                runs = query_runs(self.journal_dir, start_ts, end_ts, profile)
+                if runs:
+                    export_file.write(f"\n=== 运行日志 ({len(runs)} 次运行) ===\n")
+                for run in runs:
                     try:
-                        with open(log_file, 'r', encoding='utf-8') as f:
-                            export_file.write(f"\n=== {os.path.basename(log_file)} ===\n")
-                            for line in f:
-                                # 这里可以添加日期过滤逻辑
-                                export_file.write(line)
+                        for record in read_run_records(self.journal_dir, run):
+                            export_file.write(json.dumps(record, ensure_ascii=False) + "\n")
                     except Exception as e:
-                        export_file.write(f"读取日志文件失败: {log_file} - {e}\n")
+                        export_file.write(f"读取运行日志失败: {run['run_id']} - {e}\n")
                         
             self.info(f"日志导出成功: {export_path}")
             return True
@@ -271,6 +292,52 @@ class Logger:
             self.error(f"日志导出失败: {export_path} - {e}")
             return False
             
+    def _export_text_logs(self, export_file, start_ts, end_ts):
+        """按日期范围导出文本日志"""
+        for log_file in self.get_log_files():
+            # 最后修改时间早于开始时间的轮转文件不可能包含范围内的日志
+            if start_ts is not None and os.path.getmtime(log_file) < start_ts:
+                continue
+                
+            try:
+                with open(log_file, 'r', encoding='utf-8') as f:
+                    export_file.write(f"\n=== {os.path.basename(log_file)} ===\n")
+                    include = True
+                    for line in f:
+                        line_ts = self._parse_line_timestamp(line)
+                        # 没有时间戳的续行（如堆栈信息）沿用上一行的判断
+                        if line_ts is not None:
+                            include = (start_ts is None or line_ts >= start_ts) and (end_ts is None or line_ts <= end_ts)
+                        if include:
+                            export_file.write(line)
+            except Exception as e:
+                export_file.write(f"读取日志文件失败: {log_file} - {e}\n")
+                
+    def _parse_line_timestamp(self, line):
+        """解析文本日志行首的时间戳"""
+        try:
+            return datetime.strptime(line[:19], '%Y-%m-%d %H:%M:%S').timestamp()
+        except ValueError:
+            return None
+            
+    def _parse_date_bound(self, value, end_of_day=False):
+        """把日期参数转换为时间戳"""
+        if value is None or value == '':
+            return None
+        if isinstance(value, datetime):
+            return value.timestamp()
+        if isinstance(value, (int, float)):
+            return float(value)
+            
+        value = str(value).strip()
+        try:
+            return datetime.strptime(value, '%Y-%m-%d %H:%M:%S').timestamp()
+        except ValueError:
+            day = datetime.strptime(value, '%Y-%m-%d')
+            if end_of_day:
+                day = day.replace(hour=23, minute=59, second=59, microsecond=999999)
+            return day.timestamp()
+            
     def set_log_level(self, level):
         """设置日志级别"""
         level_map = {
@@ -0,0 +1,153 @@
+import os
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 默认的延迟直方图分桶（秒）
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 60, 300)
+
+
+class SyncMetrics:
+    """同步指标注册表，按 Prometheus 文本格式导出（OpenMetrics 兼容）"""
+    
+    # 指标名 -> (类型, 说明)
+    METRICS = {
+        'sync_runs_total': ('counter', '同步运行次数'),
+        'sync_files_scanned_total': ('counter', '扫描的文件数'),
+        'sync_actions_planned_total': ('counter', '计划的同步动作数'),
+        'sync_actions_executed_total': ('counter', '已执行的同步动作数（按结果）'),
+        'sync_bytes_transferred_total': ('counter', '复制的字节数'),
+        'sync_bytes_deduplicated_total': ('counter', '内容去重节省的传输字节数'),
+        'sync_retries_total': ('counter', '重试次数'),
+        'sync_pending_actions': ('gauge', '当前待执行的同步动作数'),
+        'sync_retry_queue_depth': ('gauge', '延迟重试队列中的动作数'),
+        'sync_last_run_timestamp_seconds': ('gauge', '最近一次同步结束时间'),
+        'sync_action_duration_seconds': ('histogram', '单个同步动作耗时'),
+        'sync_stage_duration_seconds': ('histogram', '每次同步中各阶段的耗时')
+    }
+    
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._server = None
+        self._server_thread = None
+        
+    def _key(self, name, labels):
+        return name, tuple(sorted(labels.items()))
+        
+    def inc(self, name, value=1, **labels):
+        """计数器累加"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+            
+    def set(self, name, value, **labels):
+        """设置仪表值"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._values[key] = value
+            
+    def observe(self, name, value, **labels):
+        """记录直方图观测值"""
+        key = self._key(name, labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+            
+    def get_value(self, name, **labels):
+        """读取计数器或仪表的当前值"""
+        with self._lock:
+            return self._values.get(self._key(name, labels), 0)
+            
+    def render(self):
+        """生成 Prometheus 文本格式的指标"""
+        with self._lock:
+            values = dict(self._values)
+            histograms = {key: (list(h[0]), h[1], h[2]) for key, h in self._histograms.items()}
+            
+        lines = []
+        for name, (metric_type, help_text) in self.METRICS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            
+            if metric_type == 'histogram':
+                for (metric_name, labels), (counts, total, count) in sorted(histograms.items()):
+                    if metric_name != name:
+                        continue
+                    cumulative = 0
+                    for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                        cumulative += bucket_count
+                        le = '+Inf' if bound == float('inf') else repr(float(bound))
+                        lines.append(f"{name}_bucket{self._format_labels(labels + (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{self._format_labels(labels)} {total}")
+                    lines.append(f"{name}_count{self._format_labels(labels)} {count}")
+            else:
+                for (metric_name, labels), value in sorted(values.items()):
+                    if metric_name == name:
+                        lines.append(f"{name}{self._format_labels(labels)} {value}")
+                        
+        return "\n".join(lines) + "\n"
+        
+    def _format_labels(self, labels):
+        if not labels:
+            return ""
+        parts = []
+        for label, value in labels:
+            value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            parts.append(f'{label}="{value}"')
+        return "{" + ",".join(parts) + "}"
+        
+    def write_textfile(self, file_path):
+        """写出 textfile collector 格式的指标文件（原子替换）"""
+        directory = os.path.dirname(file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = file_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(temp_path, file_path)
+        
+    def start_http_server(self, port, host="127.0.0.1"):
+        """在后台线程中启动本地 HTTP 指标端点，重复调用不会重复启动"""
+        if self._server is not None:
+            return self._server.server_address
+            
+        metrics = self
+        
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                
+            def log_message(self, format, *args):
+                # 不把访问日志打印到控制台
+                pass
+                
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        self._server_thread = threading.Thread(target=self._server.serve_forever)
+        self._server_thread.daemon = True
+        self._server_thread.start()
+        return self._server.server_address
+        
+    def stop_http_server(self):
+        """停止 HTTP 指标端点"""
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+        self._server_thread = None
@@ -0,0 +1,68 @@
+import unicodedata
+
+
+class PathIndex:
+    """按规范化策略比较两侧的相对路径
+    
+    在忽略大小写的文件系统与区分大小写的文件系统之间同步，或 macOS 产生的 NFD 文件名与其他系统的
+    NFC 文件名同步时，原始字符串不同的路径实际是同一个文件；规范化后相同的路径按同一个文件比较，
+    同一侧中规范化后相同的多个路径（冲突）无法确定对应关系，在同步前报告并跳过
+    
+    配置项:
+        path_normalization: none（按原始路径，默认）/ nfc（Unicode NFC 规范化）/ casefold（忽略大小写）/ nfc_casefold（两者）
+    """
+    
+    POLICIES = ('none', 'nfc', 'casefold', 'nfc_casefold')
+    
+    def __init__(self, policy='none'):
+        if policy not in self.POLICIES:
+            raise ValueError(f"不支持的路径规范化策略: {policy}")
+        self.policy = policy
+        
+    def normalize(self, relative_path):
+        """规范化后的路径，用作比较的键"""
+        if self.policy in ('nfc', 'nfc_casefold'):
+            relative_path = unicodedata.normalize('NFC', relative_path)
+        if self.policy in ('casefold', 'nfc_casefold'):
+            # casefold 可能产生非 NFC 的结果，再规范化一次
+            relative_path = unicodedata.normalize('NFC', relative_path.casefold())
+        return relative_path
+        
+    def align(self, source_files, target_files):
+        """按规范化的路径对齐两侧的文件列表，返回 (源文件列表, 目标文件列表, 冲突的路径组)
+        
+        目标文件改用对应源文件的路径作为键，文件信息中的 relative_path 保留目标端的实际路径；
+        冲突的路径从两侧的列表中去掉
+        """
+        if self.policy == 'none':
+            return source_files, target_files, []
+            
+        source_keys = self._group(source_files)
+        target_keys = self._group(target_files)
+        collisions = [paths for paths in source_keys.values() if len(paths) > 1]
+        collisions += [paths for paths in target_keys.values() if len(paths) > 1]
+        if collisions:
+            colliding = {key for key, paths in source_keys.items() if len(paths) > 1}
+            colliding.update(key for key, paths in target_keys.items() if len(paths) > 1)
+            source_files = {paths[0]: source_files[paths[0]] for key, paths in source_keys.items() if key not in colliding}
+        else:
+            colliding = set()
+            
+        aligned_target = {}
+        for key, paths in target_keys.items():
+            if key in colliding:
+                continue
+            target_path = paths[0]
+            file_info = target_files[target_path]
+            source_path = source_keys.get(key, (target_path,))[0]
+            if source_path != target_path:
+                file_info = dict(file_info, relative_path=target_path)
+            aligned_target[source_path] = file_info
+        return source_files, aligned_target, collisions
+        
+    def _group(self, file_list):
+        """规范化的路径 -> 原始路径列表"""
+        keys = {}
+        for relative_path in file_list:
+            keys.setdefault(self.normalize(relative_path), []).append(relative_path)
+        return keys
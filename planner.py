@@ -0,0 +1,76 @@
+import os
+import heapq
+import fnmatch
+
+
+class ActionPlanner:
+    """按策略排列同步动作，并把大文件分到单独的通道
+    
+    配置项:
+        order_policy: tree（扫描顺序）/ small_first（小文件优先）/ recent_first（最近修改优先）
+        priority_rules: 以分号分隔的路径模式，越靠前优先级越高，如 "*.docx;reports/*"
+        large_file_threshold: 不小于该大小的文件进入大文件通道（0 为不分通道）
+    """
+    
+    POLICIES = ('tree', 'small_first', 'recent_first')
+    
+    def __init__(self, policy='tree', priority_rules='', large_file_threshold=0):
+        if policy not in self.POLICIES:
+            raise ValueError(f"不支持的排序策略: {policy}")
+        self.policy = policy
+        self.priority_patterns = [rule.strip() for rule in (priority_rules or '').split(';') if rule.strip()]
+        self.large_file_threshold = large_file_threshold or 0
+        
+    def order(self, actions):
+        """按优先级规则和排序策略返回重新排列的动作列表（排序稳定，同级保持扫描顺序）"""
+        if self.policy == 'tree' and not self.priority_patterns:
+            return list(actions)
+        return sorted(actions, key=self._sort_key)
+        
+    def select(self, actions, offset=0, limit=None):
+        """从动作流中按执行顺序取第 offset 个起的 limit 个动作（序号写入 index）
+        
+        排序策略下只保留前 offset + limit 个，不需要在内存中保存整个计划
+        """
+        if self.policy == 'tree' and not self.priority_patterns:
+            page = []
+            for position, action in enumerate(actions):
+                if position >= offset and (limit is None or position < offset + limit):
+                    page.append(action)
+        elif limit is None:
+            page = self.order(actions)[offset:]
+        else:
+            keyed = ((self._sort_key(action), sequence, action) for sequence, action in enumerate(actions))
+            page = [action for _, _, action in heapq.nsmallest(offset + limit, keyed)][offset:]
+            
+        for position, action in enumerate(page, offset):
+            action['index'] = position
+        return page
+        
+    def split_lanes(self, actions):
+        """拆分为 (普通通道, 大文件通道)，各自保持原有顺序"""
+        if not self.large_file_threshold:
+            return list(actions), []
+        normal, large = [], []
+        for action in actions:
+            if action['action'] in ('copy', 'update') and action.get('size', 0) >= self.large_file_threshold:
+                large.append(action)
+            else:
+                normal.append(action)
+        return normal, large
+        
+    def get_priority(self, relative_path):
+        """匹配的第一条优先级规则的序号，未匹配时排在所有规则之后"""
+        file_name = os.path.basename(relative_path)
+        for rank, pattern in enumerate(self.priority_patterns):
+            if fnmatch.fnmatch(relative_path, pattern) or fnmatch.fnmatch(file_name, pattern):
+                return rank
+        return len(self.priority_patterns)
+        
+    def _sort_key(self, action):
+        priority = self.get_priority(action['relative_path'])
+        if self.policy == 'small_first':
+            return priority, action.get('size', 0)
+        if self.policy == 'recent_first':
+            return priority, -action.get('mtime', 0)
+        return (priority,)
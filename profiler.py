@@ -0,0 +1,194 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+class SyncProfiler:
+    """同步性能统计：分阶段计时、系统调用/字节计数、哈希缓存命中率"""
+    
+    # 汇总时的阶段显示顺序
+    STAGE_ORDER = ['scan', 'filter', 'compare', 'preflight', 'hash', 'copy', 'verify', 'metadata', 'retry_sleep']
+    STAGE_NAMES = {
+        'scan': '扫描',
+        'filter': '过滤',
+        'compare': '比较',
+        'preflight': '空间预检',
+        'hash': '哈希',
+        'copy': '复制',
+        'verify': '校验',
+        'metadata': '元数据',
+        'retry_sleep': '重试等待'
+    }
+    
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+        self.end_wall = None
+        self.end_cpu = None
+        
+    @property
+    def _stack(self):
+        # 每个线程各自维护阶段嵌套
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+        
+    @contextmanager
+    def stage(self, name):
+        """记录一个阶段的耗时（嵌套阶段的时间只计入最内层阶段）"""
+        now_wall = time.perf_counter()
+        now_cpu = time.process_time()
+        
+        # 暂停外层阶段
+        if self._stack:
+            self._accumulate(self._stack[-1], now_wall, now_cpu)
+            
+        frame = [name, now_wall, now_cpu]
+        self._stack.append(frame)
+        with self._lock:
+            self.stages.setdefault(name, {'wall': 0.0, 'cpu': 0.0, 'calls': 0})['calls'] += 1
+        try:
+            yield
+        finally:
+            end_wall = time.perf_counter()
+            end_cpu = time.process_time()
+            self._accumulate(self._stack.pop(), end_wall, end_cpu)
+            
+            # 恢复外层阶段
+            if self._stack:
+                self._stack[-1][1] = end_wall
+                self._stack[-1][2] = end_cpu
+                
+    def add_stage_time(self, name, wall, calls=1):
+        """把调用方自行累计的耗时计入阶段，当前所在的阶段扣除这部分时间
+        
+        用于逐个文件执行的短小阶段，避免每个文件进出一次阶段的开销；只用于纯计算的阶段，CPU 时间按墙钟时间计
+        """
+        with self._lock:
+            stats = self.stages.setdefault(name, {'wall': 0.0, 'cpu': 0.0, 'calls': 0})
+            stats['wall'] += wall
+            stats['cpu'] += wall
+            stats['calls'] += calls
+        if self._stack:
+            self._stack[-1][1] += wall
+            self._stack[-1][2] += wall
+            
+    def _accumulate(self, frame, now_wall, now_cpu):
+        """把阶段帧自上次起算以来的耗时累加到统计中"""
+        name, start_wall, start_cpu = frame
+        with self._lock:
+            stats = self.stages[name]
+            stats['wall'] += now_wall - start_wall
+            stats['cpu'] += now_cpu - start_cpu
+        frame[1] = now_wall
+        frame[2] = now_cpu
+        
+    def count(self, name, value=1):
+        """累加计数器"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+        
+    def finish(self):
+        """结束统计"""
+        self.end_wall = time.perf_counter()
+        self.end_cpu = time.process_time()
+        
+    def get_hash_cache_hit_rate(self):
+        """获取哈希缓存命中率（百分比）"""
+        hits = self.counters.get('hash_cache_hits', 0)
+        misses = self.counters.get('hash_cache_misses', 0)
+        total = hits + misses
+        return round(hits / total * 100, 2) if total > 0 else 0
+        
+    def get_statistics(self):
+        """获取统计结果"""
+        end_wall = self.end_wall if self.end_wall is not None else time.perf_counter()
+        end_cpu = self.end_cpu if self.end_cpu is not None else time.process_time()
+        return {
+            'total_wall': end_wall - self.start_wall,
+            'total_cpu': end_cpu - self.start_cpu,
+            'stages': {name: dict(stats) for name, stats in list(self.stages.items())},
+            'counters': dict(self.counters),
+            'hash_cache_hit_rate': self.get_hash_cache_hit_rate()
+        }
+        
+    def format_summary(self):
+        """生成可读的统计摘要（每行一条）"""
+        stats = self.get_statistics()
+        lines = [f"性能统计 - 总耗时: {stats['total_wall']:.3f}s, CPU: {stats['total_cpu']:.3f}s"]
+        
+        names = [n for n in self.STAGE_ORDER if n in stats['stages']]
+        names += sorted(n for n in stats['stages'] if n not in self.STAGE_ORDER)
+        for name in names:
+            stage = stats['stages'][name]
+            label = self.STAGE_NAMES.get(name, name)
+            lines.append(f"  {label}: 耗时 {stage['wall']:.3f}s, CPU {stage['cpu']:.3f}s, 次数 {stage['calls']}")
+            
+        counters = stats['counters']
+        if counters:
+            lines.append("  计数: " + ", ".join(f"{k}={round(v, 3) if isinstance(v, float) else v}" for k, v in sorted(counters.items())))
+        lines.append(f"  哈希缓存命中率: {stats['hash_cache_hit_rate']}%")
+        return lines
+
+
+class ProfileCapture:
+    """可选的 cProfile / pyinstrument 采样，结果写入日志目录"""
+    
+    SUPPORTED_MODES = ('cprofile', 'pyinstrument')
+    
+    def __init__(self, mode, output_dir="logs"):
+        self.mode = (mode or '').lower()
+        self.output_dir = output_dir
+        self._profiler = None
+        self.output_path = None
+        
+    def start(self):
+        """开始采样，返回是否成功启动"""
+        if self.mode == 'cprofile':
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+            return True
+        if self.mode == 'pyinstrument':
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                return False
+            self._profiler = Profiler()
+            self._profiler.start()
+            return True
+        return False
+        
+    def stop(self):
+        """停止采样并写出结果，返回结果文件路径"""
+        if self._profiler is None:
+            return None
+            
+        os.makedirs(self.output_dir, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        base_path = os.path.join(self.output_dir, f"sync_profile_{timestamp}")
+        
+        if self.mode == 'cprofile':
+            import pstats
+            self._profiler.disable()
+            self.output_path = base_path + ".prof"
+            self._profiler.dump_stats(self.output_path)
+            
+            # 同时输出一份可直接阅读的文本报告
+            with open(base_path + ".txt", 'w', encoding='utf-8') as f:
+                stats = pstats.Stats(self._profiler, stream=f)
+                stats.sort_stats('cumulative').print_stats(50)
+        else:
+            self._profiler.stop()
+            self.output_path = base_path + ".html"
+            with open(self.output_path, 'w', encoding='utf-8') as f:
+                f.write(self._profiler.output_html())
+                
+        self._profiler = None
+        return self.output_path
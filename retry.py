@@ -0,0 +1,65 @@
+import errno
+import heapq
+import itertools
+import random
+import threading
+import time
+
+# Windows 共享冲突/锁冲突错误码
+WINDOWS_SHARING_ERRORS = (32, 33)
+
+# 可能是暂时性的错误，值得稍后重试
+TRANSIENT_ERRNOS = {
+    errno.EAGAIN, errno.EBUSY, errno.EINTR, errno.ETIMEDOUT, errno.ETXTBSY,
+    getattr(errno, 'ESTALE', errno.EAGAIN), getattr(errno, 'ECONNRESET', errno.EAGAIN)
+}
+
+
+class RetryPolicy:
+    """重试策略：错误分类与带抖动的指数退避"""
+    
+    def __init__(self, max_retries=5, base_delay=1.0, max_delay=60.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        
+    def is_retryable(self, error):
+        """判断错误是否值得重试：共享冲突等暂时性错误重试，权限/不存在/空间不足等立即失败"""
+        if getattr(error, 'winerror', None) in WINDOWS_SHARING_ERRORS:
+            return True
+        if isinstance(error, (PermissionError, FileNotFoundError, IsADirectoryError, NotADirectoryError)):
+            return False
+        if isinstance(error, OSError) and error.errno is not None:
+            if error.errno in (errno.ENOSPC, errno.EROFS, errno.ENAMETOOLONG):
+                return False
+            return error.errno in TRANSIENT_ERRNOS
+        # 校验失败等其他错误默认重试
+        return True
+        
+    def get_delay(self, attempt):
+        """第 attempt 次失败后的等待时间（一半固定、一半随机抖动）"""
+        delay = min(self.max_delay, self.base_delay * (2 ** max(attempt - 1, 0)))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+
+class RetryQueue:
+    """延迟重试队列，按到期时间出队"""
+    
+    def __init__(self):
+        self._heap = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        
+    def __len__(self):
+        return len(self._heap)
+        
+    def push(self, item, delay):
+        """加入队列，delay 秒后到期"""
+        with self._lock:
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._counter), item))
+        
+    def pop(self):
+        """取出最早到期的条目，返回 (剩余等待秒数, 条目)"""
+        with self._lock:
+            due, _, item = heapq.heappop(self._heap)
+        return max(0.0, due - time.monotonic()), item
@@ -0,0 +1,63 @@
+import os
+import time
+import threading
+
+
+class ScanCache:
+    """缓存目录扫描结果，供预览之后的同步直接使用
+    
+    使用前按目录修改时间复核（新增、删除、重命名文件会改变所在目录的修改时间），
+    超过有效期的结果直接丢弃；文件内容原地修改不会改变目录修改时间，由有效期兜底
+    """
+    
+    # 目录修改时间的精度余量（FAT 为 2 秒），扫描开始前这段时间内被修改的目录也不缓存
+    MTIME_GRANULARITY_NS = 2 * 10**9
+    
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+        
+    def get(self, directory, filter_key):
+        """返回仍然有效的扫描结果，失效或没有缓存时返回None"""
+        key = (os.path.abspath(directory), filter_key)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+            
+        if not self.ttl or time.time() - entry['time'] > self.ttl or not self._revalidate(entry['dir_mtimes']):
+            with self._lock:
+                self._entries.pop(key, None)
+            return None
+        return entry['files']
+        
+    def put(self, directory, filter_key, files, dir_mtimes, started_ns):
+        """保存扫描结果；扫描过程中有目录被修改时不缓存"""
+        if not self.ttl:
+            return
+        if any(mtime_ns >= started_ns - self.MTIME_GRANULARITY_NS for mtime_ns in dir_mtimes.values()):
+            return
+        key = (os.path.abspath(directory), filter_key)
+        with self._lock:
+            self._entries[key] = {'files': files, 'dir_mtimes': dir_mtimes, 'time': time.time()}
+            
+    def invalidate(self, directory=None):
+        """使某个目录（或全部）的缓存失效"""
+        with self._lock:
+            if directory is None:
+                self._entries.clear()
+                return
+            directory = os.path.abspath(directory)
+            for key in [key for key in self._entries if key[0] == directory]:
+                del self._entries[key]
+                
+    def _revalidate(self, dir_mtimes):
+        """逐个检查目录的修改时间是否与扫描时一致"""
+        for directory, mtime_ns in dir_mtimes.items():
+            try:
+                if os.stat(directory).st_mtime_ns != mtime_ns:
+                    return False
+            except OSError:
+                return False
+        return True
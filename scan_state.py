@@ -0,0 +1,43 @@
+import os
+import json
+import hashlib
+import time
+
+
+class ScanState:
+    """增量扫描状态：记录每个目录上次列出时的修改时间、子目录和文件信息，保存到磁盘供下次运行使用
+    
+    dirs 以相对路径为键（根目录为空字符串），值为
+    {'mtime_ns': ..., 'stable': ..., 'subdirs': [...], 'files': {文件名: [大小, 修改时间]}}
+    """
+    
+    def __init__(self, state_dir, directory, filter_key):
+        self.state_dir = state_dir
+        key_source = json.dumps([os.path.abspath(directory), filter_key], ensure_ascii=False)
+        self.state_path = os.path.join(state_dir, f"{hashlib.md5(key_source.encode('utf-8')).hexdigest()}.json")
+        self.dirs = {}
+        self.last_full_scan = 0
+        
+    def load(self):
+        """加载上次的扫描状态，文件不存在或损坏时视为没有状态"""
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.dirs = data.get('dirs', {})
+            self.last_full_scan = data.get('last_full_scan', 0)
+        except (OSError, ValueError):
+            self.dirs = {}
+            self.last_full_scan = 0
+        return self
+        
+    def needs_full_scan(self, interval):
+        """距上次完整扫描超过 interval 秒时需要重新完整扫描（0 表示不强制）"""
+        return not self.dirs or (interval and time.time() - self.last_full_scan > interval)
+        
+    def save(self):
+        """原子写入扫描状态"""
+        os.makedirs(self.state_dir, exist_ok=True)
+        temp_path = self.state_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'last_full_scan': self.last_full_scan, 'dirs': self.dirs}, f, ensure_ascii=False)
+        os.replace(temp_path, self.state_path)
@@ -0,0 +1,142 @@
+import os
+import errno
+import threading
+import time
+
+
+class SpaceGuard:
+    """目标空间检查：同步前按目标所在设备汇总需要写入的空间并与剩余空间比较，运行中定期复查
+    
+    更新动作需要的空间为新旧文件大小之差（保留旧版本时旧文件不释放），写入期间临时文件
+    和旧文件同时存在，按顺序执行时的峰值占用不能超过剩余空间减去保留空间
+    
+    配置项:
+        space_check: off（不检查）/ fail（空间不足时不开始同步，默认）/ reorder（先执行释放空间的更新，放不下的文件本次跳过）
+        space_reserve: 每个设备保留的剩余空间（字节）
+        space_check_interval: 运行中重新读取剩余空间的间隔（秒），其间按已写入的大小估算
+    """
+    
+    POLICIES = ('off', 'fail', 'reorder')
+    
+    def __init__(self, utils, policy='fail', reserve=0, check_interval=5, keep_replaced=False, link_duplicates=False):
+        if policy not in self.POLICIES:
+            raise ValueError(f"不支持的空间检查策略: {policy}")
+        self.utils = utils
+        self.policy = policy
+        self.reserve = reserve or 0
+        self.check_interval = check_interval
+        self.keep_replaced = keep_replaced
+        self.link_duplicates = link_duplicates
+        self._lock = threading.Lock()
+        # 设备号 -> {'path': 设备上的目录, 'free': 估算的剩余空间, 'checked': 上次读取时间}
+        self._devices = {}
+        self._dir_devices = {}
+        
+    def plan(self, actions, log_callback):
+        """预检：返回 (要执行的动作, 本次放不下的动作)；fail 策略下空间不足时抛出 OSError(ENOSPC)"""
+        entries = []
+        for action in actions:
+            if action['action'] not in ('copy', 'update') or self._is_linked(action):
+                continue
+            entries.append((action, self._get_device(action['target']), self._get_need(action)))
+        if not entries:
+            return actions, []
+            
+        # 按当前顺序模拟执行，计算每个设备的峰值占用
+        used = {}
+        peak = {}
+        for action, device, need in entries:
+            peak[device] = max(peak.get(device, 0), used.get(device, 0) + action['size'])
+            used[device] = used.get(device, 0) + need
+        short = {}
+        for device in peak:
+            available = self._refresh(device) - self.reserve
+            if peak[device] > available:
+                short[device] = available
+        if not short:
+            return actions, []
+            
+        details = '；'.join(f"{self._devices[device]['path']} 需要 {self.utils.format_file_size(peak[device])}，"
+                           f"可用 {self.utils.format_file_size(max(available, 0))}" for device, available in short.items())
+        if self.policy == 'fail':
+            raise OSError(errno.ENOSPC, f"目标空间不足: {details}")
+            
+        # 释放空间的更新先执行，其余按原顺序放入，放不下的本次跳过
+        freeing = [entry for entry in entries if entry[1] in short and entry[2] < 0]
+        used = {device: 0 for device in short}
+        for action, device, need in freeing:
+            used[device] += need
+        deferred = []
+        for action, device, need in entries:
+            if device not in short or need < 0:
+                continue
+            if used[device] + action['size'] <= short[device]:
+                used[device] += need
+            else:
+                action['error'] = "目标空间不足"
+                deferred.append(action)
+                
+        moved_ids = {id(entry[0]) for entry in freeing} | {id(action) for action in deferred}
+        ordered = [entry[0] for entry in freeing] + [action for action in actions if id(action) not in moved_ids]
+        log_callback(f"目标空间不足（{details}），先执行 {len(freeing)} 个释放空间的更新，"
+                     f"{len(deferred)} 个文件（{self.utils.format_file_size(sum(a['size'] for a in deferred))}）本次跳过")
+        return ordered, deferred
+        
+    def claim(self, action, fallback=False):
+        """写入前确认目标设备还有足够的空间，不足时抛出 OSError(ENOSPC)，不再开始写入
+        
+        链接到目标端已有文件的动作不占用空间，无法链接、改为写入数据时以 fallback=True 确认
+        """
+        if action['action'] not in ('copy', 'update') or self._is_linked(action) != fallback:
+            return
+        device = self._get_device(action['target'])
+        need = self._get_need(action)
+        with self._lock:
+            entry = self._devices[device]
+            # 到达复查间隔或估算值不足时重新读取（其他文件可能已被删除）
+            if (entry['checked'] is None or time.monotonic() - entry['checked'] >= self.check_interval
+                    or entry['free'] - action['size'] < self.reserve):
+                self._refresh(device)
+            if entry['free'] - action['size'] < self.reserve:
+                raise OSError(errno.ENOSPC, f"目标空间不足: 剩余 {self.utils.format_file_size(max(entry['free'], 0))}，"
+                                            f"需要 {self.utils.format_file_size(action['size'])}")
+            entry['free'] -= max(need, 0)
+            
+    def _is_linked(self, action):
+        """动作是否链接到目标端已有的文件（硬链接组的其余成员，按硬链接去重的重复文件）"""
+        return bool(action.get('hardlink_of') or (self.link_duplicates and action.get('dedup_of')))
+        
+    def _get_need(self, action):
+        """动作完成后目标设备增加的占用（替换文件时扣除旧文件大小）"""
+        if action['action'] != 'update' or self.keep_replaced:
+            return action['size']
+        try:
+            return action['size'] - os.stat(action['target']).st_size
+        except OSError:
+            return action['size']
+            
+    def _get_device(self, path):
+        """目标路径所在设备（目标目录还不存在时取最近的已存在上级目录）"""
+        directory = os.path.dirname(os.path.abspath(path))
+        device = self._dir_devices.get(directory)
+        if device is not None:
+            return device
+        existing = directory
+        while not os.path.exists(existing) and os.path.dirname(existing) != existing:
+            existing = os.path.dirname(existing)
+        try:
+            device = os.stat(existing).st_dev
+        except OSError:
+            device = existing
+        with self._lock:
+            self._devices.setdefault(device, {'path': existing, 'free': float('inf'), 'checked': None})
+        self._dir_devices[directory] = device
+        return device
+        
+    def _refresh(self, device):
+        """重新读取设备的剩余空间，无法读取时不限制"""
+        entry = self._devices[device]
+        usage = self.utils.get_disk_usage(entry['path'])
+        entry['free'] = usage['free'] if usage else float('inf')
+        entry['checked'] = time.monotonic()
+        return entry['free']
@@ -0,0 +1,536 @@
+import os
+import stat
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, unquote
+
+
+class StorageError(Exception):
+    """存储后端不可用或操作失败"""
+
+
+class ConnectionPool:
+    """简单的连接池：按需创建连接，最多 max_size 个，用完归还"""
+    
+    def __init__(self, factory, max_size=4, close=None):
+        self.factory = factory
+        self.max_size = max_size
+        self._close = close
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._all = []
+        
+    def acquire(self):
+        """取出一个空闲连接，没有空闲连接且未达到上限时新建，否则等待"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._created < self.max_size
+            if create:
+                self._created += 1
+        if not create:
+            return self._idle.get()
+        try:
+            connection = self.factory()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+        with self._lock:
+            self._all.append(connection)
+        return connection
+        
+    def release(self, connection, broken=False):
+        """归还连接；出错的连接直接关闭，之后按需重建"""
+        if not broken:
+            self._idle.put(connection)
+            return
+        with self._lock:
+            self._created -= 1
+            if connection in self._all:
+                self._all.remove(connection)
+        self._close_connection(connection)
+        
+    def close(self):
+        """关闭全部连接"""
+        with self._lock:
+            connections, self._all = self._all, []
+            self._created = 0
+        self._idle = queue.LifoQueue()
+        for connection in connections:
+            self._close_connection(connection)
+            
+    def _close_connection(self, connection):
+        if self._close:
+            try:
+                self._close(connection)
+            except Exception:
+                pass
+
+
+class PooledFile:
+    """包装后端返回的文件对象，关闭时把连接归还连接池"""
+    
+    def __init__(self, file, release):
+        self._file = file
+        self._release = release
+        
+    def read(self, size=-1):
+        return self._file.read(size)
+        
+    def write(self, data):
+        return self._file.write(data)
+        
+    def close(self):
+        if self._file is None:
+            return
+        file, self._file = self._file, None
+        broken = False
+        try:
+            file.close()
+        except Exception:
+            broken = True
+            raise
+        finally:
+            self._release(broken)
+            
+    def abort(self):
+        """放弃写入（连接状态未知，不再复用）"""
+        if self._file is None:
+            return
+        file, self._file = self._file, None
+        try:
+            file.close()
+        except Exception:
+            pass
+        self._release(True)
+        
+    def __enter__(self):
+        return self
+        
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class StorageBackend:
+    """存储后端接口：路径均为相对于根目录、以 / 分隔的相对路径（根目录为空字符串）
+    
+    atomic_writes 为 True 的后端写入完成后才可见，不需要临时文件和重命名
+    """
+    
+    atomic_writes = False
+    
+    def __init__(self, url):
+        self.url = url
+        
+    def list_dir(self, path):
+        """列出目录，返回 [(名称, 是否目录, 大小, 修改时间)]"""
+        raise NotImplementedError
+        
+    def walk(self):
+        """递归列出全部文件，生成 (相对路径, 大小, 修改时间)"""
+        pending = ['']
+        while pending:
+            directory = pending.pop()
+            for name, is_dir, size, mtime in self.list_dir(directory):
+                path = f"{directory}/{name}" if directory else name
+                if is_dir:
+                    pending.append(path)
+                else:
+                    yield path, size, mtime
+                    
+    def stat(self, path):
+        """返回 (大小, 修改时间)，不存在时返回None"""
+        raise NotImplementedError
+        
+    def open_read(self, path):
+        raise NotImplementedError
+        
+    def open_write(self, path, mtime=None):
+        """打开写入（自动创建上级目录），关闭后生效；异常退出 with 时放弃写入"""
+        raise NotImplementedError
+        
+    def rename(self, source, target):
+        """重命名，目标已存在时覆盖"""
+        raise NotImplementedError
+        
+    def delete(self, path):
+        raise NotImplementedError
+        
+    def set_mtime(self, path, mtime):
+        raise NotImplementedError
+        
+    def close(self):
+        """释放连接"""
+
+
+class LocalBackend(StorageBackend):
+    """本地目录（也用于在本地验证远程目标的同步流程）"""
+    
+    def __init__(self, url, root):
+        super().__init__(url)
+        self.root = os.path.abspath(root)
+        
+    def _full_path(self, path):
+        return os.path.join(self.root, *path.split('/')) if path else self.root
+        
+    def list_dir(self, path):
+        entries = []
+        try:
+            with os.scandir(self._full_path(path)) as items:
+                for item in items:
+                    try:
+                        item_stat = item.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if stat.S_ISDIR(item_stat.st_mode):
+                        entries.append((item.name, True, 0, item_stat.st_mtime))
+                    elif stat.S_ISREG(item_stat.st_mode):
+                        entries.append((item.name, False, item_stat.st_size, item_stat.st_mtime))
+        except FileNotFoundError:
+            pass
+        return entries
+        
+    def stat(self, path):
+        try:
+            file_stat = os.stat(self._full_path(path))
+        except FileNotFoundError:
+            return None
+        return file_stat.st_size, file_stat.st_mtime
+        
+    def open_read(self, path):
+        return open(self._full_path(path), 'rb')
+        
+    def open_write(self, path, mtime=None):
+        full_path = self._full_path(path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        return PooledFile(open(full_path, 'wb'), lambda broken: None)
+        
+    def rename(self, source, target):
+        os.replace(self._full_path(source), self._full_path(target))
+        
+    def delete(self, path):
+        os.remove(self._full_path(path))
+        
+    def set_mtime(self, path, mtime):
+        os.utime(self._full_path(path), (mtime, mtime))
+
+
+class SFTPBackend(StorageBackend):
+    """SFTP 后端（需要安装 paramiko）：连接池，多个目录并行列出，写入使用流水线模式"""
+    
+    def __init__(self, url, host, port, username, root, password=None, key_file=None, pool_size=4, timeout=30):
+        super().__init__(url)
+        try:
+            import paramiko
+        except ImportError:
+            raise StorageError("SFTP 后端需要安装 paramiko")
+        self._paramiko = paramiko
+        self.host = host
+        self.port = port or 22
+        self.username = username
+        self.root = root.rstrip('/') or '/'
+        self.password = password
+        self.key_file = key_file
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.pool = ConnectionPool(self._connect, pool_size, lambda connection: connection[0].close())
+        
+    def _connect(self):
+        client = self._paramiko.SSHClient()
+        client.load_system_host_keys()
+        client.set_missing_host_key_policy(self._paramiko.RejectPolicy())
+        client.connect(self.host, self.port, self.username, password=self.password,
+                       key_filename=self.key_file, timeout=self.timeout)
+        return client, client.open_sftp()
+        
+    def _full_path(self, path):
+        return f"{self.root.rstrip('/')}/{path}" if path else self.root
+        
+    def _call(self, operation):
+        """取一个连接执行操作，连接出错时丢弃"""
+        connection = self.pool.acquire()
+        try:
+            result = operation(connection[1])
+        except (OSError, EOFError, self._paramiko.SSHException) as e:
+            # 文件不存在等带错误码的 SFTP 状态错误不影响连接
+            self.pool.release(connection, broken=getattr(e, 'errno', None) is None)
+            raise
+        self.pool.release(connection)
+        return result
+        
+    def list_dir(self, path):
+        try:
+            attributes = self._call(lambda sftp: sftp.listdir_attr(self._full_path(path)))
+        except FileNotFoundError:
+            return []
+        entries = []
+        for attr in attributes:
+            if stat.S_ISDIR(attr.st_mode):
+                entries.append((attr.filename, True, 0, attr.st_mtime))
+            elif stat.S_ISREG(attr.st_mode):
+                entries.append((attr.filename, False, attr.st_size, attr.st_mtime))
+        return entries
+        
+    def walk(self):
+        """用连接池中的多个连接并行列出目录（listdir_attr 一次返回大小和修改时间，无需逐个 stat）"""
+        with ThreadPoolExecutor(max_workers=self.pool_size) as executor:
+            futures = {executor.submit(self.list_dir, ''): ''}
+            while futures:
+                future = next(iter(futures))
+                directory = futures.pop(future)
+                for name, is_dir, size, mtime in future.result():
+                    path = f"{directory}/{name}" if directory else name
+                    if is_dir:
+                        futures[executor.submit(self.list_dir, path)] = path
+                    else:
+                        yield path, size, mtime
+                        
+    def stat(self, path):
+        try:
+            attr = self._call(lambda sftp: sftp.stat(self._full_path(path)))
+        except FileNotFoundError:
+            return None
+        return attr.st_size, attr.st_mtime
+        
+    def open_read(self, path):
+        connection = self.pool.acquire()
+        try:
+            file = connection[1].open(self._full_path(path), 'rb')
+            file.prefetch()
+        except Exception:
+            self.pool.release(connection, broken=True)
+            raise
+        return PooledFile(file, lambda broken: self.pool.release(connection, broken))
+        
+    def open_write(self, path, mtime=None):
+        connection = self.pool.acquire()
+        try:
+            self._makedirs(connection[1], os.path.dirname(self._full_path(path)))
+            file = connection[1].open(self._full_path(path), 'wb')
+            # 流水线写入：不逐块等待服务器确认
+            file.set_pipelined(True)
+        except Exception:
+            self.pool.release(connection, broken=True)
+            raise
+        return PooledFile(file, lambda broken: self.pool.release(connection, broken))
+        
+    def _makedirs(self, sftp, directory):
+        missing = []
+        while directory and directory != '/':
+            try:
+                sftp.stat(directory)
+                break
+            except FileNotFoundError:
+                missing.append(directory)
+                directory = os.path.dirname(directory)
+        for directory in reversed(missing):
+            try:
+                sftp.mkdir(directory)
+            except IOError:
+                pass
+                
+    def rename(self, source, target):
+        self._call(lambda sftp: sftp.posix_rename(self._full_path(source), self._full_path(target)))
+        
+    def delete(self, path):
+        self._call(lambda sftp: sftp.remove(self._full_path(path)))
+        
+    def set_mtime(self, path, mtime):
+        self._call(lambda sftp: sftp.utime(self._full_path(path), (mtime, mtime)))
+        
+    def close(self):
+        self.pool.close()
+
+
+class S3MultipartWriter:
+    """S3 分段上传：缓冲到 part_size 后在线程池中并行上传分段，关闭时完成上传；小文件直接上传"""
+    
+    def __init__(self, backend, key, metadata):
+        self.backend = backend
+        self.key = key
+        self.metadata = metadata
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._parts = []
+        self._executor = None
+        
+    def write(self, data):
+        self._buffer += data
+        while len(self._buffer) >= self.backend.part_size:
+            part = bytes(self._buffer[:self.backend.part_size])
+            del self._buffer[:self.backend.part_size]
+            self._upload_part(part)
+        return len(data)
+        
+    def _upload_part(self, data):
+        backend = self.backend
+        if self._upload_id is None:
+            response = backend._call(lambda client: client.create_multipart_upload(
+                Bucket=backend.bucket, Key=self.key, Metadata=self.metadata))
+            self._upload_id = response['UploadId']
+            self._executor = ThreadPoolExecutor(max_workers=backend.pool_size)
+        part_number = len(self._parts) + 1
+        self._parts.append(self._executor.submit(backend._call, lambda client: client.upload_part(
+            Bucket=backend.bucket, Key=self.key, UploadId=self._upload_id, PartNumber=part_number, Body=data)))
+        # 限制同时缓冲在内存中的分段数
+        pending = [future for future in self._parts if not future.done()]
+        if len(pending) > backend.pool_size:
+            pending[0].result()
+            
+    def close(self):
+        backend = self.backend
+        if self._upload_id is None:
+            data = bytes(self._buffer)
+            backend._call(lambda client: client.put_object(Bucket=backend.bucket, Key=self.key, Body=data, Metadata=self.metadata))
+            return
+        try:
+            if self._buffer:
+                self._upload_part(bytes(self._buffer))
+                self._buffer = bytearray()
+            parts = [{'PartNumber': index + 1, 'ETag': future.result()['ETag']} for index, future in enumerate(self._parts)]
+            backend._call(lambda client: client.complete_multipart_upload(
+                Bucket=backend.bucket, Key=self.key, UploadId=self._upload_id, MultipartUpload={'Parts': parts}))
+        except Exception:
+            self.abort()
+            raise
+        finally:
+            self._executor.shutdown(wait=False)
+            
+    def abort(self):
+        """放弃上传，删除已上传的分段"""
+        if self._upload_id is None:
+            return
+        upload_id, self._upload_id = self._upload_id, None
+        try:
+            self.backend._call(lambda client: client.abort_multipart_upload(
+                Bucket=self.backend.bucket, Key=self.key, UploadId=upload_id))
+        except Exception:
+            pass
+            
+    def __enter__(self):
+        return self
+        
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class S3Backend(StorageBackend):
+    """S3 兼容对象存储（需要安装 boto3，endpoint_url 可指向 MinIO 等兼容服务）
+    
+    对象上传完成后才可见，直接写入目标键；修改时间使用对象的 LastModified（上传时间），
+    因此上传后的对象总是比源文件新，只在源文件再次修改后才会更新
+    """
+    
+    atomic_writes = True
+    
+    def __init__(self, url, bucket, prefix, endpoint_url=None, region=None, access_key=None, secret_key=None,
+                 pool_size=4, part_size=8 * 1024 * 1024):
+        super().__init__(url)
+        try:
+            import boto3
+        except ImportError:
+            raise StorageError("S3 后端需要安装 boto3")
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self.pool_size = pool_size
+        # S3 要求除最后一段外每段至少 5MB
+        self.part_size = max(part_size, 5 * 1024 * 1024)
+        session = boto3.session.Session(aws_access_key_id=access_key, aws_secret_access_key=secret_key, region_name=region)
+        self.pool = ConnectionPool(lambda: session.client('s3', endpoint_url=endpoint_url), pool_size)
+        
+    def _key(self, path):
+        return f"{self.prefix}/{path}" if self.prefix else path
+        
+    def _call(self, operation):
+        client = self.pool.acquire()
+        try:
+            return operation(client)
+        finally:
+            self.pool.release(client)
+            
+    def list_dir(self, path):
+        base = self._key(path) if path else self.prefix
+        prefix = base + '/' if base else ''
+        entries = []
+        paginator = self._call(lambda client: client.get_paginator('list_objects_v2'))
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix, Delimiter='/'):
+            for common in page.get('CommonPrefixes', []):
+                entries.append((common['Prefix'][len(prefix):].rstrip('/'), True, 0, 0))
+            for item in page.get('Contents', []):
+                entries.append((item['Key'][len(prefix):], False, item['Size'], item['LastModified'].timestamp()))
+        return entries
+        
+    def walk(self):
+        """不按目录逐层列出，整个前缀分页列出（每页最多1000个对象）"""
+        prefix = self.prefix + '/' if self.prefix else ''
+        paginator = self._call(lambda client: client.get_paginator('list_objects_v2'))
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+            for item in page.get('Contents', []):
+                path = item['Key'][len(prefix):]
+                if path and not path.endswith('/'):
+                    yield path, item['Size'], item['LastModified'].timestamp()
+                    
+    def stat(self, path):
+        try:
+            response = self._call(lambda client: client.head_object(Bucket=self.bucket, Key=self._key(path)))
+        except Exception as e:
+            if getattr(e, 'response', {}).get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+        return response['ContentLength'], response['LastModified'].timestamp()
+        
+    def open_read(self, path):
+        response = self._call(lambda client: client.get_object(Bucket=self.bucket, Key=self._key(path)))
+        return response['Body']
+        
+    def open_write(self, path, mtime=None):
+        metadata = {'mtime': str(mtime)} if mtime is not None else {}
+        return S3MultipartWriter(self, self._key(path), metadata)
+        
+    def rename(self, source, target):
+        self._call(lambda client: client.copy_object(
+            Bucket=self.bucket, Key=self._key(target), CopySource={'Bucket': self.bucket, 'Key': self._key(source)}))
+        self.delete(source)
+        
+    def delete(self, path):
+        self._call(lambda client: client.delete_object(Bucket=self.bucket, Key=self._key(path)))
+        
+    def set_mtime(self, path, mtime):
+        """对象存储不能修改 LastModified，源文件的修改时间已随上传写入对象元数据"""
+        
+    def close(self):
+        self.pool.close()
+
+
+def is_remote_path(path):
+    """是否为需要存储后端访问的 URL（file:// sftp:// s3://）"""
+    return isinstance(path, str) and urlparse(path).scheme in ('file', 'sftp', 's3')
+
+
+def create_backend(url, config=None):
+    """根据 URL 创建存储后端: file:///路径、sftp://用户@主机:端口/路径、s3://存储桶/前缀"""
+    config = config or {}
+    parsed = urlparse(url)
+    pool_size = config.get('storage_pool_size', 4)
+    if parsed.scheme == 'file':
+        return LocalBackend(url, unquote(parsed.path))
+    if parsed.scheme == 'sftp':
+        return SFTPBackend(url, parsed.hostname, parsed.port, unquote(parsed.username or '') or None, unquote(parsed.path),
+                           password=config.get('sftp_password'), key_file=config.get('sftp_key_file'), pool_size=pool_size)
+    if parsed.scheme == 's3':
+        return S3Backend(url, parsed.netloc, unquote(parsed.path), endpoint_url=config.get('s3_endpoint_url'),
+                         region=config.get('s3_region'), access_key=config.get('s3_access_key'),
+                         secret_key=config.get('s3_secret_key'), pool_size=pool_size,
+                         part_size=config.get('s3_part_size', 8 * 1024 * 1024))
+    raise StorageError(f"不支持的存储地址: {url}")
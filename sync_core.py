@@ -2,20 +2,119 @@ import os
 import shutil
 import hashlib
 import time
+import stat
+import tempfile
+import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import fnmatch
-from datetime import datetime
+from datetime import datetime, timedelta
 from utils import Utils
+from profiler import SyncProfiler, ProfileCapture
+from metrics import SyncMetrics
+from journal import RunJournal, estimate_throughput
+from retry import RetryPolicy, RetryQueue
+from checkpoint import SyncCheckpoint
+from throttle import Throttle
+from planner import ActionPlanner
+from scan_cache import ScanCache
+from scan_state import ScanState
+from watcher import create_watcher
+from coalescer import EventCoalescer
+from transport import TransportClient, TransportReceiver
+from storage import create_backend, is_remote_path
+from audit import lower_thread_priority
+from space import SpaceGuard
+from path_index import PathIndex
+
+# 同步过程中写入的临时文件后缀，扫描时忽略
+TEMP_SUFFIX = ".synctmp"
+
+# 重复内容的生成方式: none 不去重 / copy 从目标端已复制的文件本地复制 / reflink 写时复制克隆（不支持时本地复制）/
+# hardlink 修改时间相同的重复文件硬链接（否则按 reflink 处理）
+DEDUP_POLICIES = ('none', 'copy', 'reflink', 'hardlink')
+
+# Linux FICLONE ioctl
+FICLONE = 0x40049409
+
+# 符号链接的处理方式：follow 按指向的文件同步，copy 作为链接复制，skip 跳过
+SYMLINK_MODES = ('follow', 'copy', 'skip')
+
+# 版本目录下每次运行的子目录名格式
+VERSION_STAMP_FORMAT = '%Y%m%d-%H%M%S'
+
+class SyncStopped(Exception):
+    """复制过程中收到停止请求"""
 
 class SyncCore:
     def __init__(self):
         self.utils = Utils()
         self.stop_flag = False
+        self.is_syncing = False
+        self.is_previewing = False
         self.max_retries = 5
+        self.retry_delay = 1
+        self.max_retry_delay = 60
+        self.profiler = SyncProfiler()
+        self._hash_cache = {}
+        self._hash_lock = threading.Lock()
+        self._hashing = {}
+        self.metrics = SyncMetrics()
+        self._published_counters = {}
+        self._checkpoint = None
+        self.resume_min_size = 64 * 1024 * 1024
+        self.resume_checkpoint_interval = 64 * 1024 * 1024
+        self.verify_hash = True
+        self.fsync_policy = 'none'
+        self.fsync_batch_size = 256
+        self._pending_dir_syncs = set()
+        self._dir_sync_lock = threading.Lock()
+        self.small_file_threshold = 64 * 1024
+        self.small_file_batch_size = 256
+        # 大文件通道默认关闭，按配置启用
+        self.large_file_threshold = 0
+        self.dedup_policy = 'none'
+        self.dedup_min_size = 64 * 1024
+        self._dedup_link_targets = {}
+        self.transport = None
+        self._loopback_receiver = None
+        self.target_backend = None
+        self._created_dirs = set()
+        self.versioning = False
+        self.versions_dir = '.versions'
+        self._version_stamp = None
+        self._sync_roots = []
+        self._stale_scan_dirs = set()
+        self._prune_thread = None
+        self.space_guard = None
+        self.symlink_mode = 'follow'
+        self.preserve_hardlinks = False
+        self.sparse_copy = False
+        self.sync_permissions = False
+        self.sync_xattrs = False
+        self.path_index = PathIndex()
+        self.throttle = Throttle()
+        self.scan_cache = ScanCache()
+        # 预览期间保存扫描结果，预览过的目录集合供随后的同步核对
+        self._scan_cache_fill = False
+        self._preview_roots = None
+        self.incremental_scan = False
+        self.scan_state_dir = 'scan_state'
+        self.full_scan_interval = 24 * 3600
+        self._dirty_dirs = set()
+        self._dirty_subtrees = set()
+        self._unsettled_paths = set()
+        self.metadata_fixup = False
+        self._watch_stop = threading.Event()
         
     def sync_directories(self, config):
         """同步目录"""
+        if config.get('target_paths'):
+            return self.sync_fan_out(config)
+            
         self.stop_flag = False
+        self.is_syncing = True
         source_path = config['source_path']
         target_path = config['target_path']
         sync_mode = config['sync_mode']
@@ -23,53 +122,851 @@ class SyncCore:
         progress_callback = config.get('progress_callback')
         log_callback = config.get('log_callback')
         
-        try:
-            # 解析过滤规则
-            include_patterns, exclude_patterns = self._parse_filter_rules(filter_rules)
-            
-            # 获取文件列表
-            log_callback("正在扫描文件...")
-            source_files = self._get_file_list(source_path, include_patterns, exclude_patterns)
-            target_files = self._get_file_list(target_path, include_patterns, exclude_patterns)
-            
-            log_callback(f"源目录文件数: {len(source_files)}")
-            log_callback(f"目标目录文件数: {len(target_files)}")
-            
-            # 比较文件
-            sync_actions = self._compare_files(source_path, target_path, source_files, target_files, sync_mode)
+        # 性能统计与可选的采样分析（哈希缓存按大小和修改时间校验，可沿用预览时的结果）
+        self.profiler = SyncProfiler()
+        self._published_counters = {}
+        capture = ProfileCapture(config.get('profile_mode'), config.get('profile_output_dir', 'logs'))
+        if capture.mode and not capture.start():
+            log_callback(f"无法启用性能采样: {capture.mode}")
+            capture = None
             
+        # 指标按配置名打标签
+        profile_name = config.get('profile_name', 'default')
+        self._start_metrics_endpoint(config, log_callback)
+        
+        # 结构化运行日志
+        run_summary = {'total_actions': 0, 'completed': 0, 'failed': 0, 'stopped': False, 'error': None}
+        journal = self._open_journal(config, profile_name, log_callback)
+        
+        # 检查点：中断后从第一个未完成的动作继续
+        checkpoint = None
+        if config.get('resume', True):
+            checkpoint = SyncCheckpoint(config.get('checkpoint_dir', 'checkpoints'), source_path, target_path, sync_mode, filter_rules)
+        self._checkpoint = checkpoint
+        
+        # 写入与校验策略
+        self.verify_hash = config.get('verify_hash', True)
+        self.fsync_policy = config.get('fsync_policy', 'none')
+        self.sparse_copy = config.get('sparse_copy', False)
+        self._pending_dir_syncs = set()
+        self._created_dirs = set()
+        small_file_threshold = config.get('small_file_threshold', self.small_file_threshold)
+        small_file_batch_size = config.get('small_file_batch_size', self.small_file_batch_size)
+        self.dedup_policy = config.get('dedup_policy', 'none')
+        
+        # 版本保留：被替换的旧文件硬链接到目标根目录下按本次运行时间命名的版本目录
+        self.versioning = config.get('versioning', False)
+        self._version_stamp = datetime.now().strftime(VERSION_STAMP_FORMAT)
+        self._sync_roots = [target_path, source_path] if sync_mode == "双向同步" else [target_path]
+        self._stale_scan_dirs = set()
+        
+        # 限速（运行中可通过 self.throttle 调整）
+        self.throttle.configure(config, lambda: self.stop_flag)
+        self._configure_scan(config)
+        self._take_preview_scan([source_path, target_path])
+        
+        try:
+            # 远程目标（sftp:// s3:// file://）通过存储后端逐个写入，不做小文件批量和内容去重
+            self._open_target_backend(config, target_path)
+            if self.target_backend:
+                small_file_threshold = 0
+                self.dedup_policy = 'none'
+                
+            # 压缩传输：数据经接收端写入目标，不再批量处理小文件
+            self._open_transport(config, target_path, log_callback)
+            if self.transport:
+                small_file_threshold = 0
+                
+            planner = self._create_planner(config)
+            sync_actions = checkpoint.load(config.get('checkpoint_max_age')) if checkpoint else None
+            if sync_actions is not None:
+                first_index = checkpoint.get_first_incomplete(len(sync_actions))
+                log_callback(f"从检查点恢复: 已完成 {len(checkpoint.done)}/{len(sync_actions)} 个动作，从第 {first_index + 1} 个继续")
+            else:
+                sync_actions = self._plan_sync(source_path, target_path, sync_mode, filter_rules, planner, log_callback)
+                first_index = 0
+                if checkpoint and sync_actions:
+                    checkpoint.save_plan(sync_actions)
+                    
             total_actions = len(sync_actions)
+            run_summary['total_actions'] = total_actions
+            run_summary['completed'] = len(checkpoint.done) if checkpoint else 0
+            self.metrics.inc('sync_actions_planned_total', total_actions, profile=profile_name)
+            self.metrics.set('sync_pending_actions', total_actions - run_summary['completed'], profile=profile_name)
             if total_actions == 0:
                 log_callback("没有需要同步的文件")
                 return "同步完成，没有文件需要更新"
                 
             log_callback(f"需要同步的文件数: {total_actions}")
             
-            # 执行同步
-            completed = 0
-            for action in sync_actions:
+            # 执行同步：失败的动作放入延迟重试队列，主流程结束后再处理
+            retry_policy = RetryPolicy(
+                config.get('max_retries', self.max_retries),
+                config.get('retry_base_delay', self.retry_delay),
+                config.get('retry_max_delay', self.max_retry_delay)
+            )
+            retry_queue = RetryQueue()
+            
+            # 大文件通道在后台线程中执行，完成记录需要加锁
+            state_lock = threading.Lock()
+            
+            def notify_progress():
+                if checkpoint:
+                    checkpoint.flush()
+                if progress_callback:
+                    progress = (run_summary['completed'] / total_actions) * 100
+                    progress_callback(progress)
+                    
+            def finish_action(action, success, duration, notify=True):
+                with state_lock:
+                    if success:
+                        run_summary['completed'] += 1
+                        if checkpoint:
+                            checkpoint.mark_done(action['index'], flush=False)
+                    else:
+                        run_summary['failed'] += 1
+                    processed = run_summary['completed'] + run_summary['failed']
+                    self._record_action_metrics(profile_name, success, duration, total_actions - processed, len(retry_queue))
+                    if journal:
+                        journal.record_action(action, success, duration)
+                        
+                    # 更新进度（批量处理时由批次结束统一更新）
+                    if notify:
+                        notify_progress()
+                        
+            def run_batch(execute_batch, batch):
+                for action, success in execute_batch(batch, finish_action, log_callback):
+                    # 批量处理失败的文件按普通流程单独处理（含重试）
+                    if not success:
+                        self._run_action(action, retry_policy, retry_queue, finish_action, log_callback)
+                with state_lock:
+                    notify_progress()
+                    
+            lane_errors = []
+            
+            def run_large_lane(actions):
+                try:
+                    for action in actions:
+                        if self.stop_flag:
+                            break
+                        self._run_action(action, retry_policy, retry_queue, finish_action, log_callback)
+                except Exception as e:
+                    lane_errors.append(e)
+                    
+            # 大文件单独成一条通道，不阻塞后面的小文件
+            pending_actions = [a for a in sync_actions[first_index:] if not (checkpoint and a['index'] in checkpoint.done)]
+            # 硬链接组的其余成员在组内首个文件复制完成后链接，不参与去重
+            linked_actions = [a for a in pending_actions if a.get('hardlink_of')]
+            if linked_actions:
+                pending_actions = [a for a in pending_actions if not a.get('hardlink_of')]
+            pending_actions, duplicate_actions = self._dedup_actions(pending_actions, config.get('dedup_min_size', self.dedup_min_size), log_callback)
+            duplicate_actions = linked_actions + duplicate_actions
+            # 空间预检：放不下时不开始写入，或先执行释放空间的更新、跳过放不下的文件（硬链接和去重生成的链接不占用空间）
+            duplicate_ids = {id(action) for action in duplicate_actions}
+            planned_actions, deferred_actions = self._preflight_space(config, pending_actions + duplicate_actions, log_callback)
+            pending_actions = [action for action in planned_actions if id(action) not in duplicate_ids]
+            if deferred_actions:
+                deferred_ids = {id(action) for action in deferred_actions}
+                duplicate_actions = [action for action in duplicate_actions if id(action) not in deferred_ids]
+                for action in deferred_actions:
+                    finish_action(action, False, 0)
+            normal_actions, large_actions = planner.split_lanes(pending_actions)
+            large_lane = None
+            if large_actions:
+                log_callback(f"大文件通道: {len(large_actions)} 个文件")
+                large_lane = threading.Thread(target=run_large_lane, args=(large_actions,))
+                large_lane.daemon = True
+                large_lane.start()
+                
+            try:
+                # 小文件和只同步元数据的文件攒成批量处理，分摊每个文件的固定开销
+                small_batch = []
+                metadata_batch = []
+                for action in normal_actions:
+                    if self.stop_flag:
+                        break
+                    if action.get('size', small_file_threshold) < small_file_threshold and action['action'] in ['copy', 'update'] and 'link' not in action:
+                        small_batch.append(action)
+                        if len(small_batch) >= small_file_batch_size:
+                            run_batch(self._execute_small_batch, small_batch)
+                            small_batch = []
+                        continue
+                    if action['action'] in ['metadata', 'attrs']:
+                        metadata_batch.append(action)
+                        if len(metadata_batch) >= small_file_batch_size:
+                            run_batch(self._execute_metadata_batch, metadata_batch)
+                            metadata_batch = []
+                        continue
+                    # 排在前面的小文件不等批量攒满，先于后面的大文件执行
+                    if small_batch:
+                        run_batch(self._execute_small_batch, small_batch)
+                        small_batch = []
+                    if metadata_batch:
+                        run_batch(self._execute_metadata_batch, metadata_batch)
+                        metadata_batch = []
+                    if self.stop_flag:
+                        break
+                    self._run_action(action, retry_policy, retry_queue, finish_action, log_callback)
+                    
+                if small_batch and not self.stop_flag:
+                    run_batch(self._execute_small_batch, small_batch)
+                if metadata_batch and not self.stop_flag:
+                    run_batch(self._execute_metadata_batch, metadata_batch)
+            except Exception:
+                # 主通道出错时让大文件通道尽快停下
+                self.stop_flag = True
+                raise
+            finally:
+                if large_lane:
+                    large_lane.join()
+            if lane_errors:
+                raise lane_errors[0]
+                
+            # 重复内容在同内容的首个文件复制完成后由目标端生成
+            for action in duplicate_actions:
                 if self.stop_flag:
-                    log_callback("同步已停止")
                     break
-                    
-                success = self._execute_sync_action(action, log_callback)
+                self._run_action(action, retry_policy, retry_queue, finish_action, log_callback)
+            # 只有硬链接组成员时没有去重
+            deduplicated = self.profiler.counters.get('bytes_deduplicated', 0)
+            if deduplicated:
+                log_callback(f"内容去重节省传输: {self.utils.format_file_size(deduplicated)}")
+                
+            # 处理延迟重试队列
+            self._drain_retry_queue(retry_policy, retry_queue, finish_action, log_callback)
+            
+            if self.stop_flag:
+                log_callback("同步已停止")
+                run_summary['stopped'] = True
+            elif checkpoint:
+                # 全部动作都已处理，不再需要检查点
+                checkpoint.clear()
+                
+            completed = run_summary['completed']
+            result = f"同步完成，成功处理 {completed}/{total_actions} 个文件"
+            log_callback(result)
+            return result
+            
+        except Exception as e:
+            error_msg = f"同步过程中发生错误: {str(e)}"
+            run_summary['error'] = error_msg
+            log_callback(error_msg)
+            raise Exception(error_msg)
+            
+        finally:
+            # 同步修改了目录内容，下次需要重新扫描
+            self.scan_cache.invalidate(source_path)
+            self.scan_cache.invalidate(target_path)
+            self._close_transport(log_callback)
+            self._close_target_backend()
+            self._flush_directory_syncs()
+            self._invalidate_scan_state(config)
+            if self.versioning and not is_remote_path(target_path):
+                self._start_version_pruning(config, [target_path, source_path] if sync_mode == "双向同步" else [target_path], log_callback)
+            if checkpoint:
+                checkpoint.close()
+            self._checkpoint = None
+            self._finish_profiling(capture, log_callback)
+            self._publish_run_metrics(config, profile_name, log_callback)
+            if journal:
+                self._close_journal(journal, run_summary, log_callback)
+            self.is_syncing = False
+            
+    def sync_fan_out(self, config):
+        """单向同步到多个目标：源目录只扫描和哈希一次，各目标并行扫描和比较，
+        需要复制的源文件只读取一次，同时写入所有需要它的目标
+        
+        目标为 target_path 和 target_paths 中的全部目录；多目标同步不支持远程目标和压缩传输，不使用检查点续传，
+        也不区分大文件通道，不做小文件批量和内容去重，写入失败的目标按普通流程单独重试
+        """
+        source_path = config['source_path']
+        target_paths = self._get_target_paths(config)
+        filter_rules = config.get('filter_rules', '')
+        progress_callback = config.get('progress_callback')
+        log_callback = config.get('log_callback')
+        if config.get('sync_mode', '单向同步') != '单向同步':
+            raise ValueError("多目标同步只支持单向同步")
+        if any(is_remote_path(path) for path in target_paths):
+            raise ValueError("多目标同步不支持远程目标")
+        if config.get('transport_endpoint'):
+            raise ValueError("多目标同步不支持压缩传输")
+            
+        self.stop_flag = False
+        self.is_syncing = True
+        self.profiler = SyncProfiler()
+        self._published_counters = {}
+        profile_name = config.get('profile_name', 'default')
+        self._start_metrics_endpoint(config, log_callback)
+        
+        run_summary = {'total_actions': 0, 'completed': 0, 'failed': 0, 'stopped': False, 'error': None}
+        journal = self._open_journal(config, profile_name, log_callback)
+        self._checkpoint = None
+        
+        self.verify_hash = config.get('verify_hash', True)
+        self.fsync_policy = config.get('fsync_policy', 'none')
+        self.sparse_copy = config.get('sparse_copy', False)
+        self._pending_dir_syncs = set()
+        self._created_dirs = set()
+        self.versioning = config.get('versioning', False)
+        self._version_stamp = datetime.now().strftime(VERSION_STAMP_FORMAT)
+        self._sync_roots = list(target_paths)
+        self._stale_scan_dirs = set()
+        self.throttle.configure(config, lambda: self.stop_flag)
+        self._configure_scan(config)
+        self._take_preview_scan([source_path] + target_paths)
+        # 多目标同步共用一次源文件读取，不做内容去重和小文件批量
+        self.dedup_policy = 'none'
+        ignored = [name for name in ('dedup_policy', 'small_file_threshold', 'small_file_batch_size')
+                   if config.get(name) not in (None, 'none', 0)]
+        if ignored:
+            log_callback(f"多目标同步不使用以下配置: {', '.join(ignored)}")
+        
+        try:
+            groups = self._plan_fan_out(source_path, target_paths, filter_rules, self._create_planner(config), log_callback)
+            total_actions = sum(len(group) for group in groups)
+            run_summary['total_actions'] = total_actions
+            self.metrics.inc('sync_actions_planned_total', total_actions, profile=profile_name)
+            self.metrics.set('sync_pending_actions', total_actions, profile=profile_name)
+            if total_actions == 0:
+                log_callback("没有需要同步的文件")
+                return "同步完成，没有文件需要更新"
+                
+            log_callback(f"需要同步的文件数: {total_actions}（{len(groups)} 个源文件，{len(target_paths)} 个目标）")
+            
+            retry_policy = RetryPolicy(
+                config.get('max_retries', self.max_retries),
+                config.get('retry_base_delay', self.retry_delay),
+                config.get('retry_max_delay', self.max_retry_delay)
+            )
+            retry_queue = RetryQueue()
+            
+            def finish_action(action, success, duration, notify=True):
                 if success:
-                    completed += 1
+                    run_summary['completed'] += 1
+                else:
+                    run_summary['failed'] += 1
+                processed = run_summary['completed'] + run_summary['failed']
+                self._record_action_metrics(profile_name, success, duration, total_actions - processed, len(retry_queue))
+                if journal:
+                    journal.record_action(action, success, duration)
+                if notify and progress_callback:
+                    progress_callback((run_summary['completed'] / total_actions) * 100)
                     
-                # 更新进度
-                if progress_callback:
-                    progress = (completed / total_actions) * 100
-                    progress_callback(progress)
+            # 空间预检按目标所在设备汇总，多个目标在同一设备上时合并计算
+            _, deferred_actions = self._preflight_space(config, [action for group in groups for action in group], log_callback)
+            if deferred_actions:
+                deferred_ids = {id(action) for action in deferred_actions}
+                groups = [[action for action in group if id(action) not in deferred_ids] for group in groups]
+                for action in deferred_actions:
+                    finish_action(action, False, 0)
                     
-            result = f"同步完成，成功处理 {completed}/{total_actions} 个文件"
+            for group in groups:
+                if self.stop_flag:
+                    break
+                self._run_fan_out_group(group, retry_policy, retry_queue, finish_action, log_callback)
+                
+            self._drain_retry_queue(retry_policy, retry_queue, finish_action, log_callback)
+            
+            if self.stop_flag:
+                log_callback("同步已停止")
+                run_summary['stopped'] = True
+                
+            result = f"同步完成，成功处理 {run_summary['completed']}/{total_actions} 个文件"
             log_callback(result)
             return result
             
         except Exception as e:
             error_msg = f"同步过程中发生错误: {str(e)}"
+            run_summary['error'] = error_msg
             log_callback(error_msg)
             raise Exception(error_msg)
             
+        finally:
+            self.scan_cache.invalidate(source_path)
+            for target_path in target_paths:
+                self.scan_cache.invalidate(target_path)
+            self._flush_directory_syncs()
+            self._invalidate_scan_state(config)
+            if self.versioning:
+                self._start_version_pruning(config, target_paths, log_callback)
+            self._finish_profiling(None, log_callback)
+            self._publish_run_metrics(config, profile_name, log_callback)
+            if journal:
+                self._close_journal(journal, run_summary, log_callback)
+            self.is_syncing = False
+            
+    def _get_target_paths(self, config):
+        """多目标同步的目标目录列表（去重，保持顺序）"""
+        target_paths = []
+        for target_path in [config.get('target_path')] + list(config.get('target_paths') or []):
+            if target_path and os.path.abspath(target_path) not in map(os.path.abspath, target_paths):
+                target_paths.append(target_path)
+        return target_paths
+        
+    def _plan_fan_out(self, source_path, target_paths, filter_rules, planner, log_callback):
+        """扫描一次源目录，并行扫描和比较各个目标，返回按源文件分组、按优先级排序并编号的动作"""
+        include_patterns, exclude_patterns = self._parse_filter_rules(filter_rules)
+        
+        log_callback("正在扫描文件...")
+        source_files = self._get_file_list(source_path, include_patterns, exclude_patterns)
+        log_callback(f"源目录文件数: {len(source_files)}")
+        
+        def plan_target(target_path):
+            target_files = self._get_file_list(target_path, include_patterns, exclude_patterns)
+            file_count = len(target_files)
+            aligned_source, target_files = self._align_paths(source_files, target_files, log_callback)
+            with self.profiler.stage('compare'):
+                actions = self._compare_files(source_path, target_path, aligned_source, target_files, "单向同步")
+            return target_path, file_count, actions
+            
+        # 同一个源文件在各目标中的动作归为一组
+        groups = {}
+        with ThreadPoolExecutor(max_workers=len(target_paths)) as executor:
+            for target_path, file_count, actions in executor.map(plan_target, target_paths):
+                log_callback(f"目标目录文件数: {file_count} ({target_path})")
+                for action in actions:
+                    if os.path.abspath(action['source']) not in self._unsettled_paths:
+                        groups.setdefault(action['relative_path'], []).append(action)
+                        
+        ordered = [groups[action['relative_path']] for action in planner.order([group[0] for group in groups.values()])]
+        index = 0
+        for group in ordered:
+            for action in group:
+                action['index'] = index
+                index += 1
+        return ordered
+        
+    def _run_fan_out_group(self, group, retry_policy, retry_queue, finish_action, log_callback):
+        """执行同一个源文件在各目标中的动作，需要复制的目标共用一次源文件读取"""
+        copies = []
+        for action in group:
+            # 只同步时间的动作和被占用的目标文件按普通流程处理
+            if action['action'] in ('copy', 'update') and 'link' not in action and not (action['action'] == 'update' and self._is_target_locked(action)):
+                copies.append(action)
+            else:
+                self._run_action(action, retry_policy, retry_queue, finish_action, log_callback)
+                
+        # 稀疏文件按目标逐个复制，保留空洞
+        if len(copies) < 2 or (self.sparse_copy and self._is_sparse_source(copies[0]['source'])):
+            for action in copies:
+                self._run_action(action, retry_policy, retry_queue, finish_action, log_callback)
+            return
+            
+        start_time = time.perf_counter()
+        results = self._tee_copy(copies)
+        duration = (time.perf_counter() - start_time) / len(copies)
+        succeeded = [action for action, error in results if error is None]
+        if succeeded:
+            log_callback(f"COPY → {len(succeeded)} 个目标: {copies[0]['relative_path']}")
+        for action, error in results:
+            if error is None:
+                finish_action(action, True, duration)
+            elif not isinstance(error, SyncStopped):
+                # 写入失败的目标单独重试
+                self._run_action(action, retry_policy, retry_queue, finish_action, log_callback)
+                
+    def _tee_copy(self, actions):
+        """读取一次源文件，同时写入各目标目录中的临时文件，逐个校验后原子替换，返回 [(动作, 异常)]"""
+        source = actions[0]['source']
+        results = []
+        outputs = []
+        for action in actions:
+            action['attempts'] = action.get('attempts', 0) + 1
+            try:
+                if self.space_guard:
+                    self.space_guard.claim(action)
+                target_dir = os.path.dirname(action['target'])
+                os.makedirs(target_dir, exist_ok=True)
+                self.profiler.count('makedirs_calls')
+                fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(action['target'])}.", suffix=TEMP_SUFFIX, dir=target_dir)
+                outputs.append([action, temp_path, os.fdopen(fd, 'wb'), False])
+            except OSError as e:
+                action['error'] = str(e)
+                results.append((action, e))
+                
+        def abandon(output, error):
+            if output[2] is not None:
+                output[2].close()
+                output[2] = None
+            output[3] = True
+            self._remove_temp(output[1])
+            output[0]['error'] = str(error)
+            results.append((output[0], error))
+            
+        hasher = hashlib.md5()
+        copied_size = 0
+        try:
+            source_stat = os.stat(source)
+            self._throttle_files(1)
+            with self.profiler.stage('copy'), open(source, 'rb') as src:
+                while chunk := src.read(1024 * 1024):
+                    if self.stop_flag:
+                        raise SyncStopped("同步已停止")
+                    active = [output for output in outputs if not output[3]]
+                    if not active:
+                        break
+                    # 限速按实际写入的字节数计算
+                    self._throttle_bytes(len(chunk) * len(active))
+                    hasher.update(chunk)
+                    copied_size += len(chunk)
+                    for output in active:
+                        try:
+                            output[2].write(chunk)
+                        except OSError as e:
+                            abandon(output, e)
+            for output in outputs:
+                if output[2] is not None:
+                    output[2].close()
+                    output[2] = None
+                    
+            current_stat = os.stat(source)
+            if (current_stat.st_size, current_stat.st_mtime_ns) != (source_stat.st_size, source_stat.st_mtime_ns):
+                raise Exception("复制过程中源文件被修改")
+        except Exception as e:
+            for output in outputs:
+                if not output[3]:
+                    abandon(output, e)
+            return results
+            
+        digest = hasher.hexdigest()
+        self._hash_cache[source] = ((source_stat.st_size, source_stat.st_mtime_ns), digest)
+        written = [output for output in outputs if not output[3]]
+        for action, temp_path, _, _ in written:
+            try:
+                shutil.copystat(source, temp_path)
+                with self.profiler.stage('verify'):
+                    verified = self._verify_temp(temp_path, copied_size, digest)
+                if not verified:
+                    raise Exception("文件校验失败")
+                if self.fsync_policy != 'none':
+                    self._fsync_file(temp_path)
+                self._preserve_version(action)
+                os.replace(temp_path, action['target'])
+                target_stat = os.stat(action['target'])
+                self._hash_cache[action['target']] = ((target_stat.st_size, target_stat.st_mtime_ns), digest)
+                self._sync_directory(os.path.dirname(action['target']))
+            except Exception as e:
+                self._remove_temp(temp_path)
+                action['error'] = str(e)
+                results.append((action, e))
+                continue
+            action['hash'] = digest
+            action['bytes'] = copied_size
+            action['replaced'] = True
+            action['error'] = None
+            results.append((action, None))
+            self.profiler.count('copy_calls')
+            self.profiler.count('bytes_copied', copied_size)
+            
+        # 每多一个目标就少读一次源文件
+        self.profiler.count('bytes_read_saved', copied_size * (len(written) - 1))
+        return results
+        
+    def _drain_retry_queue(self, retry_policy, retry_queue, finish_action, log_callback):
+        """处理延迟重试队列，等待期间收到停止请求时保留剩余动作"""
+        if retry_queue and not self.stop_flag:
+            log_callback(f"开始处理延迟重试队列: {len(retry_queue)} 个文件")
+        while retry_queue and not self.stop_flag:
+            wait, action = retry_queue.pop()
+            if wait > 0 and not self._wait_for_retry(wait):
+                retry_queue.push(action, 0)
+                break
+            self._run_action(action, retry_policy, retry_queue, finish_action, log_callback)
+            
+    def _open_target_backend(self, config, target_path):
+        """目标为 URL 时创建对应的存储后端"""
+        if not is_remote_path(target_path):
+            return
+        if config['sync_mode'] != "单向同步":
+            raise ValueError("远程目标只支持单向同步")
+        if config.get('symlink_mode') == 'copy' or config.get('preserve_hardlinks'):
+            raise ValueError("远程目标不支持复制符号链接和硬链接")
+        self.target_backend = create_backend(target_path, config)
+        
+    def _close_target_backend(self):
+        if self.target_backend:
+            self.target_backend.close()
+            self.target_backend = None
+            
+    def _open_transport(self, config, target_path, log_callback):
+        """按配置连接压缩传输的接收端；loopback 时在本进程中为目标目录启动接收端（用于测试）"""
+        endpoint = config.get('transport_endpoint')
+        if not endpoint:
+            return
+        token = config.get('transport_token')
+        if endpoint == 'loopback':
+            self._loopback_receiver = TransportReceiver(target_path, token=token, log_callback=log_callback).start()
+            host, port = '127.0.0.1', str(self._loopback_receiver.port)
+        else:
+            host, _, port = endpoint.rpartition(':')
+            if not host or not port.isdigit():
+                raise ValueError(f"传输端点格式应为 host:port: {endpoint}")
+        self.transport = TransportClient(host, int(port), config.get('compression', 'auto'), config.get('compression_level'), token)
+        log_callback(f"压缩传输: {endpoint}")
+        
+    def _close_transport(self, log_callback):
+        """关闭传输连接并输出压缩效果"""
+        if self.transport:
+            self.transport.close()
+            self.transport = None
+            raw_bytes = self.profiler.counters.get('bytes_transport_raw', 0)
+            sent_bytes = self.profiler.counters.get('bytes_sent', 0)
+            if raw_bytes:
+                log_callback(f"压缩传输: 原始 {self.utils.format_file_size(raw_bytes)}，"
+                             f"实际发送 {self.utils.format_file_size(sent_bytes)}（{sent_bytes / raw_bytes:.0%}）")
+        if self._loopback_receiver:
+            self._loopback_receiver.stop()
+            self._loopback_receiver = None
+            
+    def _dedup_actions(self, actions, min_size, log_callback):
+        """按内容去重：同方向、内容相同的待复制文件只从源端复制第一个，返回 (其余动作, 重复的动作)
+        
+        先按大小分组，只有大小相同的文件才计算哈希（优先使用缓存）；重复动作的 dedup_of 为同内容的首个目标文件
+        """
+        if self.dedup_policy not in DEDUP_POLICIES:
+            raise ValueError(f"不支持的去重方式: {self.dedup_policy}")
+        if self.dedup_policy == 'none':
+            return actions, []
+        # 硬链接目标：(哈希, 修改时间) -> 已生成的目标文件
+        self._dedup_link_targets = {}
+            
+        by_size = {}
+        for action in actions:
+            if action['action'] in ('copy', 'update') and action.get('size', 0) >= min_size and 'link' not in action:
+                by_size.setdefault((action['direction'], action['size']), []).append(action)
+                
+        duplicates = []
+        for candidates in by_size.values():
+            if len(candidates) < 2:
+                continue
+            primaries = {}
+            for action in candidates:
+                digest = self._get_file_hash(action['source'])
+                if digest is None:
+                    continue
+                primary = primaries.setdefault(digest, action)
+                if primary is not action:
+                    action['dedup_of'] = primary['target']
+                    action['dedup_hash'] = digest
+                    duplicates.append(action)
+                    
+        if not duplicates:
+            return actions, []
+        duplicate_ids = {id(action) for action in duplicates}
+        log_callback(f"内容去重: {len(duplicates)} 个重复文件（{self.utils.format_file_size(sum(a['size'] for a in duplicates))}）将在目标端生成")
+        return [action for action in actions if id(action) not in duplicate_ids], duplicates
+        
+    def _preflight_space(self, config, actions, log_callback):
+        """按配置检查本地目标的剩余空间，返回 (要执行的动作, 本次跳过的动作)"""
+        self.space_guard = None
+        policy = config.get('space_check', 'fail')
+        # 远程目标和经传输接收端写入的目标无法在本机检查
+        if policy == 'off' or self.target_backend or self.transport:
+            return actions, []
+        self.space_guard = SpaceGuard(self.utils, policy, config.get('space_reserve', 0),
+                                      config.get('space_check_interval', 5), self.versioning, self.dedup_policy == 'hardlink')
+        with self.profiler.stage('preflight'):
+            return self.space_guard.plan(actions, log_callback)
+            
+    def _create_planner(self, config):
+        """根据配置创建同步动作排序器"""
+        return ActionPlanner(
+            config.get('order_policy', 'tree'),
+            config.get('priority_rules', ''),
+            config.get('large_file_threshold', self.large_file_threshold)
+        )
+        
+    def _plan_sync(self, source_path, target_path, sync_mode, filter_rules, planner, log_callback):
+        """扫描并比较两个目录，生成按优先级排序并编号的同步动作列表"""
+        # 解析过滤规则
+        include_patterns, exclude_patterns = self._parse_filter_rules(filter_rules)
+        
+        # 获取文件列表
+        log_callback("正在扫描文件...")
+        source_files = self._get_file_list(source_path, include_patterns, exclude_patterns)
+        target_files = self._get_file_list(target_path, include_patterns, exclude_patterns)
+        
+        log_callback(f"源目录文件数: {len(source_files)}")
+        log_callback(f"目标目录文件数: {len(target_files)}")
+        source_files, target_files = self._align_paths(source_files, target_files, log_callback)
+        
+        # 比较文件
+        with self.profiler.stage('compare'):
+            sync_actions = self._compare_files(source_path, target_path, source_files, target_files, sync_mode)
+            sync_actions = planner.order(sync_actions)
+            if self._unsettled_paths:
+                sync_actions = [a for a in sync_actions if os.path.abspath(a['source']) not in self._unsettled_paths]
+            if self.preserve_hardlinks:
+                self._group_hardlinks(sync_actions, source_files, target_path)
+                
+        for index, action in enumerate(sync_actions):
+            action['index'] = index
+        return sync_actions
+        
+    def _group_hardlinks(self, actions, source_files, target_path):
+        """源端同一 inode 的文件在目标端重建为硬链接：组内第一个需要复制的文件正常复制，
+        其余记录 hardlink_of（链接来源），同组中已同步的文件可直接作为链接来源
+        """
+        members = {}
+        for relative_path, file_info in source_files.items():
+            if 'inode' in file_info:
+                members.setdefault(tuple(file_info['inode']), []).append(relative_path)
+        pending = {action['relative_path'] for action in actions if action['direction'] == 'source_to_target'}
+        anchors = {}
+        for action in actions:
+            if action['action'] not in ('copy', 'update') or action['direction'] != 'source_to_target' or 'inode' not in action:
+                continue
+            key = tuple(action['inode'])
+            if key not in anchors:
+                synced = next((path for path in members.get(key, ()) if path not in pending), None)
+                anchors[key] = os.path.join(target_path, synced) if synced else action['target']
+                if not synced:
+                    continue
+            action['hardlink_of'] = anchors[key]
+            
+    def _align_paths(self, source_files, target_files, log_callback, collisions=None):
+        """按路径规范化策略对齐两侧的文件列表；规范化后相同的多个路径在复制前报告并跳过，
+        避免每次同步都在同一个目标文件上反复覆盖（collisions 收集冲突的路径组）
+        """
+        source_files, target_files, found = self.path_index.align(source_files, target_files)
+        if found:
+            self.profiler.count('path_collisions', len(found))
+            shown = '；'.join(' / '.join(paths) for paths in found[:10])
+            more = f" 等 {len(found)} 组" if len(found) > 10 else ""
+            log_callback(f"路径冲突（规范化后相同，本次不同步）: {shown}{more}")
+            if collisions is not None:
+                collisions.extend(found)
+        return source_files, target_files
+        
+    def _finish_profiling(self, capture, log_callback):
+        """结束性能统计并输出摘要"""
+        self.profiler.finish()
+        for line in self.profiler.format_summary():
+            log_callback(line)
+            
+        if capture:
+            try:
+                output_path = capture.stop()
+                if output_path:
+                    log_callback(f"性能采样结果已保存: {output_path}")
+            except Exception as e:
+                log_callback(f"保存性能采样结果失败: {str(e)}")
+                
+    def _open_journal(self, config, profile_name, log_callback):
+        """按配置打开本次运行的结构化日志，journal_dir 为空时不记录"""
+        journal_dir = config.get('journal_dir', os.path.join('logs', 'journal'))
+        if not journal_dir:
+            return None
+            
+        try:
+            journal = RunJournal(journal_dir, profile_name)
+            details = {'source_path': config['source_path'], 'target_path': config.get('target_path'), 'sync_mode': config['sync_mode']}
+            if config.get('target_paths'):
+                details['target_paths'] = self._get_target_paths(config)
+            journal.start(**details)
+            return journal
+        except Exception as e:
+            log_callback(f"打开运行日志失败: {journal_dir} - {str(e)}")
+            return None
+            
+    def _close_journal(self, journal, run_summary, log_callback):
+        """写入运行汇总并关闭结构化日志"""
+        stats = self.profiler.get_statistics()
+        try:
+            journal.finish(
+                bytes_transferred=stats['counters'].get('bytes_copied', 0),
+                bytes_deduplicated=stats['counters'].get('bytes_deduplicated', 0),
+                files_scanned=stats['counters'].get('files_scanned', 0),
+                stages={name: round(stage['wall'], 6) for name, stage in stats['stages'].items()},
+                **run_summary
+            )
+        except Exception as e:
+            log_callback(f"写入运行日志失败: {str(e)}")
+            
+    def _start_metrics_endpoint(self, config, log_callback):
+        """按配置启动本地 HTTP 指标端点"""
+        metrics_port = config.get('metrics_port')
+        if not metrics_port:
+            return
+            
+        try:
+            host, port = self.metrics.start_http_server(int(metrics_port), config.get('metrics_host', '127.0.0.1'))[:2]
+            log_callback(f"指标端点: http://{host}:{port}/metrics")
+        except Exception as e:
+            log_callback(f"启动指标端点失败: {str(e)}")
+            
+    def _record_action_metrics(self, profile_name, success, duration, pending, retry_queue_depth=0):
+        """记录单个同步动作的指标"""
+        metrics = self.metrics
+        metrics.inc('sync_actions_executed_total', profile=profile_name, result='success' if success else 'failed')
+        metrics.observe('sync_action_duration_seconds', duration, profile=profile_name)
+        metrics.set('sync_pending_actions', pending, profile=profile_name)
+        metrics.set('sync_retry_queue_depth', retry_queue_depth, profile=profile_name)
+        self._publish_counter_metrics(profile_name)
+        
+    def _publish_counter_metrics(self, profile_name):
+        """把性能计数器中的字节数和重试次数按增量同步到指标"""
+        metrics = self.metrics
+        counters = self.profiler.counters
+        for counter, metric in (('bytes_copied', 'sync_bytes_transferred_total'), ('bytes_deduplicated', 'sync_bytes_deduplicated_total'),
+                                ('retries', 'sync_retries_total')):
+            value = counters.get(counter, 0)
+            published = self._published_counters.get(counter, 0)
+            if value != published:
+                metrics.inc(metric, value - published, profile=profile_name)
+                self._published_counters[counter] = value
+                
+    def _publish_run_metrics(self, config, profile_name, log_callback):
+        """同步结束后汇总本次运行的指标"""
+        metrics = self.metrics
+        stats = self.profiler.get_statistics()
+        
+        metrics.inc('sync_runs_total', profile=profile_name)
+        metrics.inc('sync_files_scanned_total', stats['counters'].get('files_scanned', 0), profile=profile_name)
+        self._publish_counter_metrics(profile_name)
+        metrics.set('sync_pending_actions', 0, profile=profile_name)
+        metrics.set('sync_retry_queue_depth', 0, profile=profile_name)
+        metrics.set('sync_last_run_timestamp_seconds', time.time(), profile=profile_name)
+        for stage, stage_stats in stats['stages'].items():
+            metrics.observe('sync_stage_duration_seconds', stage_stats['wall'], profile=profile_name, stage=stage)
+            
+        metrics_textfile = config.get('metrics_textfile')
+        if metrics_textfile:
+            try:
+                metrics.write_textfile(metrics_textfile)
+            except Exception as e:
+                log_callback(f"写入指标文件失败: {metrics_textfile} - {str(e)}")
+                
+    def get_last_run_statistics(self):
+        """获取最近一次同步的性能统计"""
+        return self.profiler.get_statistics()
+        
+    def _configure_scan(self, config):
+        """读取扫描缓存、增量扫描和文件比较的配置"""
+        self.scan_cache.ttl = config.get('scan_cache_ttl', 300)
+        self.incremental_scan = config.get('incremental_scan', False)
+        self.scan_state_dir = config.get('scan_state_dir', 'scan_state')
+        self.full_scan_interval = config.get('full_scan_interval', 24 * 3600)
+        # 监控模式报告有变化的目录，增量扫描时必须重新列出
+        self._dirty_dirs = set(config.get('dirty_dirs', ()))
+        self._dirty_subtrees = set(config.get('dirty_subtrees', ()))
+        # 仍在写入的文件，本次不同步
+        self._unsettled_paths = set(config.get('unsettled_paths', ()))
+        # 根目录下的版本目录不参与同步
+        self.versions_dir = config.get('versions_dir', '.versions')
+        # 符号链接和硬链接：扫描时记录链接目标和 inode，复制时重建链接
+        self.symlink_mode = config.get('symlink_mode', 'follow')
+        if self.symlink_mode not in SYMLINK_MODES:
+            raise ValueError(f"不支持的符号链接处理方式: {self.symlink_mode}")
+        self.preserve_hardlinks = config.get('preserve_hardlinks', False)
+        # 权限和扩展属性（包括 POSIX ACL）：扫描时记录，内容相同但元数据不同时只同步元数据
+        self.sync_permissions = config.get('sync_permissions', False)
+        self.sync_xattrs = config.get('sync_xattrs', False)
+        # 两侧文件系统的大小写和 Unicode 规范化规则不同时，按规范化的路径比较
+        self.path_index = PathIndex(config.get('path_normalization', 'none'))
+        # 只有修改时间不同时先比较内容指纹，内容相同只同步修改时间：'sample' 信任抽样指纹，'hash' 再用完整哈希确认
+        self.metadata_fixup = config.get('metadata_fixup', False)
+        
     def _parse_filter_rules(self, filter_rules):
         """解析过滤规则"""
         include_patterns = []
@@ -91,29 +988,261 @@ class SyncCore:
         return include_patterns, exclude_patterns
         
     def _get_file_list(self, directory, include_patterns, exclude_patterns):
-        """获取目录下的文件列表"""
+        """获取目录下的文件列表（优先使用预览保存、仍然有效的扫描缓存）"""
+        if self.target_backend is not None and directory == self.target_backend.url:
+            return self._scan_backend(include_patterns, exclude_patterns)
+            
         file_list = {}
         
         if not os.path.exists(directory):
             return file_list
             
+        profiler = self.profiler
+        filter_key = self._get_filter_key(include_patterns, exclude_patterns)
+        with profiler.stage('scan'):
+            cached = self.scan_cache.get(directory, filter_key)
+            if cached is not None:
+                profiler.count('scan_cache_hits')
+                profiler.count('files_scanned', len(cached))
+                return cached
+                
+            started_ns = time.time_ns()
+            if self.incremental_scan:
+                file_list, dir_mtimes = self._scan_incremental(directory, include_patterns, exclude_patterns, filter_key)
+            else:
+                file_list, dir_mtimes = self._scan_full(directory, include_patterns, exclude_patterns)
+                
+        profiler.count('files_scanned', len(file_list))
+        if self._scan_cache_fill:
+            self.scan_cache.put(directory, filter_key, file_list, dir_mtimes, started_ns)
+        return file_list
+        
+    def _take_preview_scan(self, directories):
+        """同步开始时核对扫描缓存：紧接在同一组目录的预览之后才沿用预览的扫描结果，否则全部丢弃"""
+        if self._preview_roots != self._get_scan_roots(directories):
+            self.scan_cache.invalidate()
+        self._preview_roots = None
+        
+    def _get_scan_roots(self, directories):
+        """一次预览或同步涉及的目录集合"""
+        return frozenset(os.path.abspath(directory) for directory in directories)
+        
+    def _get_filter_key(self, include_patterns, exclude_patterns):
+        """扫描缓存和增量扫描状态的键：过滤规则加上影响扫描结果的选项"""
+        # 链接和元数据的记录方式改变时扫描结果不同，不能沿用缓存和增量扫描状态
+        return (tuple(include_patterns), tuple(exclude_patterns), self.symlink_mode, self.preserve_hardlinks,
+                self.sync_permissions, self.sync_xattrs)
+                
+    def _scan_backend(self, include_patterns, exclude_patterns):
+        """通过存储后端列出远程目标的文件（不使用扫描缓存和增量扫描）"""
+        backend = self.target_backend
+        file_list = {}
+        with self.profiler.stage('scan'):
+            for remote_path, size, mtime in backend.walk():
+                if remote_path.endswith(TEMP_SUFFIX):
+                    continue
+                relative_path = remote_path.replace('/', os.sep)
+                if not self._should_include_file(relative_path, include_patterns, exclude_patterns):
+                    continue
+                file_list[relative_path] = {
+                    'path': f"{backend.url.rstrip('/')}/{remote_path}",
+                    'size': size,
+                    'mtime': mtime,
+                    'remote': True
+                }
+        self.profiler.count('files_scanned', len(file_list))
+        return file_list
+        
+    def _scan_full(self, directory, include_patterns, exclude_patterns):
+        """完整扫描：列出所有目录并获取每个文件的信息，返回 (文件列表, 目录修改时间)"""
+        file_list = {}
+        dir_mtimes = {}
+        profiler = self.profiler
+        has_rules = bool(include_patterns or exclude_patterns)
+        # 过滤耗时在本地累计，扫描结束后一次计入
+        filter_wall = 0.0
+        filter_calls = 0
         for root, dirs, files in os.walk(directory):
+            profiler.count('listdir_calls')
+            try:
+                dir_mtimes[root] = os.stat(root).st_mtime_ns
+            except OSError:
+                pass
+            if root == directory and self.versions_dir in dirs:
+                dirs.remove(self.versions_dir)
+            # os.walk 不进入指向目录的符号链接，作为链接复制时与文件一起处理
+            if self.symlink_mode == 'copy':
+                files = files + [name for name in dirs if os.path.islink(os.path.join(root, name))]
+            # 每个目录只计算一次相对路径
+            relative_root = os.path.relpath(root, directory)
             for file in files:
+                if file.endswith(TEMP_SUFFIX):
+                    continue
                 file_path = os.path.join(root, file)
-                relative_path = os.path.relpath(file_path, directory)
+                relative_path = file if relative_root == os.curdir else os.path.join(relative_root, file)
                 
                 # 应用过滤规则
-                if self._should_include_file(relative_path, include_patterns, exclude_patterns):
+                if has_rules:
+                    filter_start = time.perf_counter()
+                    included = self._should_include_file(relative_path, include_patterns, exclude_patterns)
+                    filter_wall += time.perf_counter() - filter_start
+                    filter_calls += 1
+                else:
+                    included = True
+                if included:
+                    file_stat = os.stat(file_path) if self.symlink_mode == 'follow' else os.lstat(file_path)
+                    profiler.count('stat_calls')
+                    extra_info = self._get_extra_info(file_path, file_stat)
+                    if extra_info is None:
+                        continue
                     file_info = {
                         'path': file_path,
                         'relative_path': relative_path,
-                        'size': os.path.getsize(file_path),
-                        'mtime': os.path.getmtime(file_path),
+                        'size': file_stat.st_size,
+                        'mtime': file_stat.st_mtime,
                         'hash': None  # 延迟计算
                     }
+                    file_info.update(extra_info)
                     file_list[relative_path] = file_info
                     
-        return file_list
+        if filter_calls:
+            profiler.add_stage_time('filter', filter_wall, filter_calls)
+        return file_list, dir_mtimes
+        
+    def _scan_incremental(self, directory, include_patterns, exclude_patterns, filter_key):
+        """增量扫描：目录修改时间与上次记录一致时沿用记录的文件信息，不重新列目录和获取文件信息
+        
+        目录中文件被原地修改不会改变目录修改时间，这类变化依赖监控模式或定期的完整扫描发现
+        """
+        profiler = self.profiler
+        state = ScanState(self.scan_state_dir, directory, filter_key).load()
+        full_scan = state.needs_full_scan(self.full_scan_interval)
+        if full_scan:
+            profiler.count('full_scans')
+            
+        file_list = {}
+        dir_mtimes = {}
+        dirs = {}
+        listed = 0
+        pending = ['']
+        while pending:
+            relative_root = pending.pop()
+            root = os.path.join(directory, relative_root) if relative_root else directory
+            try:
+                mtime_ns = os.stat(root).st_mtime_ns
+            except OSError:
+                continue
+            profiler.count('stat_calls')
+            dir_mtimes[root] = mtime_ns
+            
+            previous = state.dirs.get(relative_root)
+            if not full_scan and previous and previous['stable'] and previous['mtime_ns'] == mtime_ns and not self._is_dirty(root):
+                entry = previous
+                profiler.count('dirs_skipped')
+            else:
+                entry = self._list_directory(root, relative_root, include_patterns, exclude_patterns, mtime_ns)
+                listed += 1
+            dirs[relative_root] = entry
+            
+            for name, values in entry['files'].items():
+                relative_path = os.path.join(relative_root, name) if relative_root else name
+                file_list[relative_path] = {
+                    'path': os.path.join(root, name),
+                    'relative_path': relative_path,
+                    'size': values[0],
+                    'mtime': values[1],
+                    'hash': None  # 延迟计算
+                }
+                # 第三项为链接和元数据信息
+                if len(values) > 2:
+                    file_list[relative_path].update(values[2])
+            if relative_root:
+                pending.extend(os.path.join(relative_root, name) for name in entry['subdirs'])
+            else:
+                pending.extend(name for name in entry['subdirs'] if name != self.versions_dir)
+            
+        # 只有目录发生变化时才重写状态文件
+        if full_scan or listed or len(dirs) != len(state.dirs):
+            state.dirs = dirs
+            if full_scan:
+                state.last_full_scan = time.time()
+            try:
+                state.save()
+            except OSError:
+                pass
+        return file_list, dir_mtimes
+        
+    def _is_dirty(self, directory):
+        """目录是否被监控模式标记为有变化"""
+        if not self._dirty_dirs and not self._dirty_subtrees:
+            return False
+        directory = os.path.abspath(directory)
+        if directory in self._dirty_dirs:
+            return True
+        return any(directory == subtree or directory.startswith(subtree + os.sep) for subtree in self._dirty_subtrees)
+        
+    def _get_extra_info(self, file_path, file_stat):
+        """扫描时记录的附加信息：符号链接的目标 'link'，硬链接组的 'inode'，权限 'mode'，
+        扩展属性的指纹 'xattrs'；跳过的符号链接返回None
+        """
+        if stat.S_ISLNK(file_stat.st_mode):
+            if self.symlink_mode == 'skip':
+                return None
+            return {'link': os.readlink(file_path)}
+        extra_info = {}
+        if self.preserve_hardlinks and file_stat.st_nlink > 1:
+            extra_info['inode'] = [file_stat.st_dev, file_stat.st_ino]
+        if self.sync_permissions:
+            extra_info['mode'] = stat.S_IMODE(file_stat.st_mode)
+        if self.sync_xattrs:
+            xattrs = self.utils.get_xattrs(file_path)
+            if xattrs:
+                extra_info['xattrs'] = hashlib.md5(repr(sorted(xattrs.items())).encode('utf-8')).hexdigest()
+        return extra_info
+        
+    def _list_directory(self, root, relative_root, include_patterns, exclude_patterns, mtime_ns):
+        """列出单个目录，返回增量扫描状态中的目录条目"""
+        profiler = self.profiler
+        profiler.count('listdir_calls')
+        has_rules = bool(include_patterns or exclude_patterns)
+        listed_ns = time.time_ns()
+        entry = {'mtime_ns': mtime_ns, 'stable': True, 'subdirs': [], 'files': {}}
+        # 过滤耗时在本地累计，列完目录后一次计入
+        filter_wall = 0.0
+        filter_calls = 0
+        try:
+            with os.scandir(root) as entries:
+                for item in entries:
+                    # 与 os.walk 一致：不进入符号链接指向的目录
+                    if item.is_dir() and not (self.symlink_mode == 'copy' and item.is_symlink()):
+                        if not item.is_symlink():
+                            entry['subdirs'].append(item.name)
+                        continue
+                    if item.name.endswith(TEMP_SUFFIX):
+                        continue
+                    relative_path = os.path.join(relative_root, item.name) if relative_root else item.name
+                    if has_rules:
+                        filter_start = time.perf_counter()
+                        included = self._should_include_file(relative_path, include_patterns, exclude_patterns)
+                        filter_wall += time.perf_counter() - filter_start
+                        filter_calls += 1
+                        if not included:
+                            continue
+                    file_stat = item.stat(follow_symlinks=self.symlink_mode == 'follow')
+                    profiler.count('stat_calls')
+                    extra_info = self._get_extra_info(item.path, file_stat)
+                    if extra_info is None:
+                        continue
+                    entry['files'][item.name] = [file_stat.st_size, file_stat.st_mtime, extra_info] if extra_info else [file_stat.st_size, file_stat.st_mtime]
+        except OSError:
+            entry['stable'] = False
+        if filter_calls:
+            profiler.add_stage_time('filter', filter_wall, filter_calls)
+            
+        # 修改时间与列目录时间过于接近时，同一时间精度内的后续修改无法区分，下次需要重新列出
+        if mtime_ns >= listed_ns - ScanCache.MTIME_GRANULARITY_NS:
+            entry['stable'] = False
+        return entry
         
     def _should_include_file(self, relative_path, include_patterns, exclude_patterns):
         """判断文件是否应该包含在同步中"""
@@ -135,59 +1264,135 @@ class SyncCore:
         
     def _compare_files(self, source_path, target_path, source_files, target_files, sync_mode):
         """比较文件并生成同步动作"""
-        sync_actions = []
+        return list(self._iter_compare(source_path, target_path, source_files, target_files, sync_mode))
         
+    def _iter_compare(self, source_path, target_path, source_files, target_files, sync_mode, hash_stats=None):
+        """逐个生成同步动作；hash_stats 用于统计需要比较内容哈希的文件"""
         # 处理源目录中的文件
         for relative_path, source_info in source_files.items():
             if relative_path in target_files:
                 target_info = target_files[relative_path]
                 
                 # 文件存在于两个目录中，检查是否需要更新
-                if self._need_update(source_info, target_info):
-                    sync_actions.append({
-                        'action': 'update',
+                action_type = self._get_update_action(source_info, target_info, hash_stats)
+                if action_type:
+                    # 按规范化路径对应的目标文件可能使用不同的文件名
+                    target_relative_path = target_info.get('relative_path', relative_path)
+                    yield {
+                        'action': action_type,
                         'source': source_info['path'],
-                        'target': os.path.join(target_path, relative_path),
+                        'target': os.path.join(target_path, target_relative_path),
                         'relative_path': relative_path,
-                        'direction': 'source_to_target'
-                    })
+                        'target_relative_path': target_relative_path,
+                        'direction': 'source_to_target',
+                        'size': source_info['size'],
+                        'mtime': source_info['mtime'],
+                        **self._get_link_fields(source_info)
+                    }
             else:
                 # 文件只存在于源目录中
-                sync_actions.append({
+                yield {
                     'action': 'copy',
                     'source': source_info['path'],
                     'target': os.path.join(target_path, relative_path),
                     'relative_path': relative_path,
-                    'direction': 'source_to_target'
-                })
+                    'direction': 'source_to_target',
+                    'size': source_info['size'],
+                    'mtime': source_info['mtime'],
+                    **self._get_link_fields(source_info)
+                }
                 
         # 双向同步：处理目标目录中的文件
         if sync_mode == "双向同步":
             for relative_path, target_info in target_files.items():
                 if relative_path not in source_files:
                     # 文件只存在于目标目录中
-                    sync_actions.append({
+                    yield {
                         'action': 'copy',
                         'source': target_info['path'],
                         'target': os.path.join(source_path, relative_path),
                         'relative_path': relative_path,
-                        'direction': 'target_to_source'
-                    })
+                        'direction': 'target_to_source',
+                        'size': target_info['size'],
+                        'mtime': target_info['mtime'],
+                        **self._get_link_fields(target_info)
+                    }
                 else:
                     # 文件存在于两个目录中，检查反向更新
                     source_info = source_files[relative_path]
-                    if self._need_update(target_info, source_info):
-                        sync_actions.append({
-                            'action': 'update',
+                    action_type = self._get_update_action(target_info, source_info, hash_stats, attributes=False)
+                    if action_type:
+                        target_relative_path = source_info.get('relative_path', relative_path)
+                        yield {
+                            'action': action_type,
                             'source': target_info['path'],
-                            'target': os.path.join(source_path, relative_path),
+                            'target': os.path.join(source_path, target_relative_path),
                             'relative_path': relative_path,
-                            'direction': 'target_to_source'
-                        })
+                            'target_relative_path': target_relative_path,
+                            'direction': 'target_to_source',
+                            'size': target_info['size'],
+                            'mtime': target_info['mtime'],
+                            **self._get_link_fields(target_info)
+                        }
                         
-        return sync_actions
+    def _get_update_action(self, source_info, target_info, hash_stats=None, attributes=True):
+        """返回已存在文件需要的动作：'update'、只同步修改时间的 'metadata'、只同步权限和扩展属性的 'attrs'，
+        不需要同步时返回None；attributes 为False时不比较权限和扩展属性（双向同步以源目录的为准）
+        """
+        # 符号链接只比较链接目标，不同时与普通文件一样按修改时间决定方向
+        if 'link' in source_info or 'link' in target_info:
+            if source_info.get('link') == target_info.get('link'):
+                return None
+            if abs(source_info['mtime'] - target_info['mtime']) > 1:
+                return 'update' if source_info['mtime'] > target_info['mtime'] else None
+            return 'update'
+        if not self._need_update(source_info, target_info, hash_stats):
+            # 内容相同（修改时间也一致）时单独比较权限和扩展属性
+            if (attributes and abs(source_info['mtime'] - target_info['mtime']) <= 1
+                    and self._attributes_differ(source_info, target_info)):
+                return 'attrs'
+            return None
+        if (self.metadata_fixup and not target_info.get('remote') and source_info['size'] == target_info['size']
+                and abs(source_info['mtime'] - target_info['mtime']) > 1
+                and self._is_same_content(source_info, target_info, hash_stats)):
+            return 'metadata'
+        return 'update'
+        
+    def _attributes_differ(self, source_info, target_info):
+        """扫描记录的权限或扩展属性是否不同（远程目标不比较）"""
+        if target_info.get('remote'):
+            return False
+        return ((self.sync_permissions and source_info.get('mode') != target_info.get('mode'))
+                or (self.sync_xattrs and source_info.get('xattrs') != target_info.get('xattrs')))
         
-    def _need_update(self, source_info, target_info):
+    def _is_same_content(self, source_info, target_info, hash_stats=None):
+        """大小相同、修改时间不同的两个文件内容是否一致：先用缓存的哈希，再比较抽样指纹"""
+        source_hash = self._get_file_hash(source_info['path'], cached_only=True)
+        target_hash = self._get_file_hash(target_info['path'], cached_only=True)
+        if source_hash and target_hash:
+            return source_hash == target_hash
+            
+        with self.profiler.stage('hash'):
+            source_sample = self.utils.calculate_sample_md5(source_info['path'], throttle=self._throttle_bytes)
+            target_sample = self.utils.calculate_sample_md5(target_info['path'], throttle=self._throttle_bytes)
+        self.profiler.count('sample_hash_calls', 2)
+        if source_sample is None or source_sample != target_sample:
+            return False
+        if self.metadata_fixup == 'sample':
+            return True
+            
+        # 抽样一致时用完整哈希确认（读取两侧仍比重新复制和校验少一次写入）
+        if hash_stats is not None:
+            hash_stats['files'] += 1
+            hash_stats['bytes'] += source_info['size'] + target_info['size']
+        source_hash = self._get_file_hash(source_info['path'])
+        return source_hash is not None and source_hash == self._get_file_hash(target_info['path'])
+        
+    def _get_link_fields(self, file_info):
+        """动作中携带的链接信息"""
+        return {key: file_info[key] for key in ('link', 'inode') if key in file_info}
+        
+    def _need_update(self, source_info, target_info, hash_stats=None):
         """判断是否需要更新文件"""
         # 首先比较修改时间
         if abs(source_info['mtime'] - target_info['mtime']) > 1:  # 允许1秒误差
@@ -197,71 +1402,957 @@ class SyncCore:
         if source_info['size'] != target_info['size']:
             return True
             
+        # 远程目标读取内容代价太高，大小和修改时间一致即视为相同
+        if target_info.get('remote'):
+            return False
+            
+        # 增量扫描模式信任文件元数据：大小和修改时间完全一致时不再比较内容
+        if self.incremental_scan and source_info['mtime'] == target_info['mtime']:
+            return False
+            
         # 如果大小相同，比较哈希值
+        if hash_stats is not None:
+            hash_stats['files'] += 1
+            hash_stats['bytes'] += source_info['size'] + target_info['size']
         source_hash = self._get_file_hash(source_info['path'])
         target_hash = self._get_file_hash(target_info['path'])
         
         return source_hash != target_hash
         
-    def _get_file_hash(self, file_path):
-        """计算文件哈希值"""
-        return self.utils.calculate_md5(file_path)
+    def _get_file_hash(self, file_path, cached_only=False):
+        """计算文件哈希值（按大小和修改时间缓存），cached_only 时只查缓存"""
+        try:
+            file_stat = os.stat(file_path)
+        except OSError:
+            return None
+        self.profiler.count('stat_calls')
+        
+        cache_key = (file_stat.st_size, file_stat.st_mtime_ns)
+        cached = self._hash_cache.get(file_path)
+        if cached and cached[0] == cache_key:
+            self.profiler.count('hash_cache_hits')
+            return cached[1]
+        if cached_only:
+            return None
+            
+        # 并行比较多个目标时，同一个源文件只计算一次
+        with self._hash_lock:
+            file_lock = self._hashing.setdefault(file_path, threading.Lock())
+        try:
+            with file_lock:
+                cached = self._hash_cache.get(file_path)
+                if cached and cached[0] == cache_key:
+                    self.profiler.count('hash_cache_hits')
+                    return cached[1]
+                    
+                self.profiler.count('hash_cache_misses')
+                with self.profiler.stage('hash'):
+                    file_hash = self.utils.calculate_md5(file_path, throttle=self._throttle_bytes)
+                self.profiler.count('bytes_hashed', file_stat.st_size)
+                
+                if file_hash is not None:
+                    self._hash_cache[file_path] = (cache_key, file_hash)
+                return file_hash
+        finally:
+            with self._hash_lock:
+                self._hashing.pop(file_path, None)
+        
+    def _run_action(self, action, retry_policy, retry_queue, finish_action, log_callback):
+        """执行一次同步动作；可重试的失败放入延迟重试队列，否则交给 finish_action 结束"""
+        relative_path = action['relative_path']
+        attempts = action.get('attempts', 0)
+        
+        # 目标文件被占用时直接延后，不在主流程中阻塞
+        if action['action'] == 'update' and attempts < retry_policy.max_retries - 1 and self._is_target_locked(action):
+            action['attempts'] = attempts + 1
+            action['error'] = "目标文件被占用"
+            self._defer_action(action, retry_policy, retry_queue, log_callback)
+            return
+            
+        action_start = time.perf_counter()
+        success, error = self._execute_sync_action(action, log_callback)
+        duration = time.perf_counter() - action_start
+        
+        # 复制过程中被停止，保留为未完成状态
+        if isinstance(error, SyncStopped):
+            return
+            
+        if not success and retry_policy.is_retryable(error) and action['attempts'] < retry_policy.max_retries:
+            self._defer_action(action, retry_policy, retry_queue, log_callback)
+            return
+            
+        if not success:
+            log_callback(f"失败: {relative_path} - {action['error']}")
+        finish_action(action, success, duration)
+        
+    def _defer_action(self, action, retry_policy, retry_queue, log_callback):
+        """把失败的动作按退避时间放入延迟重试队列"""
+        delay = retry_policy.get_delay(action['attempts'])
+        retry_queue.push(action, delay)
+        self.profiler.count('retries')
+        log_callback(f"重试 {action['attempts']}/{retry_policy.max_retries}: {action['relative_path']} - {action['error']}（{delay:.1f}秒后）")
+        
+    def _is_target_locked(self, action):
+        """预检查目标文件是否被其他进程占用"""
+        target = action['target']
+        return os.path.exists(target) and self.utils.is_file_locked(target)
+        
+    def _wait_for_retry(self, seconds):
+        """等待重试到期，期间响应停止请求；被停止时返回False"""
+        with self.profiler.stage('retry_sleep'):
+            deadline = time.monotonic() + seconds
+            while not self.stop_flag:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return True
+                time.sleep(min(remaining, 0.2))
+        return False
         
     def _execute_sync_action(self, action, log_callback):
-        """执行同步动作"""
+        """执行一次同步动作（不含重试），返回 (是否成功, 异常)"""
         source = action['source']
         target = action['target']
         relative_path = action['relative_path']
         action_type = action['action']
         direction = action['direction']
+        action['attempts'] = action.get('attempts', 0) + 1
         
-        # 重试机制
-        for attempt in range(self.max_retries):
-            try:
+        try:
+            if self.target_backend is not None:
+                # 远程目标：通过存储后端写入
+                if action_type in ['copy', 'update']:
+                    action['hash'], action['bytes'] = self._backend_copy(action)
+                    self.profiler.count('copy_calls')
+                    self.profiler.count('bytes_copied', action['bytes'])
+            else:
                 # 确保目标目录存在
                 target_dir = os.path.dirname(target)
                 os.makedirs(target_dir, exist_ok=True)
+                self.profiler.count('makedirs_calls')
                 
-                # 执行复制
-                if action_type in ['copy', 'update']:
-                    shutil.copy2(source, target)
+                # 执行复制：目标文件在上次尝试中已替换且未被改动时无需重新复制和校验
+                if action_type in ['copy', 'update'] and 'link' in action:
+                    self._copy_symlink(action)
+                    self.profiler.count('symlinks_copied')
+                elif action_type in ['copy', 'update'] and not self._is_replaced_target_intact(action):
+                    self._hash_cache.pop(target, None)
+                    if self.space_guard:
+                        self.space_guard.claim(action)
+                    if action.get('hardlink_of') and self._link_hardlink(action):
+                        self.profiler.count('hardlinks_created')
+                    elif action.get('dedup_of') and self._create_duplicate(action):
+                        self.profiler.count('dedup_files')
+                        self.profiler.count('bytes_deduplicated', action['size'])
+                    else:
+                        if self.space_guard and (action.get('hardlink_of') or action.get('dedup_of')):
+                            # 无法链接，改为普通复制，需要占用空间
+                            self.space_guard.claim(action, fallback=True)
+                        if self.transport and direction == 'source_to_target':
+                            action['hash'], action['bytes'] = self._transport_copy(action)
+                        else:
+                            action['hash'], action['bytes'] = self._atomic_copy(source, target, action)
+                        self.profiler.count('copy_calls')
+                        self.profiler.count('bytes_copied', action['bytes'])
+                    action['replaced'] = True
+                    self._sync_directory(target_dir)
+                elif action_type in ['metadata', 'attrs']:
+                    self._apply_metadata_action(action)
+                
+            action['error'] = None
+            direction_text = "→" if direction == 'source_to_target' else "←"
+            log_callback(f"{action_type.upper()} {direction_text} {relative_path}")
+            return True, None
+            
+        except Exception as e:
+            action['error'] = str(e)
+            return False, e
+            
+    def _execute_small_batch(self, batch, finish_action, log_callback):
+        """批量复制小文件：一次读入内存、直接写临时文件、整批校验后替换，只输出一条汇总日志
+        
+        成功的动作直接交给 finish_action；返回 (动作, 是否成功) 列表，失败的由调用方单独重试
+        """
+        start_time = time.perf_counter()
+        results = []
+        written = []
+        
+        with self.profiler.stage('copy'):
+            for action in batch:
+                if self.stop_flag:
+                    break
+                temp_path = action['target'] + TEMP_SUFFIX
+                
+                # 被占用的目标文件交给普通流程延后处理
+                if action['action'] == 'update' and self._is_target_locked(action):
+                    results.append((action, False))
+                    continue
                     
-                    # 验证复制结果
-                    if self._verify_copy(source, target):
-                        direction_text = "→" if direction == 'source_to_target' else "←"
-                        log_callback(f"{action_type.upper()} {direction_text} {relative_path}")
-                        return True
+                try:
+                    if self.space_guard:
+                        self.space_guard.claim(action)
+                    target_dir = os.path.dirname(action['target'])
+                    if target_dir not in self._created_dirs:
+                        os.makedirs(target_dir, exist_ok=True)
+                        self.profiler.count('makedirs_calls')
+                        self._created_dirs.add(target_dir)
+                        
+                    self._throttle_files(1)
+                    with open(action['source'], 'rb') as f:
+                        source_stat = os.fstat(f.fileno())
+                        self._throttle_bytes(source_stat.st_size)
+                        data = f.read()
+                    if len(data) != source_stat.st_size:
+                        raise Exception("复制过程中源文件被修改")
+                        
+                    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o600)
+                    try:
+                        view = memoryview(data)
+                        while view:
+                            view = view[os.write(fd, view):]
+                        if self.fsync_policy != 'none':
+                            os.fsync(fd)
+                    finally:
+                        os.close(fd)
+                    os.chmod(temp_path, stat.S_IMODE(source_stat.st_mode))
+                    if self.sync_xattrs:
+                        self.utils.copy_xattrs(action['source'], temp_path)
+                    os.utime(temp_path, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+                    written.append((action, temp_path, data, source_stat))
+                except Exception as e:
+                    action['error'] = str(e)
+                    self._remove_temp(temp_path)
+                    results.append((action, False))
+                    
+        # 整批校验：读回临时文件与内存中的内容比较
+        verified = []
+        with self.profiler.stage('verify'):
+            for action, temp_path, data, source_stat in written:
+                try:
+                    if self.verify_hash:
+                        self._throttle_bytes(len(data))
+                        with open(temp_path, 'rb') as f:
+                            ok = f.read() == data
+                        self.profiler.count('bytes_hashed', len(data))
                     else:
+                        ok = os.path.getsize(temp_path) == len(data)
+                    if not ok:
                         raise Exception("文件校验失败")
-                        
-            except Exception as e:
-                if attempt < self.max_retries - 1:
-                    log_callback(f"重试 {attempt + 1}/{self.max_retries}: {relative_path} - {str(e)}")
-                    time.sleep(1)  # 等待1秒后重试
+                    self._preserve_version(action)
+                    os.replace(temp_path, action['target'])
+                    verified.append((action, data, source_stat))
+                except Exception as e:
+                    action['error'] = str(e)
+                    self._remove_temp(temp_path)
+                    results.append((action, False))
+                    
+        total_bytes = 0
+        duration = (time.perf_counter() - start_time) / max(len(batch), 1)
+        for action, data, source_stat in verified:
+            # 目标文件的修改时间已设为与源文件一致，可共用缓存键
+            digest = hashlib.md5(data).hexdigest()
+            cache_key = (source_stat.st_size, source_stat.st_mtime_ns)
+            self._hash_cache[action['source']] = (cache_key, digest)
+            self._hash_cache[action['target']] = (cache_key, digest)
+            action['attempts'] = action.get('attempts', 0) + 1
+            action['bytes'] = len(data)
+            action['hash'] = digest
+            action['error'] = None
+            total_bytes += len(data)
+            self._sync_directory(os.path.dirname(action['target']))
+            finish_action(action, True, duration, notify=False)
+            results.append((action, True))
+            
+        self.profiler.count('copy_calls', len(verified))
+        self.profiler.count('bytes_copied', total_bytes)
+        self.profiler.count('small_file_batches')
+        if verified:
+            log_callback(f"批量复制 {len(verified)}/{len(batch)} 个小文件 ({self.utils.format_file_size(total_bytes)})")
+        return results
+        
+    def _execute_metadata_batch(self, batch, finish_action, log_callback):
+        """批量同步只有修改时间、权限或扩展属性不同的文件（不复制内容），只输出一条汇总日志
+        
+        成功的动作直接交给 finish_action；返回 (动作, 是否成功) 列表，失败的由调用方单独重试
+        """
+        start_time = time.perf_counter()
+        results = []
+        applied = []
+        with self.profiler.stage('metadata'):
+            for action in batch:
+                if self.stop_flag:
+                    break
+                try:
+                    self._apply_metadata_action(action)
+                    applied.append(action)
+                except Exception as e:
+                    action['error'] = str(e)
+                    results.append((action, False))
+                    
+        duration = (time.perf_counter() - start_time) / max(len(batch), 1)
+        for action in applied:
+            action['attempts'] = action.get('attempts', 0) + 1
+            action['error'] = None
+            finish_action(action, True, duration, notify=False)
+            results.append((action, True))
+        self.profiler.count('metadata_batches')
+        if applied:
+            log_callback(f"批量同步元数据 {len(applied)}/{len(batch)} 个文件")
+        return results
+        
+    def _apply_metadata_action(self, action):
+        """执行只同步元数据的动作：metadata 同步修改时间，attrs 同步权限和扩展属性"""
+        if action['action'] == 'metadata':
+            self._copy_file_times(action['source'], action['target'])
+            self.profiler.count('metadata_fixups')
+        if self.sync_permissions or self.sync_xattrs:
+            self._copy_attributes(action['source'], action['target'])
+            self.profiler.count('attribute_syncs')
+        self._mark_scan_stale(action['target'])
+            
+    def _mark_scan_stale(self, target):
+        """原地修改元数据不改变所在目录的修改时间，记录该目录，同步结束后让增量扫描重新列出"""
+        if not self.incremental_scan:
+            return
+        root = self._get_sync_root(target)
+        if root is not None:
+            relative_dir = os.path.relpath(os.path.dirname(os.path.abspath(target)), root)
+            self._stale_scan_dirs.add((root, '' if relative_dir == os.curdir else relative_dir))
+            
+    def _invalidate_scan_state(self, config):
+        """把记录的目录在增量扫描状态中标记为不稳定，下次扫描时重新列出而不是沿用旧的文件信息"""
+        if not self._stale_scan_dirs:
+            return
+        include_patterns, exclude_patterns = self._parse_filter_rules(config.get('filter_rules', ''))
+        filter_key = self._get_filter_key(include_patterns, exclude_patterns)
+        by_root = {}
+        for root, relative_dir in self._stale_scan_dirs:
+            by_root.setdefault(root, set()).add(relative_dir)
+        self._stale_scan_dirs = set()
+        for root, relative_dirs in by_root.items():
+            state = ScanState(self.scan_state_dir, root, filter_key).load()
+            changed = False
+            for relative_dir in relative_dirs:
+                entry = state.dirs.get(relative_dir)
+                if entry and entry['stable']:
+                    entry['stable'] = False
+                    changed = True
+            if changed:
+                try:
+                    state.save()
+                except OSError:
+                    pass
+                    
+    def _copy_attributes(self, source, target):
+        """同步权限和扩展属性（POSIX ACL 以扩展属性保存，一并同步），不改变内容和修改时间"""
+        if self.sync_permissions:
+            os.chmod(target, stat.S_IMODE(os.stat(source).st_mode))
+        if self.sync_xattrs:
+            self.utils.copy_xattrs(source, target)
+            
+    def _throttle_bytes(self, amount):
+        """按带宽限速等待，并统计等待时间"""
+        wait = self.throttle.consume_bytes(amount)
+        if wait:
+            self.profiler.count('throttle_wait_seconds', wait)
+            
+    def _throttle_files(self, count):
+        """按文件数限速等待，并统计等待时间"""
+        wait = self.throttle.consume_files(count)
+        if wait:
+            self.profiler.count('throttle_wait_seconds', wait)
+            
+    def _remove_temp(self, temp_path):
+        """删除残留的临时文件"""
+        try:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        except OSError:
+            pass
+            
+    def _atomic_copy(self, source, target, action):
+        """复制到目标目录中的临时文件，校验通过后原子替换目标文件，返回 (MD5, 字节数)"""
+        source_stat = os.stat(source)
+        resumable = self._checkpoint is not None and source_stat.st_size >= self.resume_min_size
+        if resumable:
+            # 大文件使用固定的临时文件名，中断后可以续传
+            temp_path = target + TEMP_SUFFIX
+        else:
+            fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(target)}.", suffix=TEMP_SUFFIX, dir=os.path.dirname(target))
+            os.close(fd)
+            
+        try:
+            self._throttle_files(1)
+            with self.profiler.stage('copy'):
+                digest, copied_size = self._copy_to_temp(source, temp_path, action, resumable)
+                shutil.copystat(source, temp_path)
+                
+            # 复制过程中源文件被修改，本次结果无效
+            current_stat = os.stat(source)
+            if (current_stat.st_size, current_stat.st_mtime_ns) != (source_stat.st_size, source_stat.st_mtime_ns):
+                raise Exception("复制过程中源文件被修改")
+                
+            # 验证临时文件：重新读取并与复制时计算的MD5比较
+            with self.profiler.stage('verify'):
+                verified = self._verify_temp(temp_path, copied_size, digest)
+            if not verified:
+                raise Exception("文件校验失败")
+                
+            if self.fsync_policy != 'none':
+                self._fsync_file(temp_path)
+            self._preserve_version(action)
+            os.replace(temp_path, target)
+        except SyncStopped:
+            if not resumable and os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+            
+        # 复制时计算的MD5同时适用于源文件和目标文件
+        target_stat = os.stat(target)
+        self._hash_cache[source] = ((source_stat.st_size, source_stat.st_mtime_ns), digest)
+        self._hash_cache[target] = ((target_stat.st_size, target_stat.st_mtime_ns), digest)
+        return digest, copied_size
+        
+    def _backend_copy(self, action):
+        """通过存储后端复制到远程目标，返回 (MD5, 字节数)
+        
+        不支持原子写入的后端先写临时文件，核对大小、设置修改时间后再重命名
+        """
+        backend = self.target_backend
+        source = action['source']
+        remote_path = self._get_target_relative_path(action).replace(os.sep, '/')
+        write_path = remote_path if backend.atomic_writes else remote_path + TEMP_SUFFIX
+        hasher = hashlib.md5()
+        copied_size = 0
+        
+        self._throttle_files(1)
+        try:
+            with self.profiler.stage('copy'):
+                with open(source, 'rb') as src:
+                    source_stat = os.fstat(src.fileno())
+                    with backend.open_write(write_path, source_stat.st_mtime) as dst:
+                        while chunk := src.read(1024 * 1024):
+                            if self.stop_flag:
+                                raise SyncStopped("同步已停止")
+                            self._throttle_bytes(len(chunk))
+                            dst.write(chunk)
+                            hasher.update(chunk)
+                            copied_size += len(chunk)
+                        current_stat = os.stat(source)
+                        if (current_stat.st_size, current_stat.st_mtime_ns) != (source_stat.st_size, source_stat.st_mtime_ns):
+                            raise Exception("复制过程中源文件被修改")
+                            
+            if not backend.atomic_writes:
+                with self.profiler.stage('verify'):
+                    remote_stat = backend.stat(write_path)
+                if remote_stat is None or remote_stat[0] != copied_size:
+                    raise Exception("文件校验失败")
+                backend.set_mtime(write_path, source_stat.st_mtime)
+                backend.rename(write_path, remote_path)
+        except BaseException:
+            if not backend.atomic_writes:
+                try:
+                    backend.delete(write_path)
+                except Exception:
+                    pass
+            raise
+            
+        digest = hasher.hexdigest()
+        self._hash_cache[source] = ((source_stat.st_size, source_stat.st_mtime_ns), digest)
+        return digest, copied_size
+        
+    def _transport_copy(self, action):
+        """通过压缩传输发送到接收端（接收端校验并原子替换），返回 (MD5, 字节数)"""
+        def progress(amount):
+            if self.stop_flag:
+                raise SyncStopped("同步已停止")
+            # 限速按实际发送的字节数计算
+            self._throttle_bytes(amount)
+            
+        source = action['source']
+        self._throttle_files(1)
+        # 接收端直接替换目标文件，发送前先保留旧版本
+        self._preserve_version(action)
+        with self.profiler.stage('copy'):
+            source_stat = os.stat(source)
+            digest, raw_bytes, sent_bytes = self.transport.send_file(
+                source, self._get_target_relative_path(action), self.verify_hash, self.fsync_policy != 'none', progress)
+        self.profiler.count('bytes_transport_raw', raw_bytes)
+        self.profiler.count('bytes_sent', sent_bytes)
+        
+        self._hash_cache[source] = ((source_stat.st_size, source_stat.st_mtime_ns), digest)
+        try:
+            target_stat = os.stat(action['target'])
+            self._hash_cache[action['target']] = ((target_stat.st_size, target_stat.st_mtime_ns), digest)
+        except OSError:
+            pass
+        return digest, raw_bytes
+        
+    def _get_target_relative_path(self, action):
+        """目标文件相对于目标根目录的实际路径（按规范化路径对应时可能与源文件的写法不同）"""
+        return action.get('target_relative_path', action['relative_path'])
+        
+    def _create_duplicate(self, action):
+        """用目标端已复制的相同内容生成重复文件，首个文件或源文件已变化时返回False（改为从源端复制）"""
+        source = action['source']
+        target = action['target']
+        primary = action['dedup_of']
+        digest = action['dedup_hash']
+        # 首个文件须是本次复制完成且未被改动的，源文件须与计算哈希时一致
+        primary_stat = self._get_cached_stat(primary, digest)
+        source_stat = self._get_cached_stat(source, digest)
+        if primary_stat is None or source_stat is None:
+            return False
+            
+        # 硬链接共享修改时间，只链接到修改时间相同的文件，否则下次比较时会反复更新
+        if self.dedup_policy == 'hardlink':
+            self._dedup_link_targets.setdefault((digest, primary_stat.st_mtime_ns), primary)
+            link_source = self._dedup_link_targets.get((digest, source_stat.st_mtime_ns))
+            if link_source and self._get_cached_stat(link_source, digest):
+                temp_path = target + TEMP_SUFFIX
+                try:
+                    self._remove_temp(temp_path)
+                    os.link(link_source, temp_path)
+                    self._preserve_version(action)
+                    os.replace(temp_path, target)
+                except OSError:
+                    self._remove_temp(temp_path)
                 else:
-                    log_callback(f"失败: {relative_path} - {str(e)}")
-                    return False
+                    self._hash_cache[target] = ((source_stat.st_size, source_stat.st_mtime_ns), digest)
+                    action['hash'], action['bytes'], action['dedup'] = digest, 0, 'hardlink'
+                    return True
                     
-        return False
+        if self.space_guard:
+            # 无法链接时由首个文件复制生成，需要占用空间
+            self.space_guard.claim(action, fallback=True)
+        fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(target)}.", suffix=TEMP_SUFFIX, dir=os.path.dirname(target))
+        os.close(fd)
+        try:
+            if self.dedup_policy != 'copy' and self._reflink(primary, temp_path):
+                action['dedup'] = 'reflink'
+            else:
+                with self.profiler.stage('copy'):
+                    copied_digest, copied_size = self._copy_to_temp(primary, temp_path, action, False)
+                with self.profiler.stage('verify'):
+                    if copied_digest != digest or not self._verify_temp(temp_path, copied_size, digest):
+                        raise Exception("文件校验失败")
+                action['dedup'] = 'copy'
+            os.chmod(temp_path, stat.S_IMODE(source_stat.st_mode))
+            os.utime(temp_path, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+            if self.fsync_policy != 'none':
+                self._fsync_file(temp_path)
+            self._preserve_version(action)
+            os.replace(temp_path, target)
+        except Exception:
+            self._remove_temp(temp_path)
+            raise
+            
+        target_stat = os.stat(target)
+        self._hash_cache[target] = ((target_stat.st_size, target_stat.st_mtime_ns), digest)
+        if self.dedup_policy == 'hardlink':
+            self._dedup_link_targets.setdefault((digest, target_stat.st_mtime_ns), target)
+        action['hash'], action['bytes'] = digest, 0
+        return True
+        
+    def _get_cached_stat(self, file_path, digest):
+        """文件的缓存哈希为 digest 且大小和修改时间未变时返回其状态，否则返回None"""
+        try:
+            file_stat = os.stat(file_path)
+        except OSError:
+            return None
+        if self._hash_cache.get(file_path) != ((file_stat.st_size, file_stat.st_mtime_ns), digest):
+            return None
+        return file_stat
         
-    def _verify_copy(self, source, target):
-        """验证复制结果"""
-        if not os.path.exists(target):
+    def _reflink(self, source, target):
+        """写时复制克隆文件（Linux FICLONE，btrfs/XFS 等支持），不支持时返回False"""
+        try:
+            import fcntl
+        except ImportError:
+            return False
+        try:
+            with open(source, 'rb') as src, open(target, 'wb') as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return True
+        except OSError:
             return False
             
-        # 比较文件大小
-        if os.path.getsize(source) != os.path.getsize(target):
+    def _preserve_version(self, action):
+        """版本保留：替换前把旧文件硬链接（不支持硬链接时移动）到版本目录，不复制数据"""
+        if not self.versioning or action['action'] != 'update':
+            return
+        target = action['target']
+        root = self._get_sync_root(target)
+        if root is None:
+            return
+        version_path = os.path.join(root, self.versions_dir, self._version_stamp, os.path.relpath(target, root))
+        # 重试时本次运行已保留过旧文件，目标文件已经是新内容
+        if os.path.lexists(version_path) or not os.path.exists(target):
+            return
+        os.makedirs(os.path.dirname(version_path), exist_ok=True)
+        try:
+            os.link(target, version_path, follow_symlinks=False)
+        except OSError:
+            os.rename(target, version_path)
+        self.profiler.count('versions_saved')
+        
+    def _get_sync_root(self, target):
+        """目标文件所在的同步根目录（版本目录和增量扫描状态都按根目录保存），不在任何根目录下时返回None"""
+        target = os.path.normpath(os.path.abspath(target))
+        roots = [os.path.normpath(os.path.abspath(root)) for root in self._sync_roots]
+        matches = [root for root in roots if target.startswith(root + os.sep)]
+        return max(matches, key=len) if matches else None
+        
+    def _start_version_pruning(self, config, roots, log_callback):
+        """在后台低优先级线程中清理过期的版本（上一次清理未结束时跳过）"""
+        if self._prune_thread is not None and self._prune_thread.is_alive():
+            return
+        keep = config.get('versions_keep', 10)
+        max_days = config.get('versions_max_days', 30)
+        if keep is None and max_days is None:
+            return
+        self._prune_thread = threading.Thread(target=self._prune_versions, args=(roots, keep, max_days, log_callback))
+        self._prune_thread.daemon = True
+        self._prune_thread.start()
+        
+    def _prune_versions(self, roots, keep, max_days, log_callback):
+        """清理版本目录：超出每个文件最新 keep 个版本、且早于 max_days 天的版本被删除（未设置的条件不限制）"""
+        lower_thread_priority()
+        cutoff = (datetime.now() - timedelta(days=max_days)).strftime(VERSION_STAMP_FORMAT) if max_days is not None else None
+        removed = 0
+        for root in roots:
+            versions_root = os.path.join(root, self.versions_dir)
+            try:
+                stamps = sorted(os.listdir(versions_root), reverse=True)
+            except OSError:
+                continue
+                
+            # 从最新的运行开始，统计每个文件已保留的版本数
+            kept = {}
+            for stamp in stamps:
+                try:
+                    datetime.strptime(stamp, VERSION_STAMP_FORMAT)
+                except ValueError:
+                    continue
+                stamp_dir = os.path.join(versions_root, stamp)
+                for dirpath, _, files in os.walk(stamp_dir):
+                    for name in files:
+                        file_path = os.path.join(dirpath, name)
+                        relative_path = os.path.relpath(file_path, stamp_dir)
+                        kept[relative_path] = kept.get(relative_path, 0) + 1
+                        if (keep is None or kept[relative_path] > keep) and (cutoff is None or stamp < cutoff):
+                            try:
+                                os.remove(file_path)
+                                removed += 1
+                            except OSError:
+                                pass
+                # 删除清理后留下的空目录
+                for dirpath, _, _ in os.walk(stamp_dir, topdown=False):
+                    try:
+                        os.rmdir(dirpath)
+                    except OSError:
+                        pass
+        if removed:
+            log_callback(f"版本清理: 删除 {removed} 个旧版本")
+            
+    def _copy_symlink(self, action):
+        """把符号链接作为链接复制（不读取指向的文件），替换目标文件或旧链接"""
+        target = action['target']
+        temp_path = target + TEMP_SUFFIX
+        if os.path.lexists(temp_path):
+            os.remove(temp_path)
+        os.symlink(action['link'], temp_path)
+        try:
+            if os.utime in os.supports_follow_symlinks:
+                source_stat = os.lstat(action['source'])
+                os.utime(temp_path, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns), follow_symlinks=False)
+            self._preserve_version(action)
+            os.replace(temp_path, target)
+        except Exception:
+            if os.path.lexists(temp_path):
+                os.remove(temp_path)
+            raise
+            
+    def _link_hardlink(self, action):
+        """硬链接组的其余成员链接到目标端同组已复制的文件，无法链接时返回False改为普通复制"""
+        anchor = action['hardlink_of']
+        target = action['target']
+        try:
+            if os.path.exists(target) and os.path.samefile(anchor, target):
+                return True
+            temp_path = target + TEMP_SUFFIX
+            self._remove_temp(temp_path)
+            os.link(anchor, temp_path)
+        except OSError:
             return False
+        try:
+            self._preserve_version(action)
+            os.replace(temp_path, target)
+        except Exception:
+            self._remove_temp(temp_path)
+            raise
+        return True
+        
+    def _copy_sparse(self, source, temp_path):
+        """稀疏文件只复制数据区段（SEEK_DATA/SEEK_HOLE），空洞在目标中仍为空洞；MD5按完整内容计算"""
+        hasher = hashlib.md5()
+        chunk_size = 1024 * 1024
+        zeros = bytes(chunk_size)
+        with open(source, 'rb') as src, open(temp_path, 'wb') as dst:
+            fd = src.fileno()
+            size = os.fstat(fd).st_size
+            position = 0
+            while position < size:
+                try:
+                    data_start = os.lseek(fd, position, os.SEEK_DATA)
+                except OSError:
+                    # 之后没有数据区段（ENXIO）
+                    data_start = size
+                # 空洞部分只参与MD5计算，不读写磁盘
+                hole = data_start - position
+                self.profiler.count('bytes_sparse_skipped', hole)
+                while hole > 0:
+                    hasher.update(zeros[:min(chunk_size, hole)])
+                    hole -= chunk_size
+                if data_start >= size:
+                    break
+                data_end = min(os.lseek(fd, data_start, os.SEEK_HOLE), size)
+                src.seek(data_start)
+                dst.seek(data_start)
+                remaining = data_end - data_start
+                while remaining > 0:
+                    if self.stop_flag:
+                        raise SyncStopped("同步已停止")
+                    chunk = src.read(min(chunk_size, remaining))
+                    if not chunk:
+                        break
+                    self._throttle_bytes(len(chunk))
+                    dst.write(chunk)
+                    hasher.update(chunk)
+                    remaining -= len(chunk)
+                position = data_end
+            dst.truncate(size)
+        return hasher.hexdigest(), size
+        
+    def _is_sparse(self, source):
+        """源文件是否有空洞（分配的块少于文件大小）且系统支持 SEEK_DATA"""
+        if not hasattr(os, 'SEEK_DATA'):
+            return False
+        source_stat = os.stat(source)
+        blocks = getattr(source_stat, 'st_blocks', None)
+        return blocks is not None and blocks * 512 < source_stat.st_size
+        
+    def _is_sparse_source(self, source):
+        """源文件可按稀疏文件复制时返回True，无法读取时返回False（由复制过程报告错误）"""
+        try:
+            return self._is_sparse(source)
+        except OSError:
+            return False
+            
+    def _copy_to_temp(self, source, temp_path, action, resumable):
+        """分块复制源文件到临时文件，同时计算MD5；可续传的大文件定期保存断点"""
+        hasher = hashlib.md5()
+        offset = 0
+        index = action.get('index')
+        
+        if resumable:
+            state = self._checkpoint.get_partial(index)
+            if state and os.path.exists(temp_path) and os.path.getsize(temp_path) >= state['offset']:
+                if self._validate_partial(source, temp_path, state['offset'], state['digest'], hasher):
+                    offset = state['offset']
+                    self.profiler.count('bytes_resumed', offset)
+                else:
+                    hasher = hashlib.md5()
+                    
+        # 稀疏文件从头复制时保留空洞（不保存续传断点）
+        if self.sparse_copy and not offset and self._is_sparse(source):
+            return self._copy_sparse(source, temp_path)
             
-        # 比较哈希值
-        source_hash = self._get_file_hash(source)
-        target_hash = self._get_file_hash(target)
+        chunk_size = 1024 * 1024
+        next_checkpoint = offset + self.resume_checkpoint_interval
+        with open(source, 'rb') as src, open(temp_path, 'r+b' if offset else 'wb') as dst:
+            src.seek(offset)
+            dst.seek(offset)
+            dst.truncate()
+            while chunk := src.read(chunk_size):
+                if self.stop_flag:
+                    raise SyncStopped("同步已停止")
+                self._throttle_bytes(len(chunk))
+                dst.write(chunk)
+                hasher.update(chunk)
+                offset += len(chunk)
+                if resumable and offset >= next_checkpoint:
+                    dst.flush()
+                    self._checkpoint.save_partial(index, offset, hasher.hexdigest())
+                    next_checkpoint = offset + self.resume_checkpoint_interval
+                    
+        return hasher.hexdigest(), offset
+        
+    def _validate_partial(self, source, partial_path, offset, digest, hasher):
+        """校验断点前的内容：部分文件和源文件的前 offset 字节都要与记录的MD5一致"""
+        source_hasher = hashlib.md5()
+        chunk_size = 1024 * 1024
+        with open(source, 'rb') as src, open(partial_path, 'rb') as dst:
+            remaining = offset
+            while remaining > 0:
+                size = min(chunk_size, remaining)
+                partial_chunk = dst.read(size)
+                source_chunk = src.read(size)
+                self._throttle_bytes(len(partial_chunk) + len(source_chunk))
+                if not partial_chunk or not source_chunk:
+                    return False
+                hasher.update(partial_chunk)
+                source_hasher.update(source_chunk)
+                remaining -= len(partial_chunk)
+        return hasher.hexdigest() == digest and source_hasher.hexdigest() == digest
+        
+    def _verify_temp(self, temp_path, expected_size, digest):
+        """验证临时文件的大小和内容；verify_hash 关闭时只比较大小"""
+        if os.path.getsize(temp_path) != expected_size:
+            return False
+        if not self.verify_hash:
+            return True
+        self.profiler.count('bytes_hashed', expected_size)
+        return self.utils.calculate_md5(temp_path, throttle=self._throttle_bytes) == digest
         
-        return source_hash == target_hash
+    def _is_replaced_target_intact(self, action):
+        """重试时判断目标文件是否已在之前的尝试中替换完成且未被改动"""
+        if not action.get('replaced'):
+            return False
+        cached = self._hash_cache.get(action['target'])
+        try:
+            target_stat = os.stat(action['target'])
+        except OSError:
+            return False
+        return cached is not None and cached[0] == (target_stat.st_size, target_stat.st_mtime_ns) and cached[1] == action.get('hash')
         
+    def _copy_file_times(self, source, target):
+        """内容相同的文件只同步访问和修改时间（纳秒精度，下次比较时元数据完全一致）"""
+        source_stat = os.stat(source)
+        os.utime(target, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns))
+        # 目标的缓存哈希随修改时间一起更新
+        cached = self._hash_cache.pop(target, None)
+        if cached and cached[0][0] == source_stat.st_size:
+            self._hash_cache[target] = ((source_stat.st_size, source_stat.st_mtime_ns), cached[1])
+            
+    def _fsync_file(self, file_path):
+        """把文件内容刷到磁盘"""
+        fd = os.open(file_path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+            
+    def _sync_directory(self, directory):
+        """按 fsync_policy 刷新目录项：always 立即刷新，batch 攒够一批再刷新"""
+        if self.fsync_policy == 'always':
+            self._fsync_directory(directory)
+        elif self.fsync_policy == 'batch':
+            with self._dir_sync_lock:
+                self._pending_dir_syncs.add(directory)
+                full = len(self._pending_dir_syncs) >= self.fsync_batch_size
+            if full:
+                self._flush_directory_syncs()
+                
+    def _flush_directory_syncs(self):
+        """刷新所有待刷新的目录"""
+        with self._dir_sync_lock:
+            pending = self._pending_dir_syncs
+            self._pending_dir_syncs = set()
+        for directory in pending:
+            try:
+                self._fsync_directory(directory)
+            except OSError:
+                continue
+                
+    def _fsync_directory(self, directory):
+        """刷新目录项，使重命名持久化（Windows 不支持打开目录，跳过）"""
+        if os.name == 'nt':
+            return
+        fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+            
     def stop_sync(self):
-        """停止同步"""
+        """停止同步（包括实时同步）"""
         self.stop_flag = True
+        self._watch_stop.set()
+        
+    def watch_directories(self, config):
+        """实时同步：先同步一次，然后监控源目录（双向同步时也监控目标目录），有变化时增量同步，直到调用 stop_sync
+        
+        监控事件标记的目录在增量扫描时强制重新列出；每隔 watch_rescan_interval 秒无论有无事件都同步一次，
+        覆盖监控不到的变化（如超出 inotify 监视上限的目录）
+        """
+        self._watch_stop.clear()
+        log_callback = config.get('log_callback')
+        config = dict(config)
+        config.setdefault('incremental_scan', True)
+        quiet_period = config.get('watch_quiet_period', 2)
+        rescan_interval = config.get('watch_rescan_interval', 300)
+        
+        roots = [config['source_path']]
+        if config['sync_mode'] == "双向同步":
+            roots.append(config['target_path'])
+            
+        result = self.sync_directories(config)
+        events = queue.Queue()
+        watchers = []
+        try:
+            for root in roots:
+                watcher = create_watcher(root, events.put, config.get('watch_backend', 'auto'), log_callback,
+                                         config.get('watch_poll_interval', 10), self._load_directory_index(root, config))
+                watcher.start()
+                watchers.append(watcher)
+            log_callback(f"实时同步已启动（{type(watchers[0]).__name__}）")
+            
+            # 合并事件并等待文件写入完成，未稳定的文件本批不同步
+            coalescer = EventCoalescer(roots, quiet_period, config.get('watch_max_pending', 10000), config.get('watch_max_delay', 60))
+            last_sync = time.monotonic()
+            while not self._watch_stop.is_set():
+                try:
+                    event = events.get(timeout=0.5)
+                    while True:
+                        if not event['path'].endswith(TEMP_SUFFIX):
+                            coalescer.add(event)
+                        event = events.get_nowait()
+                except queue.Empty:
+                    pass
+                    
+                batch = coalescer.collect()
+                if batch is None:
+                    if coalescer.has_pending() or time.monotonic() - last_sync < rescan_interval:
+                        continue
+                    batch = {'dirty_dirs': set(), 'dirty_subtrees': set(), 'unsettled': set()}
+                if self._watch_stop.is_set():
+                    break
+                    
+                config['dirty_dirs'] = batch['dirty_dirs']
+                config['dirty_subtrees'] = batch['dirty_subtrees']
+                config['unsettled_paths'] = batch['unsettled']
+                result = self.sync_directories(config)
+                last_sync = time.monotonic()
+        finally:
+            for watcher in watchers:
+                watcher.stop()
+            self._dirty_dirs = set()
+            self._dirty_subtrees = set()
+            self._unsettled_paths = set()
+        log_callback("实时同步已停止")
+        return result
+        
+    def _load_directory_index(self, root, config):
+        """读取增量扫描保存的目录索引 {目录绝对路径: 修改时间}，供轮询监控使用"""
+        include_patterns, exclude_patterns = self._parse_filter_rules(config.get('filter_rules', ''))
+        state = ScanState(self.scan_state_dir, root, self._get_filter_key(include_patterns, exclude_patterns)).load()
+        if not state.dirs:
+            return None
+        return {os.path.join(root, relative_dir) if relative_dir else root: entry['mtime_ns'] for relative_dir, entry in state.dirs.items()}
         
     def get_directory_info(self, directory):
         """获取目录信息"""
@@ -286,33 +2377,105 @@ class SyncCore:
             'total_size_mb': round(total_size / (1024 * 1024), 2)
         }
         
-    def preview_sync(self, config):
-        """预览同步操作（不实际执行）"""
+    def preview_sync(self, config, offset=0, limit=None):
+        """预览同步操作（不实际执行）
+        
+        返回按执行顺序排列的动作（offset/limit 分页，不保存整个计划）、统计信息和按历史吞吐量估算的耗时
+        """
+        # 预览期间后台审计暂停；预览的耗时记入单独的统计，不混入上一次同步的统计
+        self.is_previewing = True
+        self._scan_cache_fill = True
+        last_profiler = self.profiler
+        self.profiler = SyncProfiler()
+        try:
+            return self._preview(config, offset, limit)
+        finally:
+            self.profiler = last_profiler
+            self._scan_cache_fill = False
+            self.is_previewing = False
+            
+    def _preview(self, config, offset, limit):
+        """扫描、比较并按执行顺序取出一页动作；多目标配置时包含各目标的动作"""
         source_path = config['source_path']
-        target_path = config['target_path']
-        sync_mode = config['sync_mode']
+        sync_mode = config.get('sync_mode', '单向同步')
         filter_rules = config.get('filter_rules', '')
+        log_callback = config.get('log_callback') or (lambda message: None)
         
         # 解析过滤规则
         include_patterns, exclude_patterns = self._parse_filter_rules(filter_rules)
         
-        # 获取文件列表
+        # 获取文件列表（扫描结果缓存供随后的同步使用）
+        self._configure_scan(config)
+        if config.get('target_paths'):
+            target_paths = self._get_target_paths(config)
+            sync_mode = '单向同步'
+        else:
+            target_paths = [config['target_path']]
+        self._preview_roots = self._get_scan_roots([source_path] + target_paths)
         source_files = self._get_file_list(source_path, include_patterns, exclude_patterns)
-        target_files = self._get_file_list(target_path, include_patterns, exclude_patterns)
-        
-        # 比较文件
-        sync_actions = self._compare_files(source_path, target_path, source_files, target_files, sync_mode)
-        
+        collisions = []
+        plans = []
+        for target_path in target_paths:
+            self._open_target_backend(config, target_path)
+            try:
+                target_files = self._get_file_list(target_path, include_patterns, exclude_patterns)
+            finally:
+                self._close_target_backend()
+            plans.append((target_path,) + self._align_paths(source_files, target_files, log_callback, collisions))
+            
         # 统计信息
         stats = {
-            'total_actions': len(sync_actions),
-            'copy_actions': len([a for a in sync_actions if a['action'] == 'copy']),
-            'update_actions': len([a for a in sync_actions if a['action'] == 'update']),
-            'source_to_target': len([a for a in sync_actions if a['direction'] == 'source_to_target']),
-            'target_to_source': len([a for a in sync_actions if a['direction'] == 'target_to_source'])
+            'total_actions': 0,
+            'copy_actions': 0,
+            'update_actions': 0,
+            'metadata_actions': 0,
+            'attrs_actions': 0,
+            'source_to_target': 0,
+            'target_to_source': 0,
+            'total_bytes': 0
         }
+        stats['path_collisions'] = len(collisions)
+        hash_stats = {'files': 0, 'bytes': 0}
+        
+        def compared_actions():
+            for target_path, aligned_source, target_files in plans:
+                yield from self._iter_compare(source_path, target_path, aligned_source, target_files, sync_mode, hash_stats)
+                
+        def counted(actions):
+            for action in actions:
+                stats['total_actions'] += 1
+                stats[f"{action['action']}_actions"] += 1
+                stats[action['direction']] += 1
+                if action['action'] in ('copy', 'update'):
+                    stats['total_bytes'] += action['size']
+                yield action
+                
+        # 比较文件，按执行顺序取出需要的一页
+        sync_actions = self._create_planner(config).select(counted(compared_actions()), offset, limit)
+        stats['hash_files'] = hash_stats['files']
+        stats['hash_bytes'] = hash_stats['bytes']
+        stats.update(self._estimate_duration(config, stats['total_bytes']))
         
         return {
             'actions': sync_actions,
             'stats': stats
-        }
\ No newline at end of file
+        }
+        
+    def _estimate_duration(self, config, total_bytes):
+        """按该配置最近几次运行的实测吞吐量（受限速约束）估算传输耗时"""
+        throughput = None
+        journal_dir = config.get('journal_dir', os.path.join('logs', 'journal'))
+        if journal_dir:
+            try:
+                throughput = estimate_throughput(journal_dir, config.get('profile_name', 'default'))
+            except (OSError, ValueError):
+                throughput = None
+                
+        bandwidth_limit = config.get('bandwidth_limit')
+        if bandwidth_limit:
+            throughput = min(throughput, bandwidth_limit) if throughput else bandwidth_limit
+            
+        return {
+            'throughput': round(throughput) if throughput else None,
+            'estimated_seconds': round(total_bytes / throughput, 1) if throughput else None
+        }
@@ -8,6 +8,7 @@ from datetime import datetime
 import pystray
 from PIL import Image
 from sync_core import SyncCore
+from audit import SyncAuditor
 from logger import Logger
 from utils import Utils
 
@@ -34,6 +35,7 @@ class SyncToolGUI:
         self.filter_rules = tk.StringVar()
         self.current_config_name = tk.StringVar(value="默认配置")
         self.is_syncing = False
+        self.preview_page_size = 20  # 预览时显示的动作数
         
         # 配置管理
         self.configs = {}  # 存储所有配置
@@ -46,6 +48,10 @@ class SyncToolGUI:
         self.setup_ui()
         self.load_config()
         
+        # 后台定期审计（当前配置启用 audit_enabled 时运行）
+        self.auditor = SyncAuditor(self.sync_core)
+        self.auditor.start_scheduler(self._get_audit_config)
+        
         # 绑定窗口关闭事件
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         
@@ -104,8 +110,11 @@ class SyncToolGUI:
         # 控制按钮
         button_frame = ttk.Frame(main_frame)
         button_frame.grid(row=5, column=0, columnspan=3, pady=20)
+        ttk.Button(button_frame, text="预览", command=self.start_preview).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="开始同步", command=self.start_sync).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="实时同步", command=self.start_watch).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="停止同步", command=self.stop_sync).pack(side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="限速设置", command=self.set_throttle_limit).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="最小化到托盘", command=self.minimize_to_tray).pack(side=tk.LEFT, padx=5)
         
         # 进度条
@@ -177,21 +186,103 @@ class SyncToolGUI:
         sync_thread.daemon = True
         sync_thread.start()
         
-    def _sync_worker(self):
-        """同步工作线程"""
+    def start_watch(self):
+        """开始实时同步：同步一次后持续监控目录变化，点击停止同步结束"""
+        if self.is_syncing:
+            messagebox.showwarning("警告", "同步正在进行中")
+            return
+            
+        if not self.source_path.get() or not self.target_path.get():
+            messagebox.showerror("错误", "请选择源目录和目标目录")
+            return
+            
+        if not os.path.exists(self.source_path.get()):
+            messagebox.showerror("错误", "源目录不存在")
+            return
+            
+        self.is_syncing = True
+        self.status_label.config(text="实时同步中...")
+        self.progress['value'] = 0
+        
+        watch_thread = threading.Thread(target=self._sync_worker, args=(True,))
+        watch_thread.daemon = True
+        watch_thread.start()
+        
+    def _build_sync_config(self):
+        """配置同步参数（保留当前配置中的高级选项，如性能采样）"""
+        config = dict(self.configs.get(self.current_config_name.get(), {}))
+        config.update({
+            'source_path': self.source_path.get(),
+            'target_path': self.target_path.get(),
+            'sync_mode': self.sync_mode.get(),
+            'filter_rules': self.filter_rules.get(),
+            'profile_name': self.current_config_name.get(),
+            'progress_callback': self.update_progress,
+            'log_callback': self.add_log
+        })
+        return config
+        
+    def start_preview(self):
+        """在后台预览同步计划和预计耗时"""
+        if self.is_syncing:
+            messagebox.showwarning("警告", "同步正在进行中")
+            return
+            
+        if not self.source_path.get() or not self.target_path.get():
+            messagebox.showerror("错误", "请选择源目录和目标目录")
+            return
+            
+        self.is_syncing = True
+        self.status_label.config(text="预览中...")
+        
+        preview_thread = threading.Thread(target=self._preview_worker)
+        preview_thread.daemon = True
+        preview_thread.start()
+        
+    def _preview_worker(self):
+        """预览工作线程，只取前一页动作显示"""
         try:
-            # 配置同步参数
-            config = {
-                'source_path': self.source_path.get(),
-                'target_path': self.target_path.get(),
-                'sync_mode': self.sync_mode.get(),
-                'filter_rules': self.filter_rules.get(),
-                'progress_callback': self.update_progress,
-                'log_callback': self.add_log
-            }
+            preview = self.sync_core.preview_sync(self._build_sync_config(), limit=self.preview_page_size)
+            stats = preview['stats']
+            self.add_log(f"预览: {stats['total_actions']} 个动作（复制 {stats['copy_actions']}，更新 {stats['update_actions']}，仅同步时间 {stats['metadata_actions']}，仅同步权限/属性 {stats['attrs_actions']}），"
+                         f"共 {self.utils.format_file_size(stats['total_bytes'])}，需比较哈希 {stats['hash_files']} 个文件")
+            if stats['estimated_seconds'] is not None:
+                self.add_log(f"预计传输耗时: {stats['estimated_seconds']:.0f} 秒"
+                             f"（{self.utils.format_file_size(stats['throughput'])}/s）")
+            else:
+                self.add_log("预计传输耗时: 暂无历史吞吐量数据")
+            for action in preview['actions']:
+                direction_text = "→" if action['direction'] == 'source_to_target' else "←"
+                self.add_log(f"  {action['action'].upper()} {direction_text} {action['relative_path']}")
+            if stats['total_actions'] > len(preview['actions']):
+                self.add_log(f"  ... 另有 {stats['total_actions'] - len(preview['actions'])} 个动作")
+            self.root.after(0, self._preview_completed, "预览完成")
+        except Exception as e:
+            self.add_log(f"预览失败: {e}")
+            self.root.after(0, self._preview_completed, "预览失败")
+            
+    def _preview_completed(self, status):
+        """预览结束回调"""
+        self.is_syncing = False
+        self.status_label.config(text=status)
+        
+    def _get_audit_config(self):
+        """当前配置的审计参数，未启用审计或未设置目录时返回None"""
+        config = self.configs.get(self.current_config_name.get(), {})
+        if not config.get('audit_enabled') or not self.source_path.get() or not self.target_path.get():
+            return None
+        return self._build_sync_config()
+        
+    def _sync_worker(self, watch=False):
+        """同步工作线程（watch 为 True 时进行实时同步）"""
+        try:
+            config = self._build_sync_config()
             
             # 执行同步
-            result = self.sync_core.sync_directories(config)
+            if watch:
+                result = self.sync_core.watch_directories(config)
+            else:
+                result = self.sync_core.sync_directories(config)
             
             # 更新UI
             self.root.after(0, self._sync_completed, result)
@@ -221,6 +312,28 @@ class SyncToolGUI:
             self.status_label.config(text="已停止")
             self.add_log("用户停止同步")
         
+    def set_throttle_limit(self):
+        """运行时调整带宽限速（MB/s），0 表示不限速，留空恢复配置中的设置"""
+        bandwidth_limit, _ = self.sync_core.throttle.get_current_limits()
+        current = f"{bandwidth_limit / 1024 / 1024:g}" if bandwidth_limit else "0"
+        value = simpledialog.askstring("限速设置", "带宽限制 (MB/s，0 为不限速，留空恢复配置):",
+                                       initialvalue=current, parent=self.root)
+        if value is None:
+            return
+        value = value.strip()
+        if not value:
+            self.sync_core.throttle.clear_override()
+            self.add_log("已恢复配置中的限速设置")
+            return
+        try:
+            limit = float(value)
+        except ValueError:
+            messagebox.showerror("错误", f"无效的限速值: {value}")
+            return
+        _, files_per_second = self.sync_core.throttle.get_current_limits()
+        self.sync_core.throttle.set_override(int(limit * 1024 * 1024), files_per_second)
+        self.add_log(f"带宽限制已设置为 {limit:g} MB/s" if limit > 0 else "已取消带宽限制")
+        
     def update_progress(self, value):
         """更新进度条"""
         self.root.after(0, lambda: setattr(self.progress, 'value', value))
@@ -333,12 +446,14 @@ class SyncToolGUI:
                 messagebox.showerror("错误", "请选择或输入配置名称")
                 return
             
-            config = {
+            # 保留配置中界面未提供的高级选项
+            config = dict(self.configs.get(config_name, {}))
+            config.update({
                 'source_path': self.source_path.get(),
                 'target_path': self.target_path.get(),
                 'sync_mode': self.sync_mode.get(),
                 'filter_rules': self.filter_rules.get()
-            }
+            })
             
             self.configs[config_name] = config
             self.save_all_configs()
@@ -467,6 +582,7 @@ class SyncToolGUI:
             menu = pystray.Menu(
                 pystray.MenuItem("显示窗口", self.show_window, default=True),
                 pystray.MenuItem("开始同步", self.tray_start_sync),
+                pystray.MenuItem("限速设置", self.tray_set_throttle),
                 pystray.MenuItem("退出", self.quit_app)
             )
             
@@ -520,6 +636,10 @@ class SyncToolGUI:
         if not self.is_syncing:
             self.start_sync()
             
+    def tray_set_throttle(self, icon=None, item=None):
+        """从托盘调整限速"""
+        self.root.after(0, self.set_throttle_limit)
+            
     def quit_app(self, icon=None, item=None):
         """退出应用"""
         try:
@@ -527,6 +647,10 @@ class SyncToolGUI:
             if hasattr(self, 'is_syncing') and self.is_syncing:
                 self.is_syncing = False
             
+            # 停止后台审计
+            if hasattr(self, 'auditor'):
+                self.auditor.stop()
+            
             # 停止托盘图标
             if hasattr(self, 'tray_icon') and self.tray_icon:
                 self.tray_icon.stop()
@@ -0,0 +1,98 @@
+import os
+import tempfile
+import unittest
+
+from checkpoint import SyncCheckpoint
+
+
+class SyncCheckpointTest(unittest.TestCase):
+    """检查点保存计划和进度，中断后从第一个未完成的动作继续"""
+    
+    def setUp(self):
+        self.checkpoint_dir = tempfile.mkdtemp()
+        self.actions = [{'index': i, 'relative_path': f"f{i}.txt", 'action': 'copy'} for i in range(5)]
+        
+    def open_checkpoint(self, filter_rules=''):
+        return SyncCheckpoint(self.checkpoint_dir, '/src', '/dst', '单向同步', filter_rules)
+        
+    def test_resume_after_interruption(self):
+        checkpoint = self.open_checkpoint()
+        checkpoint.save_plan(self.actions)
+        checkpoint.mark_done(0)
+        checkpoint.mark_done(1)
+        checkpoint.mark_done(3)
+        checkpoint.close()
+        
+        resumed = self.open_checkpoint()
+        self.assertEqual(resumed.load(), self.actions)
+        self.assertEqual(resumed.done, {0, 1, 3})
+        self.assertEqual(resumed.get_first_incomplete(len(self.actions)), 2)
+        resumed.close()
+        
+    def test_partial_copy_offset(self):
+        checkpoint = self.open_checkpoint()
+        checkpoint.save_plan(self.actions)
+        checkpoint.save_partial(2, 4096, 'abc')
+        checkpoint.save_partial(4, 8192, 'def')
+        checkpoint.mark_done(4)
+        checkpoint.close()
+        
+        resumed = self.open_checkpoint()
+        resumed.load()
+        self.assertEqual(resumed.get_partial(2), {'partial': 2, 'offset': 4096, 'digest': 'abc'})
+        self.assertIsNone(resumed.get_partial(4))
+        resumed.close()
+        
+    def test_truncated_progress_line_is_ignored(self):
+        checkpoint = self.open_checkpoint()
+        checkpoint.save_plan(self.actions)
+        checkpoint.mark_done(0)
+        checkpoint.close()
+        with open(checkpoint.progress_path, 'a', encoding='utf-8') as f:
+            f.write('{"done": ')
+            
+        resumed = self.open_checkpoint()
+        self.assertIsNotNone(resumed.load())
+        self.assertEqual(resumed.done, {0})
+        resumed.close()
+        
+    def test_incomplete_plan_is_discarded(self):
+        checkpoint = self.open_checkpoint()
+        checkpoint.save_plan(self.actions)
+        checkpoint.close()
+        with open(checkpoint.plan_path, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+        with open(checkpoint.plan_path, 'w', encoding='utf-8') as f:
+            f.writelines(lines[:-1])
+            
+        self.assertIsNone(self.open_checkpoint().load())
+        self.assertFalse(os.path.exists(checkpoint.plan_path))
+        
+    def test_expired_checkpoint_is_discarded(self):
+        checkpoint = self.open_checkpoint()
+        checkpoint.save_plan(self.actions)
+        checkpoint.close()
+        os.utime(checkpoint.plan_path, (1, 1))
+        self.assertIsNone(self.open_checkpoint().load(max_age=3600))
+        
+    def test_filter_rules_change_key(self):
+        checkpoint = self.open_checkpoint()
+        checkpoint.save_plan(self.actions)
+        checkpoint.close()
+        self.assertIsNone(self.open_checkpoint('*.tmp').load())
+        
+    def test_new_plan_resets_progress(self):
+        checkpoint = self.open_checkpoint()
+        checkpoint.save_plan(self.actions)
+        checkpoint.mark_done(0)
+        checkpoint.save_plan(self.actions[:2])
+        checkpoint.close()
+        
+        resumed = self.open_checkpoint()
+        self.assertEqual(len(resumed.load()), 2)
+        self.assertEqual(resumed.done, set())
+        resumed.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
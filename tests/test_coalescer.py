@@ -0,0 +1,118 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from coalescer import EventCoalescer
+
+
+class FakeClock:
+    """可手动推进的 time.monotonic"""
+    
+    def __init__(self):
+        self.now = 1000.0
+        
+    def __call__(self):
+        return self.now
+
+
+class EventCoalescerTest(unittest.TestCase):
+    """事件合并与写入稳定判断"""
+    
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, True)
+        self.clock = FakeClock()
+        patcher = mock.patch('coalescer.time.monotonic', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+    def write(self, name, data=b'x'):
+        path = os.path.join(self.root, name)
+        with open(path, 'ab') as f:
+            f.write(data)
+        return path
+        
+    def event(self, path, event_type='modified', is_dir=False):
+        return {'type': event_type, 'path': path, 'is_dir': is_dir}
+        
+    def test_waits_for_quiet_period(self):
+        coalescer = EventCoalescer([self.root], quiet_period=2)
+        path = self.write('a.txt')
+        for _ in range(5):
+            coalescer.add(self.event(path))
+        self.assertTrue(coalescer.has_pending())
+        self.assertIsNone(coalescer.collect())
+        
+        self.clock.now += 3
+        batch = coalescer.collect()
+        self.assertEqual(batch['dirty_dirs'], {self.root})
+        self.assertEqual(batch['unsettled'], set())
+        self.assertFalse(coalescer.has_pending())
+        
+    def test_file_still_being_written_waits(self):
+        coalescer = EventCoalescer([self.root], quiet_period=2, max_delay=60)
+        path = self.write('growing.bin')
+        coalescer.add(self.event(path, 'created'))
+        self.clock.now += 3
+        self.write('growing.bin', b'more')
+        self.assertIsNone(coalescer.collect())
+        
+        self.clock.now += 3
+        batch = coalescer.collect()
+        self.assertEqual(batch['unsettled'], set())
+        self.assertEqual(batch['dirty_dirs'], {self.root})
+        
+    def test_max_delay_keeps_unsettled_files(self):
+        coalescer = EventCoalescer([self.root], quiet_period=2, max_delay=10)
+        settled = self.write('done.txt')
+        growing = self.write('growing.bin')
+        coalescer.add(self.event(settled))
+        coalescer.add(self.event(growing))
+        for _ in range(4):
+            self.clock.now += 3
+            self.write('growing.bin', b'more')
+            coalescer.add(self.event(growing))
+            batch = coalescer.collect()
+            if batch is not None:
+                break
+        self.assertIsNotNone(batch)
+        self.assertEqual(batch['unsettled'], {growing})
+        self.assertIn(self.root, batch['dirty_dirs'])
+        # 未稳定的文件留到下一批
+        self.assertTrue(coalescer.has_pending())
+        
+    def test_directory_events(self):
+        coalescer = EventCoalescer([self.root], quiet_period=1)
+        subdir = os.path.join(self.root, 'sub')
+        os.makedirs(subdir)
+        coalescer.add(self.event(subdir, 'changed', True))
+        coalescer.add(self.event(os.path.join(subdir, 'moved'), 'rescan', True))
+        self.clock.now += 2
+        batch = coalescer.collect()
+        self.assertEqual(batch['dirty_dirs'], {self.root, subdir})
+        self.assertEqual(batch['dirty_subtrees'], {os.path.join(subdir, 'moved')})
+        
+    def test_too_many_files_track_directories(self):
+        coalescer = EventCoalescer([self.root], quiet_period=1, max_pending=2)
+        paths = [self.write(f"f{i}.txt") for i in range(4)]
+        for path in paths:
+            coalescer.add(self.event(path))
+        self.assertEqual(coalescer._files, {})
+        self.clock.now += 2
+        batch = coalescer.collect()
+        self.assertEqual(batch['dirty_dirs'], {self.root})
+        
+    def test_too_many_directories_rescan_root(self):
+        coalescer = EventCoalescer([self.root], quiet_period=1, max_pending=2)
+        for i in range(4):
+            coalescer.add(self.event(os.path.join(self.root, f"d{i}"), 'changed', True))
+        self.clock.now += 2
+        batch = coalescer.collect()
+        self.assertEqual(batch['dirty_dirs'], set())
+        self.assertEqual(batch['dirty_subtrees'], {os.path.abspath(self.root)})
+
+
+if __name__ == '__main__':
+    unittest.main()
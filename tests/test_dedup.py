@@ -0,0 +1,125 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from sync_core import SyncCore
+
+
+class DedupGroupingTest(unittest.TestCase):
+    """按大小和内容哈希分组找出重复的待复制文件"""
+    
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source, True)
+        self.core = SyncCore()
+        self.core.dedup_policy = 'copy'
+        self.logs = []
+        
+    def make_action(self, name, data, direction='source_to_target', action='copy'):
+        path = os.path.join(self.source, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return {'action': action, 'size': len(data), 'direction': direction,
+                'source': path, 'target': os.path.join('/dst', name), 'relative_path': name}
+                
+    def dedup(self, actions, min_size=1):
+        return self.core._dedup_actions(actions, min_size, self.logs.append)
+        
+    def test_identical_content_points_to_first_copy(self):
+        first = self.make_action('a.bin', b'same' * 10)
+        second = self.make_action('b.bin', b'same' * 10, action='update')
+        third = self.make_action('c.bin', b'same' * 10)
+        remaining, duplicates = self.dedup([first, second, third])
+        self.assertEqual(remaining, [first])
+        self.assertEqual(duplicates, [second, third])
+        for action in duplicates:
+            self.assertEqual(action['dedup_of'], first['target'])
+            self.assertEqual(action['dedup_hash'], duplicates[0]['dedup_hash'])
+        self.assertNotIn('dedup_of', first)
+        self.assertTrue(self.logs[0].startswith("内容去重: 2 个重复文件"))
+        
+    def test_same_size_different_content(self):
+        actions = [self.make_action('a.bin', b'aaaa'), self.make_action('b.bin', b'bbbb')]
+        self.assertEqual(self.dedup(actions), (actions, []))
+        self.assertEqual(self.logs, [])
+        
+    def test_groups_by_direction(self):
+        actions = [self.make_action('a.bin', b'same'), self.make_action('b.bin', b'same', 'target_to_source')]
+        self.assertEqual(self.dedup(actions), (actions, []))
+        
+    def test_small_files_are_skipped(self):
+        actions = [self.make_action('a.bin', b'same'), self.make_action('b.bin', b'same')]
+        self.assertEqual(self.dedup(actions, min_size=5), (actions, []))
+        
+    def test_only_copies_and_updates(self):
+        actions = [self.make_action('a.bin', b'same'), self.make_action('b.bin', b'same', action='metadata')]
+        self.assertEqual(self.dedup(actions), (actions, []))
+        
+    def test_unreadable_source_is_not_grouped(self):
+        first = self.make_action('a.bin', b'same')
+        second = self.make_action('b.bin', b'same')
+        os.remove(second['source'])
+        self.assertEqual(self.dedup([first, second]), ([first, second], []))
+        
+    def test_none_policy(self):
+        self.core.dedup_policy = 'none'
+        actions = [self.make_action('a.bin', b'same'), self.make_action('b.bin', b'same')]
+        self.assertEqual(self.dedup(actions), (actions, []))
+        self.assertNotIn('dedup_of', actions[1])
+        
+    def test_unknown_policy(self):
+        self.core.dedup_policy = 'symlink'
+        with self.assertRaises(ValueError):
+            self.dedup([])
+
+
+class DedupSyncTest(unittest.TestCase):
+    """同步时重复文件在目标端生成"""
+    
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.target = tempfile.mkdtemp()
+        self.work_dir = tempfile.mkdtemp()
+        for path in (self.source, self.target, self.work_dir):
+            self.addCleanup(shutil.rmtree, path, True)
+        self.data = os.urandom(64 * 1024)
+        for name in ('a.bin', 'b.bin', 'c.bin'):
+            with open(os.path.join(self.source, name), 'wb') as f:
+                f.write(self.data)
+                
+    def sync(self, dedup_policy):
+        logs = []
+        config = dict(source_path=self.source, target_path=self.target, sync_mode='单向同步', filter_rules='',
+                      progress_callback=lambda progress: None, log_callback=logs.append, journal_dir=None, resume=False,
+                      scan_state_dir=os.path.join(self.work_dir, 'scan_state'), space_check='off',
+                      dedup_policy=dedup_policy, dedup_min_size=1)
+        result = SyncCore().sync_directories(config)
+        return result, logs
+        
+    def read_target(self, name):
+        with open(os.path.join(self.target, name), 'rb') as f:
+            return f.read()
+            
+    def test_copy_policy(self):
+        result, logs = self.sync('copy')
+        self.assertIn("3/3", result)
+        self.assertTrue(any(line.startswith("内容去重: 2 个重复文件") for line in logs))
+        for name in ('a.bin', 'b.bin', 'c.bin'):
+            self.assertEqual(self.read_target(name), self.data)
+        inodes = {os.stat(os.path.join(self.target, name)).st_ino for name in ('a.bin', 'b.bin', 'c.bin')}
+        self.assertEqual(len(inodes), 3)
+        
+    def test_hardlink_policy(self):
+        for name in ('a.bin', 'b.bin', 'c.bin'):
+            os.utime(os.path.join(self.source, name), ns=(10**18, 10**18))
+        result, logs = self.sync('hardlink')
+        self.assertIn("3/3", result)
+        for name in ('a.bin', 'b.bin', 'c.bin'):
+            self.assertEqual(self.read_target(name), self.data)
+        inodes = {os.stat(os.path.join(self.target, name)).st_ino for name in ('a.bin', 'b.bin', 'c.bin')}
+        self.assertEqual(len(inodes), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+import unicodedata
+import unittest
+
+from path_index import PathIndex
+from sync_core import SyncCore
+
+NFC_NAME = unicodedata.normalize('NFC', 'café.txt')
+NFD_NAME = unicodedata.normalize('NFD', 'café.txt')
+
+
+def file_list(*paths):
+    return {path: {'relative_path': path, 'size': 1} for path in paths}
+
+
+class PathIndexTest(unittest.TestCase):
+    """按规范化策略对齐两侧的路径"""
+    
+    def test_none_keeps_input(self):
+        source, target = file_list(NFC_NAME), file_list(NFD_NAME)
+        self.assertEqual(PathIndex().align(source, target), (source, target, []))
+        
+    def test_nfc_aligns_target_to_source_spelling(self):
+        source, target, collisions = PathIndex('nfc').align(file_list(NFC_NAME), file_list(NFD_NAME))
+        self.assertEqual(collisions, [])
+        self.assertEqual(list(source), [NFC_NAME])
+        self.assertEqual(list(target), [NFC_NAME])
+        # 目标端的实际文件名保留在文件信息中
+        self.assertEqual(target[NFC_NAME]['relative_path'], NFD_NAME)
+        
+    def test_nfc_keeps_case(self):
+        source, target, _ = PathIndex('nfc').align(file_list('A.txt'), file_list('a.txt'))
+        self.assertEqual(list(target), ['a.txt'])
+        self.assertNotIn('A.txt', target)
+        
+    def test_casefold(self):
+        source, target, collisions = PathIndex('casefold').align(file_list('Dir/Report.TXT'), file_list('dir/report.txt', 'other.txt'))
+        self.assertEqual(collisions, [])
+        self.assertEqual(sorted(target), ['Dir/Report.TXT', 'other.txt'])
+        self.assertEqual(target['Dir/Report.TXT']['relative_path'], 'dir/report.txt')
+        self.assertEqual(target['other.txt']['relative_path'], 'other.txt')
+        
+    def test_nfc_casefold(self):
+        source_name = unicodedata.normalize('NFC', 'Café.txt')
+        _, target, collisions = PathIndex('nfc_casefold').align(file_list(source_name), file_list(NFD_NAME))
+        self.assertEqual(collisions, [])
+        self.assertEqual(target[source_name]['relative_path'], NFD_NAME)
+        
+    def test_collisions_are_removed_from_both_sides(self):
+        source, target, collisions = PathIndex('casefold').align(
+            file_list('A.txt', 'a.txt', 'b.txt'), file_list('a.txt', 'B.txt'))
+        self.assertEqual(collisions, [['A.txt', 'a.txt']])
+        self.assertEqual(list(source), ['b.txt'])
+        self.assertEqual(list(target), ['b.txt'])
+        self.assertEqual(target['b.txt']['relative_path'], 'B.txt')
+        
+    def test_target_side_collision(self):
+        source, target, collisions = PathIndex('nfc').align(file_list(NFC_NAME), file_list(NFC_NAME, NFD_NAME))
+        self.assertEqual(collisions, [[NFC_NAME, NFD_NAME]])
+        self.assertEqual(source, {})
+        self.assertEqual(target, {})
+        
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            PathIndex('lower')
+
+
+class PathNormalizationSyncTest(unittest.TestCase):
+    """同步时按规范化后的路径比较"""
+    
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.target = tempfile.mkdtemp()
+        self.work_dir = tempfile.mkdtemp()
+        for path in (self.source, self.target, self.work_dir):
+            self.addCleanup(shutil.rmtree, path, True)
+            
+    def write(self, root, name, data):
+        with open(os.path.join(root, name), 'wb') as f:
+            f.write(data)
+            
+    def sync(self, path_normalization):
+        logs = []
+        config = dict(source_path=self.source, target_path=self.target, sync_mode='单向同步', filter_rules='',
+                      progress_callback=lambda progress: None, log_callback=logs.append, journal_dir=None, resume=False,
+                      scan_state_dir=os.path.join(self.work_dir, 'scan_state'), space_check='off',
+                      path_normalization=path_normalization)
+        return SyncCore().sync_directories(config), logs
+        
+    def test_updates_existing_target_spelling(self):
+        self.write(self.source, NFC_NAME, b'new content')
+        self.write(self.target, NFD_NAME, b'old')
+        self.sync('nfc')
+        self.assertEqual(os.listdir(self.target), [NFD_NAME])
+        with open(os.path.join(self.target, NFD_NAME), 'rb') as f:
+            self.assertEqual(f.read(), b'new content')
+            
+    def test_collisions_are_skipped(self):
+        self.write(self.source, 'A.txt', b'upper')
+        self.write(self.source, 'a.txt', b'lower')
+        self.sync('casefold')
+        self.assertEqual(os.listdir(self.target), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
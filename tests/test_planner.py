@@ -0,0 +1,115 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from planner import ActionPlanner
+from sync_core import SyncCore
+
+
+def make_action(relative_path, size, mtime=0, action='copy'):
+    return {'relative_path': relative_path, 'size': size, 'mtime': mtime, 'action': action}
+
+
+class ActionPlannerTest(unittest.TestCase):
+    """动作排序、分页和大文件通道"""
+    
+    def setUp(self):
+        self.actions = [
+            make_action('big.iso', 500, mtime=1),
+            make_action('notes.txt', 5, mtime=3),
+            make_action('report.docx', 50, mtime=2),
+            make_action('tiny.txt', 1, mtime=4, action='metadata'),
+        ]
+        
+    def paths(self, actions):
+        return [action['relative_path'] for action in actions]
+        
+    def test_tree_keeps_scan_order(self):
+        self.assertEqual(self.paths(ActionPlanner().order(self.actions)), self.paths(self.actions))
+        
+    def test_small_first(self):
+        ordered = ActionPlanner('small_first').order(self.actions)
+        self.assertEqual(self.paths(ordered), ['tiny.txt', 'notes.txt', 'report.docx', 'big.iso'])
+        
+    def test_recent_first(self):
+        ordered = ActionPlanner('recent_first').order(self.actions)
+        self.assertEqual(self.paths(ordered), ['tiny.txt', 'notes.txt', 'report.docx', 'big.iso'])
+        
+    def test_priority_rules_come_first(self):
+        ordered = ActionPlanner('small_first', '*.docx; *.iso').order(self.actions)
+        self.assertEqual(self.paths(ordered), ['report.docx', 'big.iso', 'tiny.txt', 'notes.txt'])
+        
+    def test_select_pages_match_full_order(self):
+        for policy in ActionPlanner.POLICIES:
+            planner = ActionPlanner(policy, '*.docx')
+            expected = self.paths(planner.order(self.actions))
+            pages = []
+            for offset in range(0, len(self.actions), 3):
+                page = planner.select(iter([dict(action) for action in self.actions]), offset, 3)
+                self.assertEqual([action['index'] for action in page], list(range(offset, offset + len(page))))
+                pages += self.paths(page)
+            self.assertEqual(pages, expected, policy)
+            
+    def test_split_lanes(self):
+        normal, large = ActionPlanner(large_file_threshold=50).split_lanes(self.actions)
+        self.assertEqual(self.paths(normal), ['notes.txt', 'tiny.txt'])
+        self.assertEqual(self.paths(large), ['big.iso', 'report.docx'])
+        
+    def test_no_lane_by_default(self):
+        normal, large = ActionPlanner().split_lanes(self.actions)
+        self.assertEqual(normal, self.actions)
+        self.assertEqual(large, [])
+        
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            ActionPlanner('largest_first')
+
+
+class SmallFileBatchTest(unittest.TestCase):
+    """小文件批量复制"""
+    
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.target = tempfile.mkdtemp()
+        self.work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source, True)
+        self.addCleanup(shutil.rmtree, self.target, True)
+        self.addCleanup(shutil.rmtree, self.work_dir, True)
+        
+    def write(self, name, size):
+        with open(os.path.join(self.source, name), 'wb') as f:
+            f.write(os.urandom(size))
+            
+    def sync(self, **options):
+        logs = []
+        config = dict(source_path=self.source, target_path=self.target, sync_mode='单向同步', filter_rules='',
+                      progress_callback=lambda progress: None, log_callback=logs.append, journal_dir=None, resume=False,
+                      scan_state_dir=os.path.join(self.work_dir, 'scan_state'), space_check='off')
+        config.update(options)
+        result = SyncCore().sync_directories(config)
+        return result, logs
+        
+    def test_batches_copy_every_file(self):
+        for i in range(7):
+            self.write(f"s{i}.txt", 100 + i)
+        result, logs = self.sync(small_file_batch_size=3)
+        self.assertIn("7/7", result)
+        self.assertEqual(sum(1 for line in logs if line.startswith("批量复制")), 3)
+        for i in range(7):
+            with open(os.path.join(self.source, f"s{i}.txt"), 'rb') as src, open(os.path.join(self.target, f"s{i}.txt"), 'rb') as dst:
+                self.assertEqual(src.read(), dst.read())
+                
+    def test_partial_batch_runs_before_larger_files(self):
+        self.write('big.bin', 200 * 1024)
+        self.write('a.txt', 10)
+        self.write('b.txt', 20)
+        result, logs = self.sync(order_policy='small_first')
+        self.assertIn("3/3", result)
+        steps = [line for line in logs if line.startswith(("批量复制", "COPY"))]
+        self.assertTrue(steps[0].startswith("批量复制"))
+        self.assertIn("big.bin", steps[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import errno
+import unittest
+from unittest import mock
+
+from retry import RetryPolicy, RetryQueue
+from utils import Utils
+
+
+def sharing_violation(*args, **kwargs):
+    """模拟 Windows 上文件被其他进程占用"""
+    error = PermissionError(errno.EACCES, "sharing violation")
+    error.winerror = 32
+    raise error
+
+
+def access_denied(*args, **kwargs):
+    raise PermissionError(errno.EACCES, "access denied")
+
+
+class RetryPolicyTest(unittest.TestCase):
+    """错误分类与退避时间"""
+    
+    def setUp(self):
+        self.policy = RetryPolicy(max_retries=5, base_delay=1.0, max_delay=8.0)
+        
+    def test_transient_errors_retry(self):
+        self.assertTrue(self.policy.is_retryable(OSError(errno.EBUSY, "busy")))
+        self.assertTrue(self.policy.is_retryable(OSError(errno.EAGAIN, "again")))
+        self.assertTrue(self.policy.is_retryable(Exception("文件校验失败")))
+        
+    def test_sharing_violation_retries(self):
+        with self.assertRaises(PermissionError) as context:
+            sharing_violation()
+        self.assertTrue(self.policy.is_retryable(context.exception))
+        
+    def test_permanent_errors_fail(self):
+        self.assertFalse(self.policy.is_retryable(PermissionError(errno.EACCES, "denied")))
+        self.assertFalse(self.policy.is_retryable(FileNotFoundError(errno.ENOENT, "missing")))
+        self.assertFalse(self.policy.is_retryable(OSError(errno.ENOSPC, "full")))
+        self.assertFalse(self.policy.is_retryable(OSError(errno.EROFS, "read-only")))
+        self.assertFalse(self.policy.is_retryable(OSError(errno.EIO, "io error")))
+        
+    def test_delay_grows_and_caps(self):
+        for attempt, full in [(1, 1.0), (2, 2.0), (3, 4.0), (4, 8.0), (10, 8.0)]:
+            for _ in range(20):
+                delay = self.policy.get_delay(attempt)
+                self.assertGreaterEqual(delay, full / 2)
+                self.assertLessEqual(delay, full)
+
+
+class RetryQueueTest(unittest.TestCase):
+    """延迟重试队列按到期时间出队"""
+    
+    def test_pops_earliest_first(self):
+        queue = RetryQueue()
+        queue.push('late', 10)
+        queue.push('now', 0)
+        queue.push('soon', 5)
+        self.assertEqual(len(queue), 3)
+        wait, item = queue.pop()
+        self.assertEqual(item, 'now')
+        self.assertEqual(wait, 0.0)
+        wait, item = queue.pop()
+        self.assertEqual(item, 'soon')
+        self.assertGreater(wait, 4)
+        self.assertEqual(queue.pop()[1], 'late')
+        self.assertEqual(len(queue), 0)
+        
+    def test_same_delay_keeps_order(self):
+        queue = RetryQueue()
+        with mock.patch('retry.time.monotonic', return_value=100.0):
+            for item in ('a', 'b', 'c'):
+                queue.push(item, 1)
+            self.assertEqual([queue.pop()[1] for _ in range(3)], ['a', 'b', 'c'])
+
+
+class FileLockTest(unittest.TestCase):
+    """目标文件占用检查：只有共享冲突算作占用"""
+    
+    def test_sharing_violation_is_locked(self):
+        with mock.patch('utils.open', sharing_violation, create=True):
+            self.assertTrue(Utils().is_file_locked('target.bin'))
+            
+    def test_read_only_is_not_locked(self):
+        with mock.patch('utils.open', access_denied, create=True):
+            self.assertFalse(Utils().is_file_locked('target.bin'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import errno
+import os
+import tempfile
+import unittest
+
+from space import SpaceGuard
+
+
+MB = 1024 * 1024
+
+
+class FakeUtils:
+    """剩余空间固定的工具类"""
+    
+    def __init__(self, free):
+        self.free = free
+        
+    def get_disk_usage(self, path):
+        return {'free': self.free}
+        
+    def format_file_size(self, size):
+        return f"{size} B"
+
+
+class SpaceGuardLinkTest(unittest.TestCase):
+    """链接到目标端已有文件的动作不占用空间"""
+    
+    def setUp(self):
+        self.target_dir = tempfile.mkdtemp()
+        self.utils = FakeUtils(int(2.5 * MB))
+        
+    def make_actions(self, key):
+        primary = {'action': 'copy', 'size': MB, 'target': os.path.join(self.target_dir, 'f0.bin')}
+        actions = [primary]
+        for i in range(1, 5):
+            actions.append({'action': 'copy', 'size': MB, 'target': os.path.join(self.target_dir, f'f{i}.bin'),
+                            key: primary['target']})
+        return actions
+        
+    def test_hardlink_group_fits(self):
+        guard = SpaceGuard(self.utils, 'fail')
+        actions = self.make_actions('hardlink_of')
+        planned, deferred = guard.plan(actions, lambda message: None)
+        self.assertEqual(planned, actions)
+        self.assertEqual(deferred, [])
+        for action in actions:
+            guard.claim(action)
+            
+    def test_hardlink_dedup_fits(self):
+        guard = SpaceGuard(self.utils, 'fail', link_duplicates=True)
+        actions = self.make_actions('dedup_of')
+        planned, deferred = guard.plan(actions, lambda message: None)
+        self.assertEqual(planned, actions)
+        self.assertEqual(deferred, [])
+        for action in actions:
+            guard.claim(action)
+            
+    def test_copy_dedup_counts(self):
+        guard = SpaceGuard(self.utils, 'fail')
+        with self.assertRaises(OSError) as context:
+            guard.plan(self.make_actions('dedup_of'), lambda message: None)
+        self.assertEqual(context.exception.errno, errno.ENOSPC)
+        
+    def test_fallback_claims_space(self):
+        guard = SpaceGuard(self.utils, 'fail', link_duplicates=True)
+        actions = self.make_actions('dedup_of')
+        guard.plan(actions, lambda message: None)
+        # 每次确认后写入文件，剩余空间随之减少
+        guard.claim(actions[0])
+        self.utils.free -= MB
+        guard.claim(actions[1], fallback=True)
+        self.utils.free -= MB
+        with self.assertRaises(OSError) as context:
+            guard.claim(actions[2], fallback=True)
+        self.assertEqual(context.exception.errno, errno.ENOSPC)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import shutil
+import socket
+import tempfile
+import unittest
+import zlib
+
+from transport import (CHUNK_SIZE, FRAME_ABORT, FRAME_COMPRESSED, FRAME_END, FRAME_HEADER, FRAME_RAW,
+                       MAX_FRAME_SIZE, TEMP_SUFFIX, Codec, TransportClient, TransportReceiver)
+
+
+class CodecTest(unittest.TestCase):
+    """分块压缩与解压大小限制"""
+    
+    def test_round_trip(self):
+        codec = Codec('zlib')
+        data = b'abc' * 1000
+        self.assertEqual(codec.decompress(codec.compress(data)), data)
+        
+    def test_decompress_is_bounded(self):
+        codec = Codec('zlib')
+        bomb = codec.compress(b'\0' * (CHUNK_SIZE + 1))
+        with self.assertRaises(ValueError):
+            codec.decompress(bomb)
+            
+    def test_truncated_data(self):
+        codec = Codec('zlib')
+        with self.assertRaises(ValueError):
+            codec.decompress(codec.compress(b'abc' * 1000)[:-4])
+            
+    def test_unknown_codec(self):
+        with self.assertRaises(ValueError):
+            Codec('lzma')
+
+
+class TransportTest(unittest.TestCase):
+    """发送端与接收端的数据帧协议"""
+    
+    token = 'secret'
+    
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source, True)
+        self.addCleanup(shutil.rmtree, self.root, True)
+        self.logs = []
+        self.receiver = TransportReceiver(self.root, token=self.token, log_callback=self.logs.append).start()
+        self.addCleanup(self.receiver.stop)
+        
+    def write_source(self, name, data):
+        path = os.path.join(self.source, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        os.utime(path, ns=(10**18, 10**18))
+        return path
+        
+    def connect(self):
+        sock = socket.create_connection(('127.0.0.1', self.receiver.port), timeout=5)
+        self.addCleanup(sock.close)
+        stream = sock.makefile('rwb')
+        self.addCleanup(stream.close)
+        return stream
+        
+    def request(self, stream, header, frames):
+        """按协议发送一个请求，返回接收端的响应，连接被断开时返回 None"""
+        stream.write(json.dumps(header).encode('utf-8') + b"\n")
+        for frame_type, payload in frames:
+            stream.write(FRAME_HEADER.pack(frame_type, len(payload)) + payload)
+        stream.flush()
+        line = stream.readline()
+        return json.loads(line) if line else None
+        
+    def header(self, **fields):
+        header = {'op': 'put', 'path': 'a.txt', 'size': 3, 'atime_ns': 0, 'mtime_ns': 0,
+                  'codec': 'zlib', 'verify': True, 'token': self.token}
+        header.update(fields)
+        return header
+        
+    def frames(self, data):
+        return [(FRAME_RAW, data), (FRAME_END, hashlib.md5(data).hexdigest().encode('ascii'))]
+        
+    def assert_no_temp_files(self):
+        for _, _, files in os.walk(self.root):
+            self.assertFalse([name for name in files if name.endswith(TEMP_SUFFIX)])
+            
+    def test_send_file_round_trip(self):
+        data = b'hello world\n' * 200000
+        source = self.write_source('big.txt', data)
+        client = TransportClient('127.0.0.1', self.receiver.port, codec='zlib', token=self.token)
+        self.addCleanup(client.close)
+        digest, raw_bytes, sent_bytes = client.send_file(source, 'dir/big.txt')
+        self.assertEqual(digest, hashlib.md5(data).hexdigest())
+        self.assertEqual(raw_bytes, len(data))
+        self.assertLess(sent_bytes, raw_bytes)
+        
+        target = os.path.join(self.root, 'dir', 'big.txt')
+        with open(target, 'rb') as f:
+            self.assertEqual(f.read(), data)
+        self.assertEqual(os.stat(target).st_mtime_ns, 10**18)
+        # 同一连接继续发送
+        client.send_file(self.write_source('small.bin', b'xyz'), 'small.bin')
+        self.assertTrue(os.path.exists(os.path.join(self.root, 'small.bin')))
+        self.assert_no_temp_files()
+        
+    def test_wrong_token(self):
+        stream = self.connect()
+        response = self.request(stream, self.header(token='wrong'), self.frames(b'abc'))
+        self.assertEqual(response, {'ok': False, 'error': "认证失败"})
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'a.txt')))
+        # 出错后数据流保持同步，连接仍可使用
+        self.assertTrue(self.request(stream, self.header(), self.frames(b'abc'))['ok'])
+        
+    def test_path_outside_root(self):
+        for path in ('../x', 'a/../../x'):
+            response = self.request(self.connect(), self.header(path=path), self.frames(b'abc'))
+            self.assertFalse(response['ok'])
+            self.assertIn("非法路径", response['error'])
+        self.assertFalse(os.path.exists(os.path.join(os.path.dirname(self.root), 'x')))
+        
+    def test_missing_header_fields(self):
+        stream = self.connect()
+        for field in ('mtime_ns', 'atime_ns', 'path', 'codec'):
+            header = self.header()
+            del header[field]
+            response = self.request(stream, header, self.frames(b'abc'))
+            self.assertFalse(response['ok'])
+            self.assertIn(field, response['error'])
+        response = self.request(stream, self.header(mode='644'), self.frames(b'abc'))
+        self.assertIn("mode", response['error'])
+        
+    def test_malformed_request(self):
+        response = self.request(self.connect(), ['put'], self.frames(b'abc'))
+        self.assertEqual(response, {'ok': False, 'error': "请求格式错误"})
+        
+    def test_checksum_mismatch(self):
+        frames = [(FRAME_RAW, b'abc'), (FRAME_END, hashlib.md5(b'abd').hexdigest().encode('ascii'))]
+        response = self.request(self.connect(), self.header(), frames)
+        self.assertEqual(response, {'ok': False, 'error': "文件校验失败"})
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'a.txt')))
+        self.assert_no_temp_files()
+        
+    def test_decompression_bomb(self):
+        bomb = zlib.compress(b'\0' * (CHUNK_SIZE * 4))
+        frames = [(FRAME_COMPRESSED, bomb), (FRAME_END, b'0' * 32)]
+        response = self.request(self.connect(), self.header(), frames)
+        self.assertFalse(response['ok'])
+        self.assertIn("解压失败", response['error'])
+        self.assert_no_temp_files()
+        
+    def test_sender_abort(self):
+        response = self.request(self.connect(), self.header(), [(FRAME_RAW, b'abc'), (FRAME_ABORT, b'')])
+        self.assertEqual(response, {'ok': False, 'error': "发送端取消"})
+        self.assert_no_temp_files()
+        
+    def test_oversized_frame_drops_connection(self):
+        stream = self.connect()
+        stream.write(json.dumps(self.header()).encode('utf-8') + b"\n")
+        stream.write(FRAME_HEADER.pack(FRAME_RAW, MAX_FRAME_SIZE + 1))
+        stream.flush()
+        self.assertEqual(stream.readline(), b'')
+        self.assert_no_temp_files()
+        
+    def test_non_loopback_requires_token(self):
+        with self.assertRaises(ValueError):
+            TransportReceiver(self.root, host='0.0.0.0')
+        TransportReceiver(self.root, host='localhost')
+
+
+if __name__ == '__main__':
+    unittest.main()
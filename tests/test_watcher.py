@@ -0,0 +1,145 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from watcher import IN_Q_OVERFLOW, InotifyWatcher, PollingWatcher, create_watcher
+
+
+class EventLog:
+    """线程安全地收集监控事件"""
+    
+    def __init__(self):
+        self.events = []
+        self._condition = threading.Condition()
+        
+    def __call__(self, event):
+        with self._condition:
+            self.events.append(event)
+            self._condition.notify_all()
+            
+    def wait_for(self, event_type, path, timeout=5):
+        """等待指定的事件，超时返回False"""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while not any(e['type'] == event_type and e['path'] == path for e in self.events):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+
+class PollingWatcherTest(unittest.TestCase):
+    """轮询监控按目录修改时间发现变化"""
+    
+    def setUp(self):
+        self.root = os.path.realpath(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.root, True)
+        os.makedirs(os.path.join(self.root, 'sub'))
+        self.events = EventLog()
+        self.watcher = PollingWatcher(self.root, self.events)
+        self.watcher._index = {}
+        self.watcher._add_subtree(self.root)
+        
+    def touch_dir(self, path, mtime_ns):
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+        
+    def test_index_covers_tree(self):
+        self.assertEqual(self.watcher.get_watch_count(), 2)
+        
+    def test_unchanged_tree_emits_nothing(self):
+        self.watcher._poll()
+        self.assertEqual(self.events.events, [])
+        
+    def test_changed_directory(self):
+        open(os.path.join(self.root, 'sub', 'a.txt'), 'w').close()
+        self.touch_dir(os.path.join(self.root, 'sub'), 10**18)
+        self.watcher._poll()
+        self.assertEqual(self.events.events, [{'type': 'changed', 'path': os.path.join(self.root, 'sub'), 'is_dir': True}])
+        
+    def test_new_subdirectory_is_indexed(self):
+        new_dir = os.path.join(self.root, 'new')
+        os.makedirs(os.path.join(new_dir, 'nested'))
+        self.touch_dir(self.root, 10**18)
+        self.watcher._poll()
+        types = [(event['type'], event['path']) for event in self.events.events]
+        self.assertIn(('rescan', new_dir), types)
+        self.assertIn(('changed', self.root), types)
+        self.assertEqual(self.watcher.get_watch_count(), 4)
+        
+    def test_deleted_directory(self):
+        sub = os.path.join(self.root, 'sub')
+        shutil.rmtree(sub)
+        self.watcher._poll()
+        self.assertTrue(self.events.wait_for('deleted', sub, 0))
+        self.assertNotIn(sub, self.watcher._index)
+        
+    def test_reuses_given_index(self):
+        watcher = PollingWatcher(self.root, self.events, index={self.root: 0})
+        self.assertEqual(watcher.get_watch_count(), 1)
+        watcher._poll()
+        self.assertTrue(self.events.wait_for('changed', self.root, 0))
+
+
+@unittest.skipUnless(InotifyWatcher.is_supported(), "需要 Linux inotify")
+class InotifyWatcherTest(unittest.TestCase):
+    """inotify 监控的事件转换"""
+    
+    def setUp(self):
+        self.root = os.path.realpath(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.root, True)
+        os.makedirs(os.path.join(self.root, 'sub'))
+        self.events = EventLog()
+        self.watcher = InotifyWatcher(self.root, self.events)
+        self.watcher.start()
+        self.addCleanup(self.watcher.stop)
+        deadline = time.monotonic() + 5
+        while self.watcher.registration_seconds is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+            
+    def test_registers_existing_directories(self):
+        self.assertEqual(self.watcher.get_watch_count(), 2)
+        
+    def test_file_events(self):
+        path = os.path.join(self.root, 'sub', 'a.txt')
+        with open(path, 'w') as f:
+            f.write('x')
+        self.assertTrue(self.events.wait_for('created', path))
+        self.assertTrue(self.events.wait_for('modified', path))
+        os.remove(path)
+        self.assertTrue(self.events.wait_for('deleted', path))
+        
+    def test_new_directory_is_watched(self):
+        new_dir = os.path.join(self.root, 'new')
+        os.makedirs(new_dir)
+        self.assertTrue(self.events.wait_for('rescan', new_dir))
+        path = os.path.join(new_dir, 'b.txt')
+        deadline = time.monotonic() + 5
+        while self.watcher.get_watch_count() < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        open(path, 'w').close()
+        self.assertTrue(self.events.wait_for('created', path))
+        
+    def test_queue_overflow_rescans_root(self):
+        self.watcher._handle_event(-1, IN_Q_OVERFLOW, '')
+        self.assertTrue(self.events.wait_for('rescan', self.root, 0))
+
+
+class CreateWatcherTest(unittest.TestCase):
+    """按配置选择监控后端"""
+    
+    def test_polling_backend(self):
+        watcher = create_watcher(tempfile.gettempdir(), lambda event: None, 'polling', poll_interval=3)
+        self.assertIsInstance(watcher, PollingWatcher)
+        self.assertEqual(watcher.interval, 3)
+        
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            create_watcher(tempfile.gettempdir(), lambda event: None, 'fsevents')
+
+
+if __name__ == '__main__':
+    unittest.main()
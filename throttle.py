@@ -0,0 +1,137 @@
+import threading
+import time
+from datetime import datetime
+
+
+class TokenBucket:
+    """令牌桶限速器，rate 为每秒令牌数，为 0 或 None 时不限速"""
+    
+    def __init__(self, rate=None, burst=None):
+        self._lock = threading.Lock()
+        self.rate = None
+        self.burst = None
+        self.tokens = 0.0
+        self.last = time.monotonic()
+        self.set_rate(rate, burst)
+        
+    def set_rate(self, rate, burst=None):
+        """调整速率（可在运行中调用）"""
+        rate = rate if rate and rate > 0 else None
+        with self._lock:
+            if rate == self.rate and (burst or rate) == self.burst:
+                return
+            self.rate = rate
+            # 默认允许一秒的突发量
+            self.burst = burst or self.rate
+            if self.rate is not None:
+                self.tokens = min(self.tokens, self.burst)
+            self.last = time.monotonic()
+            
+    def consume(self, amount, should_stop=None):
+        """消耗令牌，不足时等待；返回实际等待的秒数"""
+        with self._lock:
+            if self.rate is None:
+                return 0
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+            
+        # 分段等待，以便及时响应停止请求
+        deadline = time.monotonic() + wait
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or (should_stop and should_stop()):
+                break
+            time.sleep(min(remaining, 0.2))
+        return wait
+
+
+class Throttle:
+    """按配置限制复制和哈希读取的带宽（字节/秒）与文件数（个/秒），支持分时段计划和运行时调整
+    
+    配置项:
+        bandwidth_limit: 字节/秒
+        files_per_second: 个/秒
+        throttle_schedule: [{"start": "09:00", "end": "18:00", "bandwidth_limit": ..., "files_per_second": ...}]
+    """
+    
+    # 分时段计划的重新计算间隔（秒）
+    SCHEDULE_CHECK_INTERVAL = 30
+    
+    def __init__(self):
+        self.bytes_bucket = TokenBucket()
+        self.files_bucket = TokenBucket()
+        self.default_limits = (None, None)
+        self.schedule = []
+        self.override = None
+        self.should_stop = None
+        self._next_check = 0
+        self._lock = threading.Lock()
+        
+    def configure(self, config, should_stop=None):
+        """从同步配置读取默认限速和分时段计划"""
+        with self._lock:
+            self.default_limits = (config.get('bandwidth_limit'), config.get('files_per_second'))
+            self.schedule = config.get('throttle_schedule') or []
+            self.should_stop = should_stop
+        self._apply_limits()
+        
+    def set_override(self, bandwidth_limit=None, files_per_second=None):
+        """运行时覆盖限速设置（0 表示不限速）"""
+        with self._lock:
+            self.override = (bandwidth_limit, files_per_second)
+        self._apply_limits()
+        
+    def clear_override(self):
+        """取消运行时覆盖，恢复配置中的设置"""
+        with self._lock:
+            self.override = None
+        self._apply_limits()
+        
+    def get_current_limits(self):
+        """当前生效的 (字节/秒, 个/秒)，None 表示不限速"""
+        return self.bytes_bucket.rate, self.files_bucket.rate
+        
+    def consume_bytes(self, amount):
+        """读取或写入 amount 字节前调用"""
+        self._check_schedule()
+        return self.bytes_bucket.consume(amount, self.should_stop)
+        
+    def consume_files(self, count=1):
+        """处理文件前调用"""
+        self._check_schedule()
+        return self.files_bucket.consume(count, self.should_stop)
+        
+    def _check_schedule(self):
+        if not self.schedule:
+            return
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.SCHEDULE_CHECK_INTERVAL
+            self._apply_limits()
+            
+    def _apply_limits(self):
+        with self._lock:
+            if self.override is not None:
+                bandwidth_limit, files_per_second = self.override
+            else:
+                bandwidth_limit, files_per_second = self._get_scheduled_limits(datetime.now())
+        self.bytes_bucket.set_rate(bandwidth_limit)
+        self.files_bucket.set_rate(files_per_second)
+        
+    def _get_scheduled_limits(self, now):
+        """返回当前时段的限速，没有匹配的时段时使用默认限速"""
+        current = now.strftime("%H:%M")
+        for rule in self.schedule:
+            start = rule.get('start', '00:00')
+            end = rule.get('end', '24:00')
+            # 支持跨午夜的时段，如 22:00-06:00
+            if start <= end:
+                matched = start <= current < end
+            else:
+                matched = current >= start or current < end
+            if matched:
+                return rule.get('bandwidth_limit'), rule.get('files_per_second')
+        return self.default_limits
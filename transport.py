@@ -0,0 +1,468 @@
+import os
+import sys
+import hmac
+import json
+import stat
+import zlib
+import socket
+import struct
+import hashlib
+import tempfile
+import argparse
+import ipaddress
+import threading
+
+# 与 sync_core.TEMP_SUFFIX 一致，扫描时忽略
+TEMP_SUFFIX = ".synctmp"
+
+# 已经是压缩格式的文件直接发送原始数据
+COMPRESSED_EXTENSIONS = {
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.zst', '.7z', '.rar', '.lz4', '.br',
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic', '.avif',
+    '.mp3', '.aac', '.ogg', '.flac', '.m4a', '.mp4', '.mkv', '.mov', '.avi', '.webm',
+    '.docx', '.xlsx', '.pptx', '.jar', '.apk', '.whl'
+}
+
+# 数据帧: 类型(1字节) + 长度(4字节) + 内容
+FRAME_HEADER = struct.Struct('>BI')
+FRAME_RAW = 0
+FRAME_COMPRESSED = 1
+FRAME_END = 2
+FRAME_ABORT = 3
+
+CHUNK_SIZE = 1024 * 1024
+
+# 发送端每帧最多一个数据块（压缩无效时发送原始数据），超过的帧视为数据格式错误
+MAX_FRAME_SIZE = CHUNK_SIZE
+
+# 压缩后不小于原大小的该比例时视为压缩无效，直接发送原始数据
+MIN_SAVING_RATIO = 0.95
+
+# 连续多块压缩无效后，文件的其余部分不再尝试压缩
+MAX_INEFFECTIVE_CHUNKS = 4
+
+
+class TransportError(Exception):
+    """接收端处理失败"""
+
+
+class Codec:
+    """分块压缩：zstd（需要安装 zstandard）或 zlib，auto 时优先使用 zstd"""
+    
+    def __init__(self, name='auto', level=None):
+        if name == 'auto':
+            try:
+                import zstandard  # noqa: F401
+                name = 'zstd'
+            except ImportError:
+                name = 'zlib'
+        self.name = name
+        
+        if name == 'zstd':
+            try:
+                import zstandard
+            except ImportError:
+                raise ValueError("zstd 压缩需要安装 zstandard")
+            self.level = 3 if level is None else level
+            self._compressor = zstandard.ZstdCompressor(level=self.level)
+            self._decompressor = zstandard.ZstdDecompressor()
+        elif name == 'zlib':
+            self.level = 6 if level is None else level
+        else:
+            raise ValueError(f"不支持的压缩方式: {name}")
+            
+    def compress(self, data):
+        if self.name == 'zstd':
+            return self._compressor.compress(data)
+        return zlib.compress(data, self.level)
+        
+    def decompress(self, data, max_size=CHUNK_SIZE):
+        """解压一个数据块，解压后超过 max_size 时抛出 ValueError（不按帧中声明的大小分配内存）"""
+        if self.name == 'zstd':
+            with self._decompressor.stream_reader(data) as reader:
+                output = reader.read(max_size + 1)
+            if len(output) > max_size:
+                raise ValueError("解压后的数据块过大")
+            return output
+        decompressor = zlib.decompressobj()
+        output = decompressor.decompress(data, max_size)
+        if decompressor.unconsumed_tail or not decompressor.eof:
+            raise ValueError("解压后的数据块过大或不完整")
+        return output
+
+
+class TransportClient:
+    """发送端：把文件分块压缩后发送到接收端，由接收端写入临时文件、校验后原子替换
+    
+    每个线程使用自己的连接；已压缩格式的文件和压缩后没有明显变小的数据直接发送原始数据
+    """
+    
+    def __init__(self, host, port, codec='auto', level=None, token=None, timeout=60):
+        self.host = host
+        self.port = port
+        self.codec_name = codec
+        self.level = level
+        self.token = token
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        # 确认压缩方式可用
+        Codec(codec, level)
+        
+    def send_file(self, source, relative_path, verify=True, fsync=False, progress=None):
+        """发送文件到接收端的 relative_path，返回 (MD5, 原始字节数, 实际发送字节数)
+        
+        progress 在发送每一块之前以本块的发送字节数调用，可用于限速，抛出异常时中断发送
+        """
+        connection = self._get_connection()
+        try:
+            return self._send(connection, source, relative_path, verify, fsync, progress)
+        except BaseException:
+            # 数据流已不完整，连接不能继续使用
+            self._drop_connection()
+            raise
+            
+    def close(self):
+        """关闭所有连接"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for sock, stream, _ in connections:
+            try:
+                stream.close()
+                sock.close()
+            except OSError:
+                pass
+                
+    def _get_connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            connection = (sock, sock.makefile('rwb'), Codec(self.codec_name, self.level))
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+        
+    def _drop_connection(self):
+        connection = getattr(self._local, 'connection', None)
+        self._local.connection = None
+        if connection is None:
+            return
+        with self._lock:
+            if connection in self._connections:
+                self._connections.remove(connection)
+        try:
+            connection[1].close()
+            connection[0].close()
+        except OSError:
+            pass
+            
+    def _send(self, connection, source, relative_path, verify, fsync, progress):
+        _, stream, codec = connection
+        source_stat = os.stat(source)
+        header = {
+            'op': 'put',
+            'path': relative_path.replace(os.sep, '/'),
+            'size': source_stat.st_size,
+            'mode': stat.S_IMODE(source_stat.st_mode),
+            'atime_ns': source_stat.st_atime_ns,
+            'mtime_ns': source_stat.st_mtime_ns,
+            'codec': codec.name,
+            'verify': verify,
+            'fsync': fsync,
+            'token': self.token
+        }
+        stream.write(json.dumps(header, ensure_ascii=False).encode('utf-8') + b"\n")
+        
+        compress = os.path.splitext(source)[1].lower() not in COMPRESSED_EXTENSIONS
+        ineffective = 0
+        hasher = hashlib.md5()
+        raw_bytes = 0
+        sent_bytes = 0
+        with open(source, 'rb') as f:
+            while chunk := f.read(CHUNK_SIZE):
+                hasher.update(chunk)
+                raw_bytes += len(chunk)
+                frame_type, payload = FRAME_RAW, chunk
+                if compress:
+                    packed = codec.compress(chunk)
+                    if len(packed) < len(chunk) * MIN_SAVING_RATIO:
+                        frame_type, payload = FRAME_COMPRESSED, packed
+                        ineffective = 0
+                    else:
+                        ineffective += 1
+                        compress = ineffective < MAX_INEFFECTIVE_CHUNKS
+                        
+                if progress:
+                    progress(FRAME_HEADER.size + len(payload))
+                stream.write(FRAME_HEADER.pack(frame_type, len(payload)))
+                stream.write(payload)
+                sent_bytes += FRAME_HEADER.size + len(payload)
+                
+        # 发送过程中源文件被修改，通知接收端放弃本次写入
+        current_stat = os.stat(source)
+        if (current_stat.st_size, current_stat.st_mtime_ns) != (source_stat.st_size, source_stat.st_mtime_ns):
+            stream.write(FRAME_HEADER.pack(FRAME_ABORT, 0))
+            stream.flush()
+            self._read_response(stream)
+            raise Exception("复制过程中源文件被修改")
+            
+        digest = hasher.hexdigest()
+        stream.write(FRAME_HEADER.pack(FRAME_END, len(digest)))
+        stream.write(digest.encode('ascii'))
+        stream.flush()
+        response = self._read_response(stream)
+        if not response.get('ok'):
+            raise TransportError(f"接收端写入失败: {response.get('error')}")
+        return digest, raw_bytes, sent_bytes
+        
+    def _read_response(self, stream):
+        line = stream.readline()
+        if not line:
+            raise ConnectionError("接收端关闭了连接")
+        return json.loads(line)
+
+
+class TransportReceiver:
+    """接收端：把收到的文件写入 root 下的对应位置（临时文件、校验后原子替换）
+    
+    在目标所在的机器上运行；token 不为空时只接受携带相同 token 的请求，监听非本机地址时必须设置 token
+    """
+    
+    # 请求头中必须的字段及类型
+    HEADER_FIELDS = {'path': str, 'codec': str, 'atime_ns': int, 'mtime_ns': int}
+    
+    def __init__(self, root, host='127.0.0.1', port=0, token=None, log_callback=None):
+        if not token and not self._is_loopback(host):
+            raise ValueError(f"监听非本机地址 {host} 时必须设置认证口令")
+        self.root = os.path.abspath(root)
+        self.host = host
+        self.port = port
+        self.token = token
+        self.log_callback = log_callback or (lambda message: None)
+        self._socket = None
+        self._thread = None
+        self.stop_flag = False
+        
+    def start(self):
+        """在后台线程中开始监听，port 为 0 时自动分配端口"""
+        self._socket = socket.create_server((self.host, self.port))
+        # 关闭监听套接字不会唤醒阻塞的 accept，停止时连接自身唤醒，无法连接时靠定期检查停止标志
+        self._socket.settimeout(0.5)
+        self.port = self._socket.getsockname()[1]
+        self.stop_flag = False
+        self._thread = threading.Thread(target=self._accept_loop)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+        
+    def stop(self):
+        """停止监听"""
+        self.stop_flag = True
+        if self._thread is not None:
+            self._wake_accept()
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+            
+    def serve_forever(self):
+        """前台运行直到被中断"""
+        self.start()
+        try:
+            while self._thread.is_alive():
+                self._thread.join(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+            
+    def _wake_accept(self):
+        """连接一次监听端口，让阻塞的 accept 立即返回"""
+        host = self._socket.getsockname()[0]
+        if host in ('0.0.0.0', '::'):
+            host = '::1' if self._socket.family == socket.AF_INET6 else '127.0.0.1'
+        try:
+            socket.create_connection((host, self.port), timeout=1).close()
+        except OSError:
+            pass
+            
+    def _accept_loop(self):
+        while not self.stop_flag:
+            try:
+                sock, address = self._socket.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            if self.stop_flag:
+                sock.close()
+                break
+            sock.settimeout(None)
+            thread = threading.Thread(target=self._handle_connection, args=(sock,))
+            thread.daemon = True
+            thread.start()
+            
+    def _handle_connection(self, sock):
+        try:
+            with sock, sock.makefile('rwb') as stream:
+                while line := stream.readline():
+                    response = self._receive_file(stream, json.loads(line))
+                    stream.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b"\n")
+                    stream.flush()
+        except (OSError, ValueError) as e:
+            # 连接中断或数据格式错误，未完成的临时文件已删除
+            self.log_callback(f"传输连接中断: {e}")
+            
+    def _receive_file(self, stream, header):
+        """接收一个文件的全部数据帧；出错后继续读完剩余的帧，保持数据流同步"""
+        error = None
+        target = None
+        codec = None
+        if not isinstance(header, dict):
+            header = {}
+            error = "请求格式错误"
+        elif self.token and not hmac.compare_digest(str(header.get('token') or ''), self.token):
+            error = "认证失败"
+        else:
+            try:
+                self._check_header(header)
+                target = self._resolve(header['path'])
+                codec = Codec(header['codec'])
+            except ValueError as e:
+                error = str(e)
+                
+        temp_path = None
+        output = None
+        if error is None:
+            try:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(target)}.", suffix=TEMP_SUFFIX, dir=os.path.dirname(target))
+                output = os.fdopen(fd, 'wb')
+            except OSError as e:
+                error = str(e)
+                
+        hasher = hashlib.md5()
+        expected = None
+        try:
+            while True:
+                frame_type, length = FRAME_HEADER.unpack(self._read_exact(stream, FRAME_HEADER.size))
+                # 无法跳过过大的帧，断开连接
+                if length > MAX_FRAME_SIZE:
+                    raise ValueError(f"数据帧过大: {length}")
+                payload = self._read_exact(stream, length)
+                if frame_type == FRAME_END:
+                    expected = payload.decode('ascii')
+                    break
+                if frame_type == FRAME_ABORT:
+                    error = error or "发送端取消"
+                    break
+                if error is not None:
+                    continue
+                try:
+                    data = codec.decompress(payload) if frame_type == FRAME_COMPRESSED else payload
+                    output.write(data)
+                    hasher.update(data)
+                except (OSError, zlib.error) as e:
+                    error = str(e)
+                except Exception as e:
+                    error = f"解压失败: {e}"
+                    
+            if output is not None:
+                if error is None and header.get('fsync'):
+                    output.flush()
+                    os.fsync(output.fileno())
+                output.close()
+                output = None
+            if error is None:
+                error = self._finish_file(temp_path, target, header, hasher.hexdigest(), expected)
+        finally:
+            if output is not None:
+                output.close()
+            if temp_path:
+                self._remove(temp_path)
+                
+        if error is not None:
+            return {'ok': False, 'error': error}
+        return {'ok': True, 'md5': expected}
+        
+    def _finish_file(self, temp_path, target, header, digest, expected):
+        """校验临时文件并原子替换目标文件，失败时返回错误信息"""
+        if digest != expected:
+            return "文件校验失败"
+        try:
+            if header.get('verify'):
+                verify_hasher = hashlib.md5()
+                with open(temp_path, 'rb') as f:
+                    while chunk := f.read(CHUNK_SIZE):
+                        verify_hasher.update(chunk)
+                if verify_hasher.hexdigest() != expected:
+                    return "文件校验失败"
+            os.chmod(temp_path, header.get('mode', 0o644))
+            os.utime(temp_path, ns=(header['atime_ns'], header['mtime_ns']))
+            os.replace(temp_path, target)
+        except OSError as e:
+            return str(e)
+        return None
+        
+    def _check_header(self, header):
+        """检查请求头中写入文件需要的字段，缺少或类型不对时抛出 ValueError"""
+        for name, types in self.HEADER_FIELDS.items():
+            value = header.get(name)
+            if not isinstance(value, types) or isinstance(value, bool):
+                raise ValueError(f"请求缺少字段或格式错误: {name}")
+        if 'mode' in header and (not isinstance(header['mode'], int) or isinstance(header['mode'], bool)):
+            raise ValueError("请求缺少字段或格式错误: mode")
+            
+    def _resolve(self, relative_path):
+        """把相对路径解析到 root 下，拒绝指向 root 之外的路径"""
+        target = os.path.abspath(os.path.join(self.root, *relative_path.split('/')))
+        if not target.startswith(self.root + os.sep):
+            raise ValueError(f"非法路径: {relative_path}")
+        return target
+        
+    def _is_loopback(self, host):
+        """监听地址是否只接受本机连接"""
+        if host == 'localhost':
+            return True
+        try:
+            return ipaddress.ip_address(host).is_loopback
+        except ValueError:
+            return False
+            
+    def _read_exact(self, stream, size):
+        data = stream.read(size)
+        if len(data) != size:
+            raise ConnectionError("连接中断")
+        return data
+        
+    def _remove(self, path):
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="文件同步压缩传输接收端")
+    parser.add_argument('--root', required=True, help="接收文件的目标目录")
+    parser.add_argument('--host', default='127.0.0.1', help="监听地址（非本机地址需要设置 --token）")
+    parser.add_argument('--port', type=int, default=8765, help="监听端口")
+    parser.add_argument('--token', default=os.environ.get('SYNC_TRANSPORT_TOKEN'), help="认证口令（也可用环境变量 SYNC_TRANSPORT_TOKEN）")
+    args = parser.parse_args()
+    
+    try:
+        receiver = TransportReceiver(args.root, args.host, args.port, args.token, print)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"接收端已启动: {args.host}:{args.port} -> {receiver.root}")
+    receiver.serve_forever()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
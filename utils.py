@@ -8,8 +8,8 @@ class Utils:
     def __init__(self):
         pass
         
-    def calculate_md5(self, file_path, chunk_size=8192):
-        """计算文件的MD5哈希值"""
+    def calculate_md5(self, file_path, chunk_size=8192, throttle=None):
+        """计算文件的MD5哈希值，throttle 为每读取一块后调用的限速函数（参数为字节数）"""
         if not os.path.exists(file_path):
             return None
             
@@ -18,13 +18,38 @@ class Utils:
             with open(file_path, "rb") as f:
                 while chunk := f.read(chunk_size):
                     hash_md5.update(chunk)
+                    if throttle:
+                        throttle(len(chunk))
             return hash_md5.hexdigest()
         except Exception as e:
             print(f"计算MD5失败: {file_path} - {e}")
             return None
             
-    def calculate_sha256(self, file_path, chunk_size=8192):
-        """计算文件的SHA256哈希值"""
+    def calculate_sample_md5(self, file_path, sample_size=64 * 1024, samples=3, throttle=None):
+        """计算文件的抽样指纹：文件大小加上开头、中间和结尾各 sample_size 字节的MD5，小文件读取全部内容"""
+        try:
+            file_size = os.path.getsize(file_path)
+            hash_md5 = hashlib.md5(str(file_size).encode('ascii'))
+            with open(file_path, "rb") as f:
+                if file_size <= sample_size * samples:
+                    offsets = [0]
+                    sample_size = file_size
+                else:
+                    step = (file_size - sample_size) // max(samples - 1, 1)
+                    offsets = [step * i for i in range(samples)]
+                for offset in offsets:
+                    f.seek(offset)
+                    chunk = f.read(sample_size)
+                    hash_md5.update(chunk)
+                    if throttle:
+                        throttle(len(chunk))
+            return hash_md5.hexdigest()
+        except Exception as e:
+            print(f"计算抽样指纹失败: {file_path} - {e}")
+            return None
+            
+    def calculate_sha256(self, file_path, chunk_size=8192, throttle=None):
+        """计算文件的SHA256哈希值，throttle 为每读取一块后调用的限速函数（参数为字节数）"""
         if not os.path.exists(file_path):
             return None
             
@@ -33,6 +58,8 @@ class Utils:
             with open(file_path, "rb") as f:
                 while chunk := f.read(chunk_size):
                     hash_sha256.update(chunk)
+                    if throttle:
+                        throttle(len(chunk))
             return hash_sha256.hexdigest()
         except Exception as e:
             print(f"计算SHA256失败: {file_path} - {e}")
@@ -82,10 +109,13 @@ class Utils:
             return None
             
     def is_file_locked(self, file_path):
-        """检查文件是否被锁定"""
+        """检查文件是否被锁定（只读或无写权限的文件不算锁定，替换文件不需要写入原文件）"""
         try:
             with open(file_path, 'r+b') as f:
                 return False
+        except PermissionError as e:
+            # Windows 上被其他进程占用时为共享冲突/锁定冲突，其余权限错误不是锁定
+            return getattr(e, 'winerror', None) in (32, 33)
         except IOError:
             return True
         except Exception:
@@ -179,6 +209,34 @@ class Utils:
             print(f"复制元数据失败: {source_path} -> {target_path} - {e}")
             return False
             
+    def get_xattrs(self, file_path):
+        """读取文件的扩展属性 {名称: 值}（POSIX ACL 也以扩展属性保存），系统或文件系统不支持时返回None
+        
+        SELinux 标签由目标端的策略决定，不包含在内
+        """
+        if not hasattr(os, 'listxattr'):
+            return None
+        try:
+            return {name: os.getxattr(file_path, name) for name in os.listxattr(file_path) if name != 'security.selinux'}
+        except OSError:
+            return None
+            
+    def copy_xattrs(self, source_path, target_path):
+        """把源文件的扩展属性同步到目标文件：写入不同的属性，删除目标多出的属性，返回修改的属性数"""
+        source_xattrs = self.get_xattrs(source_path)
+        target_xattrs = self.get_xattrs(target_path)
+        if source_xattrs is None or target_xattrs is None:
+            return 0
+        changed = 0
+        for name, value in source_xattrs.items():
+            if target_xattrs.get(name) != value:
+                os.setxattr(target_path, name, value)
+                changed += 1
+        for name in target_xattrs.keys() - source_xattrs.keys():
+            os.removexattr(target_path, name)
+            changed += 1
+        return changed
+        
     def get_disk_usage(self, path):
         """获取磁盘使用情况"""
         try:
@@ -188,7 +246,7 @@ class Utils:
             else:  # Unix/Linux
                 statvfs = os.statvfs(path)
                 total = statvfs.f_frsize * statvfs.f_blocks
-                free = statvfs.f_frsize * statvfs.f_available
+                free = statvfs.f_frsize * statvfs.f_bavail
                 used = total - free
                 
             return {
@@ -0,0 +1,266 @@
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import threading
+import ctypes
+import ctypes.util
+from collections import deque
+
+# 事件类型: created / modified / deleted / moved_from / moved_to / changed（目录内容有变化）/ rescan（需要重新扫描整个子树）
+
+# inotify 常量
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_EXCL_UNLINK = 0x04000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE |
+              IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW | IN_EXCL_UNLINK)
+
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class Watcher:
+    """目录监控后端的基类：在后台线程中监控 root，把变化以 {'type', 'path', 'is_dir'} 事件交给 callback"""
+    
+    def __init__(self, root, callback, log_callback=None):
+        self.root = os.path.abspath(root)
+        self.callback = callback
+        self.log_callback = log_callback or (lambda message: None)
+        self.stop_flag = False
+        self._thread = None
+        
+    def start(self):
+        """启动监控线程"""
+        self.stop_flag = False
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        
+    def stop(self):
+        """停止监控"""
+        self.stop_flag = True
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+            
+    def _emit(self, event_type, path, is_dir=False):
+        self.callback({'type': event_type, 'path': path, 'is_dir': is_dir})
+        
+    def _run(self):
+        raise NotImplementedError
+
+
+class InotifyWatcher(Watcher):
+    """Linux inotify 监控：在后台分批注册目录监视（边注册边处理事件），新建目录自动加入
+    
+    事件队列溢出（IN_Q_OVERFLOW）时发出根目录的 rescan 事件；达到 max_user_watches 上限后
+    其余目录不再监视，由调用方的定期扫描兜底
+    """
+    
+    # 每轮最多注册的目录数，避免注册期间长时间不处理事件
+    REGISTER_BATCH = 1000
+    
+    def __init__(self, root, callback, log_callback=None):
+        super().__init__(root, callback, log_callback)
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = None
+        self._watches = {}
+        self._pending = deque()
+        self._limit_reached = False
+        self.registration_seconds = None
+        self._registration_started = None
+        
+    @staticmethod
+    def is_supported():
+        return sys.platform.startswith('linux') and hasattr(ctypes.CDLL(None), 'inotify_init1')
+        
+    def start(self):
+        fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, f"inotify_init1 失败: {os.strerror(error)}")
+        self._fd = fd
+        self._pending.append(self.root)
+        self._registration_started = time.perf_counter()
+        super().start()
+        
+    def get_watch_count(self):
+        """当前监视的目录数"""
+        return len(self._watches)
+        
+    def _run(self):
+        try:
+            while not self.stop_flag:
+                # 还有目录未注册时不阻塞等待事件
+                timeout = 0 if self._pending else 0.5
+                readable, _, _ = select.select([self._fd], [], [], timeout)
+                if readable:
+                    self._read_events()
+                if self._pending:
+                    self._register_batch()
+        finally:
+            os.close(self._fd)
+            self._fd = None
+            self._watches = {}
+            
+    def _register_batch(self):
+        """注册一批目录，同时把其子目录加入待注册队列"""
+        for _ in range(min(self.REGISTER_BATCH, len(self._pending))):
+            directory = self._pending.popleft()
+            if not self._add_watch(directory):
+                continue
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            self._pending.append(entry.path)
+            except OSError:
+                continue
+        if not self._pending and self.registration_seconds is None:
+            self.registration_seconds = time.perf_counter() - self._registration_started
+            self.log_callback(f"目录监视注册完成: {len(self._watches)} 个目录，耗时 {self.registration_seconds:.2f}s")
+            
+    def _add_watch(self, directory):
+        if self._limit_reached:
+            return False
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error == errno.ENOSPC:
+                self._limit_reached = True
+                self.log_callback("inotify 监视数量达到上限（fs.inotify.max_user_watches），其余目录依靠定期扫描发现变化")
+            return False
+        self._watches[wd] = directory
+        return True
+        
+    def _read_events(self):
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _, name_length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + name_length].rstrip(b'\0')
+            offset += EVENT_HEADER.size + name_length
+            self._handle_event(wd, mask, os.fsdecode(name))
+            
+    def _handle_event(self, wd, mask, name):
+        if mask & IN_Q_OVERFLOW:
+            # 内核事件队列溢出，丢失的事件无法定位，整棵树需要重新扫描
+            self._emit('rescan', self.root, True)
+            return
+            
+        directory = self._watches.get(wd)
+        if directory is None:
+            return
+        if mask & IN_IGNORED:
+            self._watches.pop(wd, None)
+            return
+        if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+            return  # 由父目录的 DELETE/MOVED_FROM 事件报告
+            
+        path = os.path.join(directory, name)
+        is_dir = bool(mask & IN_ISDIR)
+        if mask & (IN_CREATE | IN_MOVED_TO) and is_dir:
+            # 新目录：注册监视，注册前已写入其中的文件由子树重新扫描发现
+            self._pending.append(path)
+            self._emit('rescan', path, True)
+        elif mask & IN_CREATE:
+            self._emit('created', path)
+        elif mask & IN_MOVED_TO:
+            self._emit('moved_to', path)
+        elif mask & IN_MOVED_FROM:
+            self._emit('moved_from', path, is_dir)
+        elif mask & IN_DELETE:
+            self._emit('deleted', path, is_dir)
+        elif mask & (IN_MODIFY | IN_CLOSE_WRITE | IN_ATTRIB):
+            self._emit('modified', path, is_dir)
+
+
+class PollingWatcher(Watcher):
+    """轮询监控：定期检查目录修改时间，发现变化的目录后发出 changed 事件
+    
+    index 为 {目录绝对路径: 修改时间(ns)}，可直接使用增量扫描保存的目录索引，避免启动时遍历整棵树；
+    只能发现文件的新增、删除和重命名，原地修改依赖定期完整扫描
+    """
+    
+    def __init__(self, root, callback, log_callback=None, interval=10, index=None):
+        super().__init__(root, callback, log_callback)
+        self.interval = interval
+        self._index = dict(index) if index else None
+        
+    def get_watch_count(self):
+        return len(self._index or {})
+        
+    def _run(self):
+        if self._index is None:
+            self._index = {}
+            self._add_subtree(self.root)
+        while not self.stop_flag:
+            deadline = time.monotonic() + self.interval
+            while not self.stop_flag and time.monotonic() < deadline:
+                time.sleep(min(0.2, max(deadline - time.monotonic(), 0)))
+            if not self.stop_flag:
+                self._poll()
+                
+    def _poll(self):
+        for directory, mtime_ns in list(self._index.items()):
+            if self.stop_flag:
+                return
+            try:
+                current = os.stat(directory).st_mtime_ns
+            except OSError:
+                if directory in self._index:
+                    self._remove_subtree(directory)
+                    self._emit('deleted', directory, True)
+                continue
+            if current == mtime_ns:
+                continue
+            self._index[directory] = current
+            # 目录内容有变化：记录新出现的子目录
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False) and entry.path not in self._index:
+                            self._add_subtree(entry.path)
+                            self._emit('rescan', entry.path, True)
+            except OSError:
+                pass
+            self._emit('changed', directory, True)
+            
+    def _add_subtree(self, directory):
+        for root, dirs, _ in os.walk(directory):
+            try:
+                self._index[root] = os.stat(root).st_mtime_ns
+            except OSError:
+                continue
+                
+    def _remove_subtree(self, directory):
+        prefix = directory + os.sep
+        for path in [path for path in self._index if path == directory or path.startswith(prefix)]:
+            del self._index[path]
+
+
+def create_watcher(root, callback, backend='auto', log_callback=None, poll_interval=10, index=None):
+    """创建监控后端：auto 在 Linux 上使用 inotify，否则使用轮询"""
+    if backend == 'inotify' or (backend == 'auto' and InotifyWatcher.is_supported()):
+        return InotifyWatcher(root, callback, log_callback)
+    if backend not in ('auto', 'polling'):
+        raise ValueError(f"不支持的监控后端: {backend}")
+    return PollingWatcher(root, callback, log_callback, poll_interval, index)